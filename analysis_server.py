@@ -0,0 +1,58 @@
+import argparse
+import os
+import sys
+import time
+import traceback
+
+from modules.analysis_server import AnalysisServer
+from modules.instrumentation import MetricsRegistry, MetricsServer
+from modules.pose_backends import BACKENDS
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve CPR analysis to browser trainees over websockets")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Address to listen on; sessions are not authenticated, "
+                             "so use 0.0.0.0 only to serve other machines on a trusted network")
+    parser.add_argument("--port", type=int, default=8765, help="Websocket port; sessions connect to /session/<id>")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="Analysis worker processes (default: one per core)")
+    parser.add_argument("--max-sessions", type=int, default=64, help="Concurrent sessions to accept")
+    parser.add_argument("--pose-backend", choices=list(BACKENDS), default="mediapipe",
+                        help="Pose estimation backend for clients that send frames")
+    parser.add_argument("--model-complexity", type=int, choices=[0, 1, 2],
+                        help="MediaPipe Pose model complexity")
+    parser.add_argument("--pose-model", help="Model file for the mediapipe-tasks or movenet backends")
+    parser.add_argument("--metrics-port", type=int, default=9111,
+                        help="Port for the Prometheus metrics endpoint (0 disables it)")
+    args = parser.parse_args()
+
+    try:
+        registry = MetricsRegistry()
+        pose_options = {
+            'model_complexity': args.model_complexity,
+            'model_path': args.pose_model,
+            'running_mode': 'video'
+        }
+        server = AnalysisServer(args.port, args.host, args.workers, args.pose_backend, pose_options,
+                                args.max_sessions, registry)
+        server.start()
+        if args.metrics_port:
+            MetricsServer(registry, args.metrics_port).start()
+            print(f"Metrics at http://127.0.0.1:{args.metrics_port}/metrics")
+        print(f"Serving analysis on ws://{args.host}:{server.port}/session/<id> "
+              f"with {args.workers} workers")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("Shutting down...")
+        server.stop()
+        return 0
+    except Exception as e:
+        print(f"Fatal error: {e}")
+        print("Traceback:")
+        traceback.print_exc()
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
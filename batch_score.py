@@ -0,0 +1,125 @@
+import argparse
+import os
+import sys
+import time
+import traceback
+
+from modules.batch import find_videos, replay_recording, score_videos, write_results
+from modules.history import SessionStore
+from modules.pose_backends import BACKENDS
+from modules.recording import RECORDING_EXTENSION
+
+def positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+def main():
+    parser = argparse.ArgumentParser(description="Score recorded CPR practice videos offline")
+    parser.add_argument("videos", nargs="+",
+                        help=f"Video files, {RECORDING_EXTENSION} landmark recordings, or directories of them; "
+                             "synthetic:CPM:SECONDS scores a generated session")
+    parser.add_argument("-o", "--output", default="results", help="Directory for the result tables")
+    parser.add_argument("-f", "--format", choices=["csv", "parquet"], default="csv",
+                        help="Output format for the result tables")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="Number of worker processes (default: one per core)")
+    parser.add_argument("--stride", type=positive_int, default=1,
+                        help="Analyze every Nth frame; skipped frames are not decoded")
+    parser.add_argument("--inference-interval", type=int, default=1,
+                        help="Run pose every Nth analyzed frame and predict landmarks in between")
+    parser.add_argument("--measure-drift", action="store_true",
+                        help="Also run pose on predicted frames and report landmark drift")
+    parser.add_argument("--pose-backend", choices=list(BACKENDS), default="mediapipe",
+                        help="Pose estimation backend")
+    parser.add_argument("--model-complexity", type=int, choices=[0, 1, 2],
+                        help="MediaPipe Pose model complexity")
+    parser.add_argument("--pose-model", help="Model file for the mediapipe-tasks or movenet backends")
+    parser.add_argument("--record", metavar="DIR",
+                        help=f"Save each video's landmarks to DIR as {RECORDING_EXTENSION} files for replay")
+    parser.add_argument("--history", metavar="DB",
+                        help="Also add every scored session to this training history database")
+    parser.add_argument("--trainee", help="Trainee for --history (default: the file name)")
+    args = parser.parse_args()
+
+    history = None
+    try:
+        if args.history:
+            history = SessionStore(args.history)
+            history.start()
+
+        inputs = find_videos(args.videos)
+        recordings = [path for path in inputs if path.lower().endswith(RECORDING_EXTENSION)]
+        videos = [path for path in inputs if path not in recordings]
+        if not inputs:
+            print("No videos found")
+            return 1
+
+        def report(summary, session_records):
+            summaries.append(summary)
+            records.extend(session_records)
+            if history is not None and not summary.error:
+                name = os.path.splitext(os.path.basename(summary.video))[0]
+                # The file's modification time stands in for when the session took place
+                started = os.path.getmtime(summary.video) if os.path.exists(summary.video) else None
+                session_id = history.start_session(args.trainee or name, summary.video, started)
+                history.add_compressions(session_id, session_records)
+                history.end_session(session_id, summary.duration)
+            if summary.error:
+                print(f"❌ {summary.video}: {summary.error}")
+            else:
+                print(f"✅ {summary.video}: {summary.compressions} compressions, "
+                      f"{summary.mean_rate:.1f} cpm, {summary.feedback_cues} cues, "
+                      f"{summary.realtime_factor:.1f}x real time, "
+                      f"pose {summary.pose_latency_ms:.1f} ms/frame")
+                if args.measure_drift:
+                    print(f"   landmark drift: {summary.landmark_drift:.4f} (normalized)")
+
+        start = time.perf_counter()
+        summaries = []
+        records = []
+
+        # Replays need no decoding or pose model, so they run in-process
+        if recordings:
+            print(f"Replaying {len(recordings)} landmark recordings...")
+            for path in recordings:
+                try:
+                    report(*replay_recording(path))
+                except Exception as e:
+                    print(f"❌ {path}: {e}")
+
+        if videos:
+            # Offline scoring always feeds frames in order, so use VIDEO mode
+            pose_options = {
+                'model_complexity': args.model_complexity,
+                'model_path': args.pose_model,
+                'running_mode': 'video'
+            }
+            print(f"Scoring {len(videos)} videos with {args.workers} workers...")
+            for summary, session_records in score_videos(videos, args.workers, args.stride,
+                                                          args.inference_interval, args.measure_drift,
+                                                          args.pose_backend, pose_options,
+                                                          record_dir=args.record):
+                report(summary, session_records)
+
+        elapsed = time.perf_counter() - start
+        video_seconds = sum(s.duration for s in summaries)
+        print(f"Scored {video_seconds:.0f} s of video in {elapsed:.1f} s "
+              f"({video_seconds / elapsed if elapsed > 0 else 0:.1f}x real time)")
+
+        for path in write_results(summaries, records, args.output, args.format):
+            print(f"Wrote {path}")
+        return 0
+    except Exception as e:
+        print(f"Fatal error: {e}")
+        print("Traceback:")
+        traceback.print_exc()
+        return 1
+    finally:
+        if history is not None:
+            history.stop()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import traceback
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from modules.vision import CPRVisionAnalyzer
+from modules.pose_backends import (BACKENDS, NUM_LANDMARKS, LEFT_SHOULDER, RIGHT_SHOULDER,
+                                   LEFT_WRIST, RIGHT_WRIST, create_pose_backend)
+from modules.sources import SOURCE_HELP, open_source
+
+DEFAULT_BASELINE = os.path.join("benchmarks", "baseline.json")
+
+@dataclass
+class StageResult:
+    name: str
+    frames: int
+    mean_ms: float
+    p50_ms: float
+    p99_ms: float
+    fps: float
+    alloc_kb_per_frame: float  # peak transient Python/NumPy allocation per call
+
+def measure(name: str, fn: Callable, inputs: Sequence, iterations: int,
+            warmup: int = 10, alloc_samples: int = 50) -> StageResult:
+    """Time fn over the inputs, then measure its allocations in a separate pass"""
+    for i in range(warmup):
+        fn(inputs[i % len(inputs)])
+
+    timings = np.empty(iterations)
+    for i in range(iterations):
+        item = inputs[i % len(inputs)]
+        start = time.perf_counter()
+        fn(item)
+        timings[i] = time.perf_counter() - start
+
+    # tracemalloc slows everything down, so it never overlaps the timing pass
+    allocations = []
+    tracemalloc.start()
+    try:
+        for i in range(min(alloc_samples, iterations)):
+            item = inputs[i % len(inputs)]
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            fn(item)
+            allocations.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+
+    timings_ms = timings * 1000.0
+    mean_ms = float(timings_ms.mean())
+    return StageResult(
+        name=name,
+        frames=iterations,
+        mean_ms=mean_ms,
+        p50_ms=float(np.percentile(timings_ms, 50)),
+        p99_ms=float(np.percentile(timings_ms, 99)),
+        fps=1000.0 / mean_ms if mean_ms > 0 else 0.0,
+        alloc_kb_per_frame=float(np.mean(allocations)) / 1024.0 if allocations else 0.0
+    )
+
+def load_clip_frames(path: str, count: int) -> List[np.ndarray]:
+    """Read up to count frames from a fixture clip or any other frame source"""
+    source = open_source(path, realtime=False)
+    frames = []
+    try:
+        while len(frames) < count:
+            ret, frame = source.read()
+            if not ret:
+                break
+            frames.append(frame)
+    finally:
+        source.release()
+    if not frames:
+        raise RuntimeError(f"Could not read frames from {path}")
+    return frames
+
+def synthetic_frames(count: int, width: int = 640, height: int = 480, seed: int = 0) -> List[np.ndarray]:
+    """Deterministic camera-like frames with a moving figure"""
+    rng = np.random.default_rng(seed)
+    background = rng.integers(40, 90, size=(height, width, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        offset = int(10 * np.sin(2 * np.pi * i / 16))
+        cx, cy = width // 2, height // 3
+        cv2.circle(frame, (cx, cy), 30, (180, 160, 140), -1)
+        cv2.line(frame, (cx - 60, cy + 60), (cx + 60, cy + 60), (200, 200, 200), 8)
+        cv2.line(frame, (cx - 60, cy + 60), (cx, cy + 150 + offset), (200, 200, 200), 8)
+        cv2.line(frame, (cx + 60, cy + 60), (cx, cy + 150 + offset), (200, 200, 200), 8)
+        frames.append(frame)
+    return frames
+
+def synthetic_landmarks(count: int, rate_cpm: float = 110.0, fps: float = 30.0,
+                        seed: int = 0) -> List[tuple]:
+    """(timestamp, landmarks) pairs for a trainee compressing at rate_cpm"""
+    rng = np.random.default_rng(seed)
+    samples = []
+    for i in range(count):
+        t = i / fps
+        landmarks = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+        landmarks[:, 3] = 1.0
+        landmarks[[LEFT_SHOULDER, RIGHT_SHOULDER], 0] = (0.42, 0.58)
+        landmarks[[LEFT_SHOULDER, RIGHT_SHOULDER], 1] = 0.40
+        wrist_y = 0.55 + 0.02 * np.sin(2 * np.pi * rate_cpm / 60.0 * t) + 0.003 * rng.normal()
+        landmarks[[LEFT_WRIST, RIGHT_WRIST], 0] = (0.49, 0.51)
+        landmarks[[LEFT_WRIST, RIGHT_WRIST], 1] = wrist_y
+        samples.append((t, landmarks))
+    return samples
+
+def run_benchmarks(frames: List[np.ndarray], iterations: int, pose_backend: str,
+                   pose_options: dict, stages: Optional[List[str]] = None) -> Dict[str, StageResult]:
+    """Run every stage in isolation and end to end"""
+    results = {}
+
+    def run(name: str, setup: Callable[[], tuple]):
+        if stages and name not in stages:
+            return
+        try:
+            fn, inputs = setup()
+        except Exception as e:
+            print(f"⚠️  Skipping {name}: {e}")
+            return
+        results[name] = measure(name, fn, inputs, iterations)
+
+    landmark_samples = synthetic_landmarks(len(frames))
+    rgb_frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames]
+    timestamps = iter(range(10 ** 9))
+
+    # Math-only analyzer so landmark stages never depend on a pose model
+    math_analyzer = CPRVisionAnalyzer(pose_backend=create_pose_backend("none"))
+    metrics = [math_analyzer.analyze_landmarks(lm, t) for t, lm in landmark_samples]
+    math_analyzer.reset()
+
+    run("cvtColor", lambda: (lambda f: cv2.cvtColor(f, cv2.COLOR_BGR2RGB), frames))
+
+    def pose_stage():
+        backend = create_pose_backend(pose_backend, **pose_options)
+        return (lambda rgb: backend.process(rgb, next(timestamps) / 30.0)), rgb_frames
+    run("pose.process", pose_stage)
+
+    # Timestamps keep increasing as inputs cycle so the detector never skips a sample
+    run("landmark_math", lambda: (lambda sample: math_analyzer.analyze_landmarks(
+        sample[1], next(timestamps) / 30.0), landmark_samples))
+
+    draw_inputs = list(zip([frame.copy() for frame in frames], metrics))
+    run("draw_guidelines", lambda: (lambda item: math_analyzer.draw_guidelines(item[0], item[1]),
+                                    draw_inputs))
+
+    def feedback_stage():
+        from modules.feedback import CPRFeedback
+        from modules.speech import SpeechService
+        # An unstarted speech service never loads a TTS engine
+        feedback = CPRFeedback(SpeechService())
+        return feedback.get_visual_feedback, metrics
+    run("get_visual_feedback", feedback_stage)
+
+    ui_state = {}
+
+    def ui():
+        if 'ui' not in ui_state:
+            os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+            from PyQt6.QtWidgets import QApplication
+            from modules.ui import CPRTrainingUI
+            ui_state['app'] = QApplication.instance() or QApplication(sys.argv[:1])
+            ui_state['ui'] = CPRTrainingUI()
+            ui_state['ui'].show()
+        return ui_state['ui']
+
+    def ui_stage():
+        window = ui()
+
+        def step(frame):
+            window.update_video_frame(frame)
+            window.video_widget.repaint()  # include the paint, not just scheduling it
+        return step, frames
+    run("update_video_frame", ui_stage)
+
+    def metrics_stage():
+        from modules.feedback import CPRFeedback
+        from modules.speech import SpeechService
+        window = ui()
+        feedback = CPRFeedback(SpeechService())
+        visuals = [feedback.get_visual_feedback(m) for m in metrics if m]
+
+        def step(visual):
+            window.update_metrics(visual)
+            window.refresh_metrics()  # worst case: every frame lands on a refresh tick
+        return step, visuals
+    run("update_metrics", metrics_stage)
+
+    def end_to_end_stage():
+        from modules.feedback import CPRFeedback
+        from modules.speech import SpeechService
+        window = ui()
+        analyzer = CPRVisionAnalyzer(pose_backend=create_pose_backend(pose_backend, **pose_options))
+        feedback = CPRFeedback(SpeechService())
+
+        def step(frame):
+            result = analyzer.analyze_frame(frame, next(timestamps) / 30.0)
+            if result:
+                frame = analyzer.draw_guidelines(frame, result)
+                window.update_metrics(feedback.get_visual_feedback(result))
+            window.update_video_frame(frame)
+        return step, [frame.copy() for frame in frames]
+    run("end_to_end", end_to_end_stage)
+
+    return results
+
+def compare_to_baseline(results: Dict[str, StageResult], baseline: dict,
+                        tolerance: float) -> List[str]:
+    """Return a description of every stage slower or hungrier than its baseline"""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get("stages", {}).get(name)
+        if not reference:
+            continue
+        for key in ("p50_ms", "p99_ms", "alloc_kb_per_frame"):
+            limit = reference[key] * (1 + tolerance)
+            # Ignore noise on stages that are already near zero
+            floor = 0.05 if key.endswith("_ms") else 1.0
+            value = getattr(result, key)
+            if value > max(limit, floor):
+                regressions.append(f"{name} {key}: {value:.3f} > baseline {reference[key]:.3f} "
+                                   f"(+{tolerance:.0%} allowed)")
+    return regressions
+
+def print_results(results: Dict[str, StageResult]):
+    print(f"{'stage':<22}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'fps':>10}{'alloc KB':>10}")
+    for result in results.values():
+        print(f"{result.name:<22}{result.mean_ms:>10.3f}{result.p50_ms:>10.3f}{result.p99_ms:>10.3f}"
+              f"{result.fps:>10.1f}{result.alloc_kb_per_frame:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage performance benchmarks")
+    parser.add_argument("--clip", help=f"Fixture to replay: {SOURCE_HELP} (default: synthetic frames)")
+    parser.add_argument("--frames", type=int, default=120, help="Distinct frames to cycle through")
+    parser.add_argument("--iterations", type=int, default=300, help="Timed calls per stage")
+    parser.add_argument("--stages", nargs="+", help="Only run these stages")
+    parser.add_argument("--pose-backend", choices=list(BACKENDS), default="mediapipe")
+    parser.add_argument("--model-complexity", type=int, choices=[0, 1, 2])
+    parser.add_argument("--pose-model", help="Model file for the mediapipe-tasks or movenet backends")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline file to compare against")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store these results as the new baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown over the baseline before failing (0.25 = 25%%)")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    try:
+        frames = load_clip_frames(args.clip, args.frames) if args.clip else synthetic_frames(args.frames)
+        pose_options = {
+            'model_complexity': args.model_complexity,
+            'model_path': args.pose_model,
+            'running_mode': 'video'
+        }
+        print(f"Benchmarking {len(frames)} {'clip' if args.clip else 'synthetic'} frames "
+              f"of {frames[0].shape[1]}x{frames[0].shape[0]}, {args.iterations} iterations per stage")
+        results = run_benchmarks(frames, args.iterations, args.pose_backend, pose_options, args.stages)
+        print_results(results)
+
+        report = {
+            "machine": platform.platform(),
+            "processor": platform.processor(),
+            "pose_backend": args.pose_backend,
+            "stages": {name: asdict(result) for name, result in results.items()}
+        }
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+
+        if args.save_baseline:
+            os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+            with open(args.baseline, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"✅ Baseline saved to {args.baseline}")
+            return 0
+
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+            return 0
+
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("❌ Performance regressions:")
+            for regression in regressions:
+                print(f"   {regression}")
+            return 1
+        print("✅ No regressions against the baseline")
+        return 0
+    except Exception as e:
+        print(f"Fatal error: {e}")
+        print("Traceback:")
+        traceback.print_exc()
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
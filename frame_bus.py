@@ -0,0 +1,136 @@
+import argparse
+import signal
+import sys
+import time
+import traceback
+
+import cv2
+
+from modules.framebus import FrameBus, FrameBusReader
+from modules.instrumentation import MetricsRegistry, MetricsServer
+from modules.pipeline import CaptureWorker
+from modules.sources import SOURCE_HELP, open_source
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def serve(args) -> int:
+    """Capture from one source into a shared-memory frame bus until interrupted or the source ends"""
+    source = open_source(args.source, realtime=not args.fast)
+    if not source.is_open():
+        print(f"Could not open {args.source}")
+        return 1
+    # The first frame sets the size of the bus, then goes out as its first frame
+    ret, image = source.read()
+    captured = source.captured_at() or time.monotonic()
+    if not ret:
+        print(f"Could not read from {source.name}")
+        source.release()
+        return 1
+    height, width = image.shape[:2]
+    try:
+        bus = FrameBus(args.name, width, height, image.shape[2], args.slots)
+    except FileExistsError:
+        print(f"A frame bus named '{args.name}' already exists: another producer is running, "
+              "or one crashed and its shared memory segment must be removed")
+        source.release()
+        return 1
+
+    bus.publish(image, captured, captured)
+    metrics = MetricsRegistry()
+    metrics.gauge("bus_frames_published_total", "Frames published on the frame bus",
+                  lambda: bus.sequence, kind="counter")
+    worker = CaptureWorker(source, [bus], metrics)
+    if args.metrics_port:
+        try:
+            MetricsServer(metrics, args.metrics_port).start()
+            print(f"Metrics at http://127.0.0.1:{args.metrics_port}/metrics")
+        except OSError as e:
+            print(f"WARNING: Could not start metrics endpoint: {e}")
+
+    print(f"Publishing {source.name} at {width}x{height} on bus '{bus.name}' ({args.slots} slots); "
+          f"attach with --source bus:{bus.name}")
+    start = time.monotonic()
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.stop()
+        bus.close()
+        source.release()
+    elapsed = time.monotonic() - start
+    print(f"Published {bus.sequence} frames in {elapsed:.1f} s "
+          f"({bus.sequence / elapsed if elapsed > 0 else 0:.1f} fps), {worker.gap_frames} source gaps")
+    return 0
+
+def record(args) -> int:
+    """Write the frames on a bus to a video file, as an independent consumer"""
+    reader = FrameBusReader(args.name)
+    height, width = reader.shape[:2]
+    writer = cv2.VideoWriter(args.output, cv2.VideoWriter_fourcc(*args.fourcc), args.fps, (width, height))
+    if not writer.isOpened():
+        print(f"Could not open {args.output} for writing")
+        reader.close()
+        return 1
+    print(f"Recording bus '{args.name}' to {args.output}, Ctrl+C to stop")
+    torn = 0
+    try:
+        while True:
+            frame = reader.next(timeout=1.0)
+            if frame is None:
+                if reader.closed:
+                    break
+                continue
+            # Copy first: the slot may be reused while the encoder holds it
+            image = frame.image.copy()
+            if not reader.is_current(frame):
+                torn += 1
+                continue
+            writer.write(image)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.release()
+        reader.close()
+    print(f"Recorded {reader.frames_read - torn} frames, {reader.dropped + torn} dropped")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Share one camera's frames with several processes through shared memory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Capture frames and publish them on a bus")
+    serve_parser.add_argument("--source", default="0", help=f"Frames to publish: {SOURCE_HELP}")
+    serve_parser.add_argument("--name", default="cpr_frames", help="Name of the shared-memory bus")
+    serve_parser.add_argument("--slots", type=int, default=8,
+                              help="Frames kept in the ring; must cover the slowest consumer's frame time")
+    serve_parser.add_argument("--fast", action="store_true",
+                              help="Read files, replays and synthetic sources as fast as possible")
+    serve_parser.add_argument("--metrics-port", type=int, default=9112,
+                              help="Port for the Prometheus metrics endpoint (0 disables it)")
+    serve_parser.set_defaults(run=serve)
+
+    record_parser = commands.add_parser("record", help="Save the frames on a bus to a video file")
+    record_parser.add_argument("output", help="Video file to write")
+    record_parser.add_argument("--name", default="cpr_frames", help="Name of the shared-memory bus")
+    record_parser.add_argument("--fps", type=float, default=30.0, help="Frame rate of the output video")
+    record_parser.add_argument("--fourcc", default="MJPG", help="Codec of the output video")
+    record_parser.set_defaults(run=record)
+
+    args = parser.parse_args()
+    # Stop as on Ctrl+C, so the segment is removed and readers see the end
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        return args.run(args)
+    except Exception as e:
+        print(f"Fatal error: {e}")
+        print("Traceback:")
+        traceback.print_exc()
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
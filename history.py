@@ -0,0 +1,44 @@
+import argparse
+import sys
+import time
+import traceback
+
+from modules.history import SessionStore
+
+def main():
+    parser = argparse.ArgumentParser(description="Show trainees' CPR practice history")
+    parser.add_argument("trainees", nargs="*", help="Trainees to show (default: everyone, summary only)")
+    parser.add_argument("--db", default="sessions.db", help="Training history database")
+    parser.add_argument("--last", type=int, default=10, help="Sessions to list per trainee")
+    parser.add_argument("--days", type=float, help="Only sessions from the last N days")
+    args = parser.parse_args()
+
+    try:
+        store = SessionStore(args.db)
+        since = time.time() - args.days * 86400 if args.days else None
+        print(f"{'trainee':20s} {'sessions':>8s} {'compr.':>7s} {'on target':>9s} "
+              f"{'rate':>6s} {'rate sd':>7s} {'depth':>6s}")
+        for trainee in args.trainees or store.trainees():
+            summary = store.trainee_summary(trainee, since)
+            if summary is None:
+                print(f"{trainee:20s} no sessions")
+                continue
+            print(f"{trainee:20s} {summary.sessions:8d} {summary.compressions:7d} "
+                  f"{summary.in_target_pct:8.1f}% {summary.mean_rate:6.1f} "
+                  f"{summary.rate_variance ** 0.5:7.1f} {summary.mean_depth:6.2f}")
+            if not args.trainees:
+                continue
+            for session in store.sessions(trainee, since, limit=args.last):
+                started = time.strftime("%Y-%m-%d %H:%M", time.localtime(session.started))
+                print(f"  {started:18s} {session.duration / 60:6.1f} min {session.compressions:7d} "
+                      f"{session.in_target_pct:8.1f}% {session.mean_rate:6.1f} "
+                      f"{session.rate_variance ** 0.5:7.1f} {session.mean_depth:6.2f}")
+        return 0
+    except Exception as e:
+        print(f"Fatal error: {e}")
+        print("Traceback:")
+        traceback.print_exc()
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import argparse
+import json
+import sys
+import threading
+import time
+import traceback
+import uuid
+
+import cv2
+import numpy as np
+
+from benchmark import synthetic_frames, synthetic_landmarks
+from modules.analysis_server import FRAME_HEADER
+from modules.websocket import WebSocket, WebSocketClosed
+
+class SyntheticSession(threading.Thread):
+    """One simulated trainee streaming frames or landmarks at a fixed rate"""
+
+    def __init__(self, host: str, port: int, mode: str, fps: float, duration: float,
+                 jpeg_frames: list, landmark_samples: list):
+        super().__init__(daemon=True)
+        self.host = host
+        self.port = port
+        self.mode = mode
+        self.fps = fps
+        self.duration = duration
+        self.jpeg_frames = jpeg_frames
+        self.landmark_samples = landmark_samples
+        self.session_id = uuid.uuid4().hex[:12]
+        self.sent = 0
+        self.latencies = []  # seconds from send to result
+        self.dropped = 0
+        self.errors = 0
+        self.rejected = False
+        self._send_times = {}
+
+    def run(self):
+        try:
+            ws = WebSocket.connect(self.host, self.port, f"/session/{self.session_id}")
+        except (OSError, ConnectionError) as e:
+            print(f"Session {self.session_id}: {e}")
+            self.rejected = True
+            return
+        receiver = threading.Thread(target=self._receive, args=(ws,), daemon=True)
+        receiver.start()
+
+        start = time.perf_counter()
+        interval = 1.0 / self.fps
+        index = 0
+        try:
+            while time.perf_counter() - start < self.duration and not ws.closed:
+                timestamp = index / self.fps
+                self._send_times[round(timestamp, 6)] = time.perf_counter()
+                if self.mode == "jpeg":
+                    jpeg = self.jpeg_frames[index % len(self.jpeg_frames)]
+                    ws.send_binary(FRAME_HEADER.pack(timestamp) + jpeg)
+                else:
+                    landmarks = self.landmark_samples[index % len(self.landmark_samples)][1]
+                    ws.send_text(json.dumps({'t': timestamp, 'landmarks': landmarks.tolist()}))
+                self.sent += 1
+                index += 1
+                delay = start + index * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            time.sleep(0.5)  # let the last results arrive
+        except WebSocketClosed:
+            pass
+        finally:
+            ws.close()
+        receiver.join(1.0)
+
+    def _receive(self, ws: WebSocket):
+        try:
+            while True:
+                _, payload = ws.recv()
+                result = json.loads(payload)
+                if 'session' in result:
+                    continue
+                if 'error' in result:
+                    self.errors += 1
+                sent = self._send_times.pop(round(result['t'], 6), None)
+                if sent is not None:
+                    self.latencies.append(time.perf_counter() - sent)
+                self.dropped = result.get('dropped', self.dropped)
+        except (WebSocketClosed, OSError, ValueError):
+            pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic load test for analysis_server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-n", "--sessions", type=int, default=8, help="Concurrent simulated trainees")
+    parser.add_argument("--mode", choices=["jpeg", "landmarks"], default="jpeg",
+                        help="Send camera frames, or client-computed landmarks")
+    parser.add_argument("--fps", type=float, default=15.0, help="Messages per second per session")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to run")
+    parser.add_argument("--clip", help="Video to take frames from (default: synthetic frames)")
+    parser.add_argument("--ramp", type=float, default=0.05, help="Seconds between session starts")
+    args = parser.parse_args()
+
+    try:
+        if args.clip:
+            from benchmark import load_clip_frames
+            frames = load_clip_frames(args.clip, 120)
+        else:
+            frames = synthetic_frames(60)
+        # Encode once; every session replays the same JPEG bytes
+        jpeg_frames = [cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 75])[1].tobytes()
+                       for frame in frames]
+        landmark_samples = synthetic_landmarks(300, fps=args.fps)
+
+        print(f"Starting {args.sessions} {args.mode} sessions at {args.fps:.0f} fps "
+              f"for {args.duration:.0f} s...")
+        sessions = [SyntheticSession(args.host, args.port, args.mode, args.fps, args.duration,
+                                     jpeg_frames, landmark_samples) for _ in range(args.sessions)]
+        for session in sessions:
+            session.start()
+            time.sleep(args.ramp)
+        for session in sessions:
+            session.join()
+
+        latencies = np.array([l for s in sessions for l in s.latencies]) * 1000.0
+        sent = sum(s.sent for s in sessions)
+        rejected = sum(s.rejected for s in sessions)
+        print(f"Sessions: {len(sessions) - rejected} served, {rejected} rejected")
+        print(f"Messages: {sent} sent, {len(latencies)} answered, "
+              f"{sum(s.dropped for s in sessions)} dropped by the server, "
+              f"{sum(s.errors for s in sessions)} errors")
+        if len(latencies):
+            print(f"Result latency: p50 {np.percentile(latencies, 50):.1f} ms, "
+                  f"p95 {np.percentile(latencies, 95):.1f} ms, max {latencies.max():.1f} ms")
+            print(f"Throughput: {len(latencies) / args.duration:.1f} results/s "
+                  f"({len(latencies) / args.duration / max(1, len(sessions) - rejected):.1f} per session)")
+        return 0
+    except Exception as e:
+        print(f"Fatal error: {e}")
+        print("Traceback:")
+        traceback.print_exc()
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,103 +1,315 @@
+import time
+PROCESS_START = time.perf_counter()  # before the imports below, for startup timing
+
 import sys
+import argparse
+import getpass
 import cv2
 import numpy as np
 from PyQt6.QtWidgets import QApplication
-from PyQt6.QtCore import QTimer
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
 import threading
 import queue
 import traceback
-import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
 
 from modules.vision import CPRVisionAnalyzer
+from modules.pose_backends import BACKENDS, create_pose_backend
 from modules.feedback import CPRFeedback
-from modules.voice import VoiceInterface
+from modules.recognizers import RECOGNIZERS
 from modules.ui import CPRTrainingUI
+from modules.pipeline import LatestQueue, CaptureWorker, InferenceWorker
+from modules.speech import SpeechService
+from modules.clips import ClipCache
+from modules.instrumentation import MetricsRegistry, MetricsServer
+from modules.recording import LandmarkRecorder
+from modules.sources import SOURCE_HELP, open_source
+from modules.history import SessionStore, SessionLog
+
+class PipelineSignals(QObject):
+    """Qt signals used to hand worker results back to the GUI thread"""
+    metrics_ready = pyqtSignal(int, object)
+    voice_command = pyqtSignal(str)
+    component_ready = pyqtSignal(str, str)  # component name, status
 
 class CPRTrainingApp:
-    def __init__(self):
+    def __init__(self, inference_interval: int = 1, inference_budget: Optional[float] = None,
+                 pose_backend: str = "mediapipe", pose_options: Optional[dict] = None,
+                 metrics_port: int = 9108, record_path: Optional[str] = None,
+                 recognizer: str = "vosk", recognizer_options: Optional[dict] = None,
+                 speech_cache: Optional[str] = "cache/speech", history_path: Optional[str] = "sessions.db",
+                 trainee: str = "trainee", ui_rate: float = 10.0, source: str = "0",
+                 realtime: bool = True):
         try:
             print("Initializing CPR Training App...")
             
+            # Hot-path instrumentation, served in Prometheus format
+            self.metrics = MetricsRegistry()
+            self.metrics_server = None
+            if metrics_port:
+                try:
+                    self.metrics_server = MetricsServer(self.metrics, metrics_port)
+                    self.metrics_server.start()
+                    print(f"Metrics at http://127.0.0.1:{self.metrics_server.port}/metrics")
+                except OSError as e:
+                    print(f"WARNING: Could not start metrics endpoint: {e}")
+            
             # Initialize UI
             print("Creating UI...")
-            self.ui = CPRTrainingUI()
+            self.ui = CPRTrainingUI(metrics_rate=ui_rate)
             print("UI created successfully")
             
-            # Initialize components
-            print("Initializing vision analyzer...")
-            self.vision_analyzer = CPRVisionAnalyzer()
-            print("Initializing feedback system...")
-            self.feedback_system = CPRFeedback()
-            print("Initializing voice interface...")
-            self.voice_interface = VoiceInterface()
-            
-            # Initialize video capture with optimized settings
-            print("Opening camera...")
-            self.cap = cv2.VideoCapture(0)
-            if not self.cap.isOpened():
-                print("WARNING: Could not open camera!")
-            else:
-                # Set camera properties for better performance
-                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)  # Reduced resolution
-                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                self.cap.set(cv2.CAP_PROP_FPS, 30)
-                print("Camera opened successfully")
-            
-            # Set up timer for video update with reduced frequency
-            print("Setting up video timer...")
+            # Cheap parts now; the pose model, camera, voice and speech clips
+            # load in parallel once the window is up (see start_components)
+            self.options = dict(inference_interval=inference_interval, inference_budget=inference_budget,
+                                pose_backend=pose_backend, pose_options=pose_options,
+                                record_path=record_path, recognizer=recognizer,
+                                recognizer_options=recognizer_options,
+                                source=source, realtime=realtime)
+            self.vision_analyzer = None
+            self.frame_source = None
+            self.voice_interface = None
+            self.capture_worker = None
+            self.inference_worker = None
+            self.startup_times = {}  # stage -> seconds since process start
+            self.pending_components = set()
+            
+            # Every compression goes to the training history, one session per Start/Stop
+            self.history = None
+            self.session_log = None
+            self.trainee = trainee
+            if history_path:
+                self.history = SessionStore(history_path)
+                self.history.start()
+            self.ui.training_started.connect(self.start_session)
+            self.ui.training_stopped.connect(self.end_session)
+            # Fixed cues are played from clips rendered once into speech_cache;
+            # the service thread loads them and creates any TTS engine itself
+            clips = ClipCache(speech_cache, rate=150) if speech_cache else None
+            self.speech_service = SpeechService(rate=150, clips=clips)
+            self.speech_service.start()
+            self.feedback_system = CPRFeedback(self.speech_service)
+            
+            # Set up the capture -> inference pipeline. Each consumer gets its
+            # own latest-frame-wins queue so a slow pose model never delays
+            # the display and stale frames are dropped instead of queued.
+            self.latest_metrics = None
+            self.display_queue = LatestQueue()
+            self.inference_queue = LatestQueue()
+            self.pipeline_signals = PipelineSignals()
+            self.pipeline_signals.metrics_ready.connect(self.handle_metrics)
+            # Components report readiness from loader threads; the UI changes on the GUI thread
+            self.pipeline_signals.component_ready.connect(self.handle_component_ready)
+            # Voice commands arrive on the voice thread
+            self.pipeline_signals.voice_command.connect(self.handle_voice_command)
+            self.register_metrics()
+            
+            # Set up timer for rendering; only GUI work happens on this tick
             self.timer = QTimer()
             self.timer.timeout.connect(self.update_frame)
             self.timer.start(33)  # ~30 FPS
-            print("Video timer started")
+            
+            # Refresh the debug overlay (F3) twice a second
+            self.debug_timer = QTimer()
+            self.debug_timer.timeout.connect(self.update_debug_overlay)
+            self.debug_timer.start(500)
             
             # Set up voice command queue
             self.command_queue = queue.Queue()
             
-            # Start voice interface in a separate thread
-            self.voice_thread = threading.Thread(target=self.start_voice_interface)
-            self.voice_thread.daemon = True
-            self.voice_thread.start()
-            
-            # Initialize frame processing state
-            self.last_frame_time = 0
-            self.frame_interval = 1.0 / 30.0  # Target 30 FPS
-            
         except Exception as e:
             print(f"Error during initialization: {e}")
             print("Traceback:")
             traceback.print_exc()
             raise
         
+    def register_metrics(self):
+        """Create GUI-thread timers and scrape-time gauges for the pipeline"""
+        self.render_timer = self.metrics.stage_timer("render")
+        self.feedback_timer = self.metrics.stage_timer("feedback")
+        self.feedback_latency = self.metrics.feedback_latency()
+        self.rendered_frames = self.metrics.counter("rendered_frames_total", "Frames shown in the UI")
+        for name, frame_queue in (("display", self.display_queue), ("inference", self.inference_queue)):
+            self.metrics.gauge("queue_depth", "Frames waiting in a pipeline queue",
+                               lambda q=frame_queue: len(q), {'queue': name})
+            self.metrics.gauge("queue_dropped_frames_total", "Stale frames dropped by a pipeline queue",
+                               lambda q=frame_queue: q.dropped, {'queue': name}, kind="counter")
+        self.metrics.gauge("speech_backlog", "Utterances waiting to be spoken",
+                           lambda: self.speech_service.backlog)
+        self.metrics.gauge("speech_dropped_total", "Utterances merged or dropped as stale",
+                           lambda: self.speech_service.dropped_count, kind="counter")
+        self.metrics.gauge("speech_synthesized_total", "Utterances synthesized live for lack of a clip",
+                           lambda: self.speech_service.synthesized_count, kind="counter")
+        for stage in ('window', 'first analyzed frame', 'ready'):
+            self.metrics.gauge("startup_seconds", "Seconds from process start to a startup stage",
+                               lambda s=stage: self.startup_times.get(s, 0.0),
+                               {'stage': stage.replace(' ', '_')})
+        
+    def start_components(self):
+        """Load the slow components in parallel, reporting each as it becomes ready"""
+        loaders = {
+            'Pose model': self.load_pose,
+            'Video source': self.open_frame_source,
+            'Voice commands': self.load_voice,
+            'Speech': self.load_speech
+        }
+        self.pending_components = set(loaders)
+        self.loader_pool = ThreadPoolExecutor(max_workers=len(loaders), thread_name_prefix="startup")
+        for name, loader in loaders.items():
+            self.ui.set_component_status(name, "loading...")
+            self.loader_pool.submit(self.run_loader, name, loader)
+        self.loader_pool.shutdown(wait=False)
+        
+    def run_loader(self, name: str, loader):
+        """Run one loader on a startup thread and report the result to the GUI thread"""
+        start = time.perf_counter()
+        try:
+            status = loader() or "ready"
+        except Exception as e:
+            print(f"WARNING: {name} failed to start: {e}")
+            traceback.print_exc()
+            status = "failed"
+        print(f"{name}: {status} in {time.perf_counter() - start:.2f} s")
+        self.pipeline_signals.component_ready.emit(name, status)
+        
+    def load_pose(self):
+        options = self.options
+        print(f"Initializing vision analyzer ({options['pose_backend']} pose backend)...")
+        analyzer = CPRVisionAnalyzer(
+            pose_backend=create_pose_backend(options['pose_backend'], **(options['pose_options'] or {})),
+            inference_interval=options['inference_interval'],
+            inference_budget=options['inference_budget'])
+        # The first inference builds the graph; do it before any real frame arrives
+        analyzer.pose.warmup()
+        if options['record_path']:
+            print(f"Recording landmarks to {options['record_path']}")
+            analyzer.recorder = LandmarkRecorder(options['record_path'])
+        self.vision_analyzer = analyzer
+        
+    def open_frame_source(self):
+        source = open_source(self.options['source'], self.options['realtime'])
+        self.frame_source = source
+        if not source.is_open():
+            return "not found"
+        return source.name
+        
+    def load_voice(self):
+        from modules.voice import VoiceInterface
+        recognizer = self.options['recognizer']
+        try:
+            voice_interface = VoiceInterface(self.speech_service, recognizer,
+                                             self.options['recognizer_options'], self.metrics)
+        except Exception as e:
+            # Training works without voice commands, e.g. before the model is downloaded
+            print(f"WARNING: Could not start the {recognizer} recognizer, voice commands disabled: {e}")
+            return "disabled"
+        self.speech_service.preload(voice_interface.phrases())
+        self.voice_interface = voice_interface
+        
+    def load_speech(self):
+        self.speech_service.preload(self.feedback_system.phrases())
+        # Clips are loaded on the speech thread; wait so the status is truthful
+        if not self.speech_service.ready.wait(60.0):
+            return "still loading"
+        
+    def handle_component_ready(self, name: str, status: str):
+        """Show a component's readiness and start whatever it unblocks, on the GUI thread"""
+        self.ui.set_component_status(name, status)
+        self.pending_components.discard(name)
+        if name == 'Voice commands' and self.voice_interface is not None:
+            self.voice_thread = threading.Thread(target=self.start_voice_interface)
+            self.voice_thread.daemon = True
+            self.voice_thread.start()
+        if self.capture_worker is None and not self.pending_components & {'Pose model', 'Video source'}:
+            if self.vision_analyzer is None:
+                # Without a pose model the window still shows the video
+                print("Starting capture worker for display only...")
+                self.capture_worker = CaptureWorker(self.frame_source, [self.display_queue], self.metrics)
+            else:
+                print("Starting capture and inference workers...")
+                self.capture_worker = CaptureWorker(
+                    self.frame_source, [self.display_queue, self.inference_queue], self.metrics)
+                self.inference_worker = InferenceWorker(
+                    self.vision_analyzer, self.inference_queue,
+                    self.pipeline_signals.metrics_ready.emit, self.metrics)
+                # One real frame through pose now, so time-to-first-analyzed-frame
+                # does not include waiting for the trainee to press Start
+                self.inference_worker.analyze_once()
+                self.inference_worker.start()
+            self.capture_worker.start()
+        if not self.pending_components:
+            self.mark_startup('ready')
+            
+    def mark_startup(self, stage: str):
+        """Record when a startup stage was reached, counted from process start"""
+        if stage not in self.startup_times:
+            self.startup_times[stage] = time.perf_counter() - PROCESS_START
+            print(f"Startup: {stage} after {self.startup_times[stage]:.2f} s")
+            
+    def update_debug_overlay(self):
+        """Show the latest pipeline metrics when the debug overlay is visible"""
+        if self.ui.is_debug_overlay_visible():
+            self.ui.set_debug_text(self.metrics.summary_lines())
+            
     def start_voice_interface(self):
         """Run voice interface in a separate thread"""
         try:
-            self.voice_interface.start_voice_interface(self.handle_voice_command)
+            self.voice_interface.start_voice_interface(self.pipeline_signals.voice_command.emit)
         except Exception as e:
             print(f"Error in voice interface: {e}")
             print("Traceback:")
             traceback.print_exc()
         
     def update_frame(self):
-        """Update the video frame and process CPR metrics"""
+        """Render the newest captured frame with the latest analysis overlay"""
         try:
-            if not self.ui.is_active():
+            if self.capture_worker is None:
+                return  # Still starting up
+            active = self.ui.is_active()
+            if self.inference_worker is not None:
+                self.inference_worker.set_active(active)
+            if not active:
+                self.latest_metrics = None
                 return
                 
-            current_time = time.time()
-            if current_time - self.last_frame_time < self.frame_interval:
-                return  # Skip frame if too soon
+            item = self.display_queue.get_nowait()
+            if item is None:
+                return  # No new frame since the last tick
                 
-            ret, frame = self.cap.read()
-            if not ret:
-                print("WARNING: Could not read frame from camera")
+            start = time.perf_counter()
+            frame_id, frame = item
+            try:
+                overlay = None
+                if self.latest_metrics:
+                    # Drawn on the widget's display copy, so the inference worker never sees it
+                    overlay = partial(self.vision_analyzer.draw_guidelines, metrics=self.latest_metrics)
+                    
+                # Update video display
+                self.ui.update_video_frame(frame.image, overlay)
+            finally:
+                frame.release()
+            self.render_timer.observe_since(start)
+            self.rendered_frames.inc()
+            
+        except Exception as e:
+            print(f"Error in update_frame: {e}")
+            print("Traceback:")
+            traceback.print_exc()
+            
+    def handle_metrics(self, frame_id: int, metrics):
+        """Receive analysis results from the inference worker on the GUI thread"""
+        try:
+            self.mark_startup('first analyzed frame')
+            if not self.ui.is_active():
                 return
                 
-            # Process frame with vision analyzer
-            metrics = self.vision_analyzer.analyze_frame(frame)
-            
+            self.latest_metrics = metrics
+            if self.session_log is not None:
+                self.session_log.add(metrics)
             if metrics:
-                # Draw guidelines on frame
-                frame = self.vision_analyzer.draw_guidelines(frame, metrics)
+                start = time.perf_counter()
                 
                 # Update UI metrics
                 visual_feedback = self.feedback_system.get_visual_feedback(metrics)
@@ -105,25 +317,39 @@ class CPRTrainingApp:
                 
                 # Provide audio feedback
                 self.feedback_system.provide_feedback(metrics)
+                self.feedback_timer.observe_since(start)
+                if metrics.captured:
+                    self.feedback_latency.observe(time.monotonic() - metrics.captured)
                 
-            # Update video display
-            self.ui.update_video_frame(frame)
-            self.last_frame_time = current_time
-            
         except Exception as e:
-            print(f"Error in update_frame: {e}")
+            print(f"Error handling metrics: {e}")
             print("Traceback:")
             traceback.print_exc()
         
-    def handle_voice_command(self, command: str):
-        """Handle voice commands from the voice interface"""
+    def start_session(self):
+        """Begin a history session and fresh compression tracking when training starts"""
+        if self.inference_worker is not None:
+            self.inference_worker.reset_analyzer()
+        self.latest_metrics = None
+        if self.history is not None:
+            source = self.options['source']
+            self.session_log = SessionLog(self.history, self.trainee, "camera" if source.isdigit() else source)
+            
+    def end_session(self):
+        """Close the history session when training stops"""
+        if self.session_log is not None:
+            self.session_log.close()
+            self.session_log = None
+            
+    def handle_voice_command(self, intent: str):
+        """Handle intents dispatched by the voice interface, on the GUI thread"""
         try:
-            print(f"Received voice command: {command}")
-            if 'pause' in command:
-                self.ui.pause_training()
-            elif 'resume' in command:
-                self.ui.pause_training()
-            elif 'stop' in command:
+            print(f"Received voice command: {intent}")
+            if intent == 'pause':
+                self.ui.set_paused(True)
+            elif intent == 'resume':
+                self.ui.set_paused(False)
+            elif intent == 'stop':
                 self.ui.stop_training()
         except Exception as e:
             print(f"Error handling voice command: {e}")
@@ -135,7 +361,8 @@ class CPRTrainingApp:
         try:
             print("Starting application...")
             self.ui.show()
-            print("Window should now be visible")
+            # Runs once the event loop has painted the window
+            QTimer.singleShot(0, self.on_window_shown)
             return QApplication.instance().exec()
         except Exception as e:
             print(f"Error in run: {e}")
@@ -143,12 +370,47 @@ class CPRTrainingApp:
             traceback.print_exc()
             return 1
         
+    def on_window_shown(self):
+        self.mark_startup('window')
+        self.start_components()
+        
     def cleanup(self):
         """Clean up resources"""
         try:
             print("Cleaning up resources...")
-            if hasattr(self, 'cap') and self.cap is not None:
-                self.cap.release()
+            if hasattr(self, 'timer'):
+                self.timer.stop()
+            if getattr(self, 'metrics_server', None) is not None:
+                self.metrics_server.stop()
+            inference_running = False
+            if getattr(self, 'inference_worker', None) is not None:
+                self.inference_worker.stop()
+                if self.inference_worker.is_alive():
+                    # A slow pose call can outlast the stop timeout; give it time to finish
+                    self.inference_worker.join(5.0)
+                inference_running = self.inference_worker.is_alive()
+            if getattr(self, 'capture_worker', None) is not None:
+                self.capture_worker.stop()
+            if getattr(self, 'vision_analyzer', None) is not None:
+                latency = self.vision_analyzer.pose.latency_summary()
+                print(f"Pose latency: mean {latency['mean_ms']:.1f} ms, "
+                      f"p95 {latency['p95_ms']:.1f} ms over {latency['count']} frames")
+                if inference_running:
+                    # Closing under a running analysis would lose or corrupt its last frame
+                    print("WARNING: Inference is still running; leaving the pose model and recording open")
+                else:
+                    self.vision_analyzer.pose.close()
+                    if self.vision_analyzer.recorder is not None:
+                        self.vision_analyzer.recorder.close()
+            if getattr(self, 'frame_source', None) is not None:
+                self.frame_source.release()
+            if getattr(self, 'voice_interface', None) is not None:
+                self.voice_interface.close()
+            if getattr(self, 'history', None) is not None:
+                self.end_session()
+                self.history.stop()
+            if hasattr(self, 'speech_service'):
+                self.speech_service.stop()
             cv2.destroyAllWindows()
             print("Cleanup complete")
         except Exception as e:
@@ -156,12 +418,71 @@ class CPRTrainingApp:
             print("Traceback:")
             traceback.print_exc()
 
+def parse_args():
+    """Parse app options, leaving anything else for Qt"""
+    parser = argparse.ArgumentParser(description="Interactive CPR training module")
+    parser.add_argument("--source", default="0", help=f"Frames to analyze: {SOURCE_HELP} (default: camera 0)")
+    parser.add_argument("--fast", action="store_true",
+                        help="Read files, replays and synthetic sources as fast as possible, not in real time")
+    parser.add_argument("--inference-interval", type=int, default=1,
+                        help="Run pose every Nth frame and predict landmarks in between")
+    parser.add_argument("--inference-budget", type=float, default=None,
+                        help="Run pose at most once per this many seconds (overrides the interval)")
+    parser.add_argument("--pose-backend", choices=list(BACKENDS), default="mediapipe",
+                        help="Pose estimation backend")
+    parser.add_argument("--model-complexity", type=int, choices=[0, 1, 2],
+                        help="MediaPipe Pose model complexity")
+    parser.add_argument("--pose-model", help="Model file for the mediapipe-tasks or movenet backends")
+    parser.add_argument("--running-mode", choices=["video", "live_stream"],
+                        help="Running mode for the mediapipe-tasks backend")
+    parser.add_argument("--metrics-port", type=int, default=9108,
+                        help="Port for the local Prometheus metrics endpoint (0 disables it)")
+    parser.add_argument("--record", metavar="PATH",
+                        help="Save the session's pose landmarks to PATH for replay with batch_score.py")
+    parser.add_argument("--recognizer", choices=list(RECOGNIZERS), default="vosk",
+                        help="Speech recognizer for voice commands (vosk and pocketsphinx run offline)")
+    parser.add_argument("--speech-model", help="Model directory for the vosk or pocketsphinx recognizer")
+    parser.add_argument("--speech-cache", default="cache/speech",
+                        help="Directory of pre-rendered feedback clips ('' speaks everything live)")
+    parser.add_argument("--history", default="sessions.db",
+                        help="SQLite training history to add this session to ('' disables it)")
+    parser.add_argument("--trainee", default=getpass.getuser(), help="Trainee name for the history")
+    parser.add_argument("--ui-rate", type=float, default=10.0,
+                        help="Metric label refreshes per second, independent of the video")
+    args, qt_args = parser.parse_known_args()
+    if args.ui_rate <= 0:
+        parser.error("--ui-rate must be greater than 0")
+    return args, qt_args
+
+def pose_options_from_args(args) -> dict:
+    """Collect pose backend options given on the command line"""
+    return {
+        'model_complexity': args.model_complexity,
+        'model_path': args.pose_model,
+        'running_mode': args.running_mode
+    }
+
 def main():
     try:
+        args, qt_args = parse_args()
         print("Creating QApplication...")
-        app = QApplication(sys.argv)
+        app = QApplication(sys.argv[:1] + qt_args)
         print("Creating CPR Training App...")
-        cpr_app = CPRTrainingApp()
+        cpr_app = CPRTrainingApp(
+            inference_interval=args.inference_interval,
+            inference_budget=args.inference_budget,
+            pose_backend=args.pose_backend,
+            pose_options=pose_options_from_args(args),
+            metrics_port=args.metrics_port,
+            record_path=args.record,
+            recognizer=args.recognizer,
+            recognizer_options={'model_path': args.speech_model},
+            speech_cache=args.speech_cache,
+            history_path=args.history,
+            trainee=args.trainee,
+            ui_rate=args.ui_rate,
+            source=args.source,
+            realtime=not args.fast)
         
         print("Running application...")
         sys.exit(cpr_app.run())
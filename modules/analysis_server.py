@@ -0,0 +1,272 @@
+import json
+import multiprocessing
+import os
+import re
+import struct
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .instrumentation import MetricsRegistry
+from .websocket import WebSocket, WebSocketClosed, OP_BINARY
+
+# Binary client messages are a little-endian float64 capture timestamp in
+# seconds followed by the JPEG bytes. Text messages are JSON landmarks
+# computed by the client: {"t": seconds, "landmarks": [[x, y, z, visibility], ...]}
+# with 33 MediaPipe-indexed rows, or "landmarks": null when no pose was found.
+FRAME_HEADER = struct.Struct("<d")
+
+_SESSION_PATH = re.compile(r"^/session/([A-Za-z0-9_-]{1,64})$")
+
+def _analysis_worker(requests, results, pose_backend: str, pose_options: Optional[dict]):
+    """Worker process: keeps the analyzer of every session routed to it
+
+    Each session has its own CPRVisionAnalyzer and CPRFeedback; the pose
+    model is shared and only created once a client sends camera frames.
+    """
+    import signal
+    import cv2
+    from .vision import CPRVisionAnalyzer
+    from .feedback import CPRFeedback
+    from .speech import SpeechService
+    from .pose_backends import (LeasedPoseBackend, NUM_LANDMARKS, create_pose_backend)
+
+    # Ctrl+C reaches the whole process group; the server shuts workers down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # One process per core already; extra OpenCV threads only oversubscribe
+    cv2.setNumThreads(1)
+    backend = None
+    previous = None
+    sessions = {}
+    # Cues are returned to the client to speak; nothing is spoken here
+    silent_speech = SpeechService()
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        kind, session_id, seq, timestamp, payload = message
+        try:
+            if kind == "close":
+                sessions.pop(session_id, None)
+                continue
+            if session_id not in sessions:
+                sessions[session_id] = (CPRVisionAnalyzer(pose_backend=LeasedPoseBackend()),
+                                        CPRFeedback(silent_speech))
+            analyzer, feedback = sessions[session_id]
+
+            if kind == "frame":
+                if backend is None:
+                    backend = create_pose_backend(pose_backend, **(pose_options or {}))
+                if session_id != previous:
+                    # Tracking state in the model belongs to another trainee
+                    backend.reset()
+                    previous = session_id
+                analyzer.pose.backend = backend
+                frame = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+                metrics = analyzer.analyze_frame(frame, timestamp) if frame is not None else None
+            else:
+                metrics = None
+                if payload:
+                    landmarks = np.frombuffer(payload, dtype=np.float32).reshape(NUM_LANDMARKS, 4)
+                    metrics = analyzer.analyze_landmarks(landmarks, timestamp)
+
+            result = {'seq': seq, 't': timestamp, 'detected': metrics is not None}
+            if metrics is not None:
+                result.update(feedback.get_visual_feedback(metrics))
+                result['count'] = metrics.compression_count
+                result['cue'] = feedback.provide_feedback(metrics, timestamp)
+            results.put((session_id, result))
+        except Exception as e:
+            traceback.print_exc()
+            results.put((session_id, {'seq': seq, 't': timestamp, 'error': str(e)}))
+    if backend is not None:
+        backend.close()
+
+class _Route:
+    """Server-side state of one connected session"""
+
+    def __init__(self, session_id: str, worker: int, ws: WebSocket):
+        self.session_id = session_id
+        self.worker = worker
+        self.ws = ws
+        self.lock = threading.Lock()
+        self.in_flight = False
+        self.pending = None  # newest message waiting for the in-flight one
+        self.seq = 0
+        self.received = 0
+        self.dropped = 0
+        self.results = 0
+
+class AnalysisServer(threading.Thread):
+    """Websocket analysis service for remote trainees
+
+    Every session is pinned to one worker process that holds its tracking
+    state, and new sessions go to the least loaded worker. Each session
+    has at most one message being analyzed; while it is busy only the
+    newest message is kept, so slow clients lose frames instead of
+    building up latency or memory.
+    """
+
+    def __init__(self, port: int = 8765, host: str = "127.0.0.1", workers: Optional[int] = None,
+                 pose_backend: str = "mediapipe", pose_options: Optional[dict] = None,
+                 max_sessions: int = 64, registry: Optional[MetricsRegistry] = None):
+        super().__init__(name="AnalysisServer", daemon=True)
+        self.max_sessions = max_sessions
+        self.routes: Dict[str, _Route] = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self._closed_totals = {'received': 0, 'dropped': 0, 'results': 0}
+
+        # Spawn gives every worker a clean MediaPipe runtime
+        context = multiprocessing.get_context("spawn")
+        self._results = context.Queue()
+        self._requests = []
+        self._processes = []
+        self.worker_sessions: List[int] = []
+        for _ in range(workers or os.cpu_count() or 1):
+            requests = context.Queue()
+            process = context.Process(target=_analysis_worker, daemon=True,
+                                      args=(requests, self._results, pose_backend, pose_options))
+            self._requests.append(requests)
+            self._processes.append(process)
+            self.worker_sessions.append(0)
+        self._dispatcher = threading.Thread(target=self._dispatch, name="ResultDispatcher", daemon=True)
+
+        if registry is not None:
+            registry.gauge("server_sessions", "Connected analysis sessions", lambda: len(self.routes))
+            registry.gauge("server_messages_total", "Frames or landmark sets received",
+                           lambda: self._total('received'), kind="counter")
+            registry.gauge("server_dropped_total", "Messages dropped for busy sessions",
+                           lambda: self._total('dropped'), kind="counter")
+            registry.gauge("server_results_total", "Results sent to clients",
+                           lambda: self._total('results'), kind="counter")
+            registry.gauge("server_rejected_sessions_total", "Sessions refused at capacity",
+                           lambda: self.rejected, kind="counter")
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                match = _SESSION_PATH.match(self.path.split('?')[0])
+                if not match:
+                    self.send_error(404)
+                    return
+                server._serve_session(self, match.group(1))
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+
+    def _total(self, field: str) -> int:
+        with self._lock:
+            return self._closed_totals[field] + sum(getattr(route, field) for route in self.routes.values())
+
+    def run(self):
+        for process in self._processes:
+            process.start()
+        self._dispatcher.start()
+        self.server.serve_forever()
+
+    def _open_route(self, session_id: str, ws: WebSocket) -> Optional[_Route]:
+        with self._lock:
+            if len(self.routes) >= self.max_sessions or session_id in self.routes:
+                self.rejected += 1
+                return None
+            worker = min(range(len(self.worker_sessions)), key=self.worker_sessions.__getitem__)
+            self.worker_sessions[worker] += 1
+            route = _Route(session_id, worker, ws)
+            self.routes[session_id] = route
+            return route
+
+    def _close_route(self, route: _Route):
+        with self._lock:
+            if self.routes.pop(route.session_id, None) is not None:
+                self.worker_sessions[route.worker] -= 1
+                for field in self._closed_totals:
+                    self._closed_totals[field] += getattr(route, field)
+        self._requests[route.worker].put(("close", route.session_id, 0, 0.0, b""))
+
+    def _serve_session(self, handler: BaseHTTPRequestHandler, session_id: str):
+        ws = WebSocket.accept(handler)
+        if ws is None:
+            return
+        route = self._open_route(session_id, ws)
+        if route is None:
+            ws.close(1013)  # try again later
+            return
+        try:
+            ws.send_json({'session': session_id, 'worker': route.worker})
+            while True:
+                opcode, payload = ws.recv()
+                if opcode == OP_BINARY:
+                    if len(payload) <= FRAME_HEADER.size:
+                        continue
+                    timestamp = FRAME_HEADER.unpack_from(payload)[0]
+                    self._submit(route, "frame", timestamp, payload[FRAME_HEADER.size:])
+                else:
+                    message = json.loads(payload)
+                    if not isinstance(message, dict):
+                        raise ValueError("expected a JSON object")
+                    landmarks = message.get('landmarks')
+                    data = b"" if landmarks is None else np.asarray(landmarks, dtype=np.float32).tobytes()
+                    self._submit(route, "landmarks", float(message['t']), data)
+        except (WebSocketClosed, OSError):
+            pass
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"Bad message from session {session_id}: {e}")
+        finally:
+            ws.close()
+            self._close_route(route)
+
+    def _submit(self, route: _Route, kind: str, timestamp: float, payload: bytes):
+        with route.lock:
+            route.received += 1
+            route.seq += 1
+            message = (kind, route.session_id, route.seq, timestamp, payload)
+            if route.in_flight:
+                if route.pending is not None:
+                    route.dropped += 1
+                route.pending = message
+                return
+            route.in_flight = True
+        self._requests[route.worker].put(message)
+
+    def _dispatch(self):
+        """Send worker results to their clients and release each session's next message"""
+        while True:
+            item = self._results.get()
+            if item is None:
+                break
+            session_id, result = item
+            with self._lock:
+                route = self.routes.get(session_id)
+            if route is None:
+                continue
+            with route.lock:
+                result['dropped'] = route.dropped
+                message, route.pending = route.pending, None
+                route.in_flight = message is not None
+                route.results += 1
+            if message is not None:
+                self._requests[route.worker].put(message)
+            try:
+                route.ws.send_json(result)
+            except WebSocketClosed:
+                pass
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        for requests in self._requests:
+            requests.put(None)
+        for process in self._processes:
+            process.join(2.0)
+        self._results.put(None)
+        self._dispatcher.join(1.0)
@@ -0,0 +1,338 @@
+import queue
+import threading
+import time
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .recognizers import SAMPLE_RATE, CHUNK_SAMPLES, read_wav
+from .instrumentation import MetricsRegistry
+
+class AudioRing:
+    """Preallocated ring of 16-bit samples addressed by absolute sample index
+
+    One thread writes, any thread reads. Each written chunk also records
+    when it was captured, so readers can tell how old the audio is.
+    """
+
+    def __init__(self, seconds: float = 10.0):
+        self.capacity = int(seconds * SAMPLE_RATE)
+        self._samples = np.zeros(self.capacity, dtype=np.int16)
+        self._times = np.zeros(self.capacity // CHUNK_SAMPLES + 1)
+        self.written = 0  # samples written since the start, never wraps
+        self.condition = threading.Condition()
+
+    def write(self, samples: np.ndarray):
+        n = len(samples)
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        self._samples[start:start + first] = samples[:first]
+        self._samples[:n - first] = samples[first:]
+        self._times[(self.written // CHUNK_SAMPLES) % len(self._times)] = time.perf_counter()
+        with self.condition:
+            self.written += n
+            self.condition.notify_all()
+
+    def oldest(self) -> int:
+        """Index of the oldest sample still in the ring"""
+        return max(0, self.written - self.capacity)
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """Copy samples [start, end); start must still be in the ring"""
+        first = start % self.capacity
+        n = end - start
+        if first + n <= self.capacity:
+            return self._samples[first:first + n].copy()
+        return np.concatenate([self._samples[first:], self._samples[:n - (self.capacity - first)]])
+
+    def captured_at(self, index: int) -> float:
+        """perf_counter() time at which the chunk holding a sample was captured"""
+        return float(self._times[(index // CHUNK_SAMPLES) % len(self._times)])
+
+class VoiceActivityDetector:
+    """Energy and zero-crossing-rate voice activity detection on 20 ms frames
+
+    A frame is voiced when its level is well above the adaptive noise
+    floor and its zero-crossing rate is in the range of speech. Compression
+    thumps and manikin clicks are low-frequency and short; fan hiss and
+    handling noise cross zero far more often. Speech starts after
+    start_frames voiced frames in a row, which also rejects isolated
+    impacts, and ends after end_frames unvoiced ones.
+    """
+
+    def __init__(self, level_ratio: float = 3.0, min_level: float = 150.0,
+                 zcr_range: Tuple[float, float] = (0.015, 0.4), start_frames: int = 4,
+                 end_frames: int = 25, floor_adapt: float = 0.05):
+        self.level_ratio = level_ratio
+        self.min_level = min_level  # RMS of 16-bit samples
+        self.zcr_range = zcr_range  # crossings per sample
+        self.start_frames = start_frames
+        self.end_frames = end_frames
+        self.floor_adapt = floor_adapt
+        self.reset()
+
+    def reset(self):
+        self.noise_floor = self.min_level / self.level_ratio
+        self.end_speech()
+
+    def end_speech(self):
+        """Forget any speech in progress, keeping the learned noise floor"""
+        self.in_speech = False
+        self._run = 0  # voiced frames in a row, or unvoiced ones during speech
+
+    def classify(self, samples: np.ndarray) -> np.ndarray:
+        """Voiced flag for each complete frame, computed for the whole block at once"""
+        count = len(samples) // CHUNK_SAMPLES
+        frames = samples[:count * CHUNK_SAMPLES].reshape(count, CHUNK_SAMPLES).astype(np.float32)
+        level = np.sqrt(np.einsum('ij,ij->i', frames, frames) / CHUNK_SAMPLES)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (CHUNK_SAMPLES - 1)
+        threshold = max(self.min_level, self.noise_floor * self.level_ratio)
+        voiced = (level > threshold) & (zcr >= self.zcr_range[0]) & (zcr <= self.zcr_range[1])
+        quiet = level[~voiced]
+        if len(quiet) and not self.in_speech:
+            # Follow the room's noise, but never from frames that look like speech
+            self.noise_floor += self.floor_adapt * (float(quiet.mean()) - self.noise_floor)
+        return voiced
+
+    def update(self, samples: np.ndarray) -> List[Tuple[str, int]]:
+        """Process a block and return ("start"|"end", frame offset) transitions
+
+        A start offset points at the first voiced frame of the run; an end
+        offset points just past the last voiced frame.
+        """
+        events = []
+        for i, voiced in enumerate(self.classify(samples)):
+            if not self.in_speech:
+                self._run = self._run + 1 if voiced else 0
+                if self._run >= self.start_frames:
+                    self.in_speech = True
+                    events.append(("start", i + 1 - self._run))
+                    self._run = 0
+            else:
+                self._run = 0 if voiced else self._run + 1
+                if self._run >= self.end_frames:
+                    self.in_speech = False
+                    events.append(("end", i + 1 - self._run))
+                    self._run = 0
+        return events
+
+class SpeechSegment:
+    """One utterance in the ring, from pre-roll to the end of speech
+
+    Iterating yields PCM chunks as soon as they are captured, so the
+    recognizer runs while the trainee is still talking.
+    """
+
+    def __init__(self, ring: AudioRing, start: int, onset: int):
+        self.ring = ring
+        self.start = start  # first sample, including pre-roll
+        self.onset_index = onset  # where the detector heard speech begin
+        self.end = None  # set by the capture thread when speech ends
+        self.position = start  # next sample to hand out
+
+    @property
+    def onset(self) -> float:
+        """Seconds from the segment start to the detected start of speech"""
+        return (self.onset_index - self.start) / SAMPLE_RATE
+
+    def __iter__(self) -> Iterator[bytes]:
+        ring = self.ring
+        while True:
+            with ring.condition:
+                while self.end is None and ring.written <= self.position:
+                    ring.condition.wait(0.5)
+                available = ring.written if self.end is None else min(self.end, ring.written)
+            # A consumer too slow for the ring skips the audio that was overwritten
+            self.position = max(self.position, ring.oldest())
+            if self.position >= available:
+                return
+            end = min(available, self.position + CHUNK_SAMPLES)
+            chunk = ring.read(self.position, end)
+            self.position = end
+            yield chunk.tobytes()
+
+class MicrophoneSource:
+    """Default input device through sounddevice, opened once and kept open"""
+
+    def __init__(self, device=None):
+        self.device = device
+        self.stream = None
+        self.overflows = 0
+
+    def open(self):
+        import sounddevice as sd
+        self.stream = sd.RawInputStream(samplerate=SAMPLE_RATE, channels=1, dtype='int16',
+                                        blocksize=CHUNK_SAMPLES, device=self.device)
+        self.stream.start()
+
+    def read(self, samples: int) -> Optional[bytes]:
+        data, overflowed = self.stream.read(samples)
+        if overflowed:
+            self.overflows += 1
+        return bytes(data)
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+
+class WavSource:
+    """WAV files played into the capture thread as if from a microphone
+
+    Files are separated by gap seconds of silence. With realtime=False the
+    audio is delivered as fast as it is consumed.
+    """
+
+    def __init__(self, paths: Sequence[str], realtime: bool = False, gap: float = 1.0):
+        silence = np.zeros(int(gap * SAMPLE_RATE), dtype=np.int16)
+        parts = []
+        for path in paths:
+            parts += [read_wav(path), silence]
+        self.samples = np.concatenate(parts) if parts else silence
+        self.realtime = realtime
+        self.position = 0
+        self.overflows = 0
+        self._next_time = 0.0
+
+    def open(self):
+        self._next_time = time.perf_counter()
+
+    def read(self, samples: int) -> Optional[bytes]:
+        if self.position >= len(self.samples):
+            return None
+        chunk = self.samples[self.position:self.position + samples]
+        self.position += len(chunk)
+        if self.realtime:
+            self._next_time += len(chunk) / SAMPLE_RATE
+            delay = self._next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return chunk.tobytes()
+
+    def close(self):
+        pass
+
+class AudioCapture(threading.Thread):
+    """Continuous audio capture cut into speech segments
+
+    The source is opened once and read for the whole session into a
+    preallocated ring buffer. Each detected utterance becomes a
+    SpeechSegment that starts pre_roll seconds before the detector fired,
+    so the first syllable is never clipped, and is capped at max_segment
+    seconds.
+    """
+
+    def __init__(self, source=None, ring_seconds: float = 10.0, pre_roll: float = 0.3,
+                 max_segment: float = 8.0, vad: Optional[VoiceActivityDetector] = None,
+                 metrics: Optional[MetricsRegistry] = None):
+        super().__init__(name="AudioCapture", daemon=True)
+        self.source = source or MicrophoneSource()
+        self.ring = AudioRing(ring_seconds)
+        self.vad = vad or VoiceActivityDetector()
+        self.pre_roll = int(pre_roll * SAMPLE_RATE)
+        self.max_segment = int(max_segment * SAMPLE_RATE)
+        self._segments = queue.Queue()
+        self._current = None
+        self._ignore_before = 0.0  # perf_counter() time before which new speech is ignored
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.finished = threading.Event()  # the source ran out, e.g. end of a WAV file
+        self.segments_detected = 0
+        self.segments_discarded = 0
+
+        if metrics is not None:
+            metrics.gauge("voice_segments_total", "Speech segments detected",
+                          lambda: self.segments_detected, kind="counter")
+            metrics.gauge("audio_overflows_total", "Audio input overflows (lost audio)",
+                          lambda: self.source.overflows, kind="counter")
+
+    def run(self):
+        try:
+            self.source.open()
+        except Exception as e:
+            print(f"Could not open audio input: {e}")
+            self.finished.set()
+            return
+        try:
+            while not self._stop_event.is_set():
+                pcm = self.source.read(CHUNK_SAMPLES)
+                if pcm is None:
+                    break
+                samples = np.frombuffer(pcm, dtype=np.int16)
+                block_start = self.ring.written
+                self.ring.write(samples)
+                with self._lock:
+                    for event, frame in self.vad.update(samples):
+                        self._on_event(event, block_start + frame * CHUNK_SAMPLES)
+                    current = self._current
+                    if current is not None and self.ring.written - current.start >= self.max_segment:
+                        self._end_segment(self.ring.written)
+        finally:
+            with self._lock:
+                if self._current is not None:
+                    self._end_segment(self.ring.written)
+            self.source.close()
+            self.finished.set()
+
+    def _on_event(self, event: str, index: int):
+        if event == "start" and self._current is None:
+            if self.ring.captured_at(index) <= self._ignore_before:
+                return  # still within a discarded window, e.g. the echo of a prompt
+            start = max(index - self.pre_roll, self.ring.oldest())
+            self._current = SpeechSegment(self.ring, start, index)
+            self.segments_detected += 1
+            self._segments.put(self._current)
+        elif event == "end" and self._current is not None:
+            self._end_segment(index)
+
+    def _end_segment(self, index: int):
+        with self.ring.condition:
+            self._current.end = max(index, self._current.start)
+            self.ring.condition.notify_all()
+        self._current = None
+
+    def next_segment(self, timeout: Optional[float] = None) -> Optional[SpeechSegment]:
+        """Wait for the next utterance; None on timeout or when the source has ended"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                return self._segments.get(timeout=0.1)
+            except queue.Empty:
+                if self.finished.is_set() and self._segments.empty():
+                    return None
+                if deadline is not None and time.monotonic() >= deadline:
+                    return None
+
+    def discard(self, start: float, end: float):
+        """Drop speech that began between perf_counter() times start and end
+
+        Used for our own prompts picked up by the microphone; speech that
+        began after end, such as a command right after a prompt, is kept.
+        end may lie in the future: speech starting before it is ignored
+        as it is detected.
+        """
+        def heard_between(segment: SpeechSegment) -> bool:
+            return start <= self.ring.captured_at(segment.onset_index) <= end
+
+        with self._lock:
+            self._ignore_before = max(self._ignore_before, end)
+            if self._current is not None and heard_between(self._current):
+                self._end_segment(self.ring.written)
+                self.vad.end_speech()
+            kept = []
+            while True:
+                try:
+                    segment = self._segments.get_nowait()
+                except queue.Empty:
+                    break
+                if heard_between(segment):
+                    self.segments_discarded += 1
+                else:
+                    kept.append(segment)
+            for segment in kept:
+                self._segments.put(segment)
+
+    def stop(self, timeout: float = 1.0):
+        self._stop_event.set()
+        self.join(timeout)
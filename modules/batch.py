@@ -0,0 +1,290 @@
+import csv
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, fields
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import cv2
+
+from .recording import RECORDING_EXTENSION, LandmarkRecorder, LandmarkReplay
+from .sources import SyntheticSource, open_source
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.webm')
+
+@dataclass
+class CompressionRecord:
+    video: str
+    index: int  # 1-based compression number within the session
+    timestamp: float  # seconds from the start of the video
+    compression_rate: float
+    compression_depth: float
+    compression_amplitude: float  # normalized wrist travel of the cycle
+    hand_x: float
+    hand_y: float
+    is_correct_position: bool
+
+@dataclass
+class SessionSummary:
+    video: str
+    duration: float  # seconds of video
+    frames: int
+    frames_with_pose: int
+    compressions: int
+    mean_rate: float
+    mean_depth: float
+    correct_position_pct: float
+    processing_time: float  # wall-clock seconds spent scoring
+    realtime_factor: float  # video seconds scored per wall-clock second
+    inference_runs: int = 0  # frames that ran pose instead of a prediction
+    pose_latency_ms: float = 0.0  # mean pose backend latency in this worker
+    landmark_drift: float = 0.0  # mean predicted-landmark error, when measured
+    feedback_cues: int = 0  # coaching cues the live feedback rules would have given
+    error: str = ""
+
+# One analyzer per worker process, created by _init_worker
+_worker_analyzer = None
+
+def _init_worker(inference_interval: int = 1, measure_drift: bool = False,
+                 pose_backend: str = "mediapipe", pose_options: Optional[dict] = None):
+    """Create the per-process analyzer and keep OpenCV single-threaded"""
+    global _worker_analyzer
+    # Workers are already one per core; extra threads only oversubscribe
+    cv2.setNumThreads(1)
+    from .vision import CPRVisionAnalyzer
+    from .pose_backends import create_pose_backend
+    _worker_analyzer = CPRVisionAnalyzer(
+        pose_backend=create_pose_backend(pose_backend, **(pose_options or {})),
+        inference_interval=inference_interval,
+        measure_drift=measure_drift)
+
+class SessionScorer:
+    """Accumulates per-frame metrics into compression records and a summary
+
+    Shared by video scoring and landmark replay so both produce identical
+    tables from identical metrics.
+    """
+
+    def __init__(self, video: str, feedback=None):
+        self.video = video
+        self.feedback = feedback  # optional CPRFeedback, to count the cues a trainee would hear
+        self.records: List[CompressionRecord] = []
+        self.frames = 0
+        self.frames_with_pose = 0
+        self.correct_frames = 0
+        self.depth_sum = 0.0
+        self.feedback_cues = 0
+
+    def add(self, timestamp: float, metrics) -> None:
+        """Account for one frame; metrics is None when no pose was found"""
+        self.frames += 1
+        if not metrics:
+            return
+        self.frames_with_pose += 1
+        self.depth_sum += metrics.compression_depth
+        if metrics.is_correct_position:
+            self.correct_frames += 1
+        for index in range(len(self.records) + 1, metrics.compression_count + 1):
+            self.records.append(CompressionRecord(
+                video=self.video,
+                index=index,
+                timestamp=timestamp,
+                compression_rate=metrics.compression_rate,
+                compression_depth=metrics.compression_depth,
+                compression_amplitude=metrics.compression_amplitude,
+                hand_x=metrics.hand_position[0],
+                hand_y=metrics.hand_position[1],
+                is_correct_position=metrics.is_correct_position
+            ))
+        if self.feedback is not None and self.feedback.provide_feedback(metrics, timestamp):
+            self.feedback_cues += 1
+
+    def summary(self, duration: float, processing_time: float, **extra) -> SessionSummary:
+        rated = [r.compression_rate for r in self.records if r.compression_rate > 0]
+        with_pose = self.frames_with_pose
+        return SessionSummary(
+            video=self.video,
+            duration=duration,
+            frames=self.frames,
+            frames_with_pose=with_pose,
+            compressions=len(self.records),
+            mean_rate=sum(rated) / len(rated) if rated else 0.0,
+            mean_depth=self.depth_sum / with_pose if with_pose else 0.0,
+            correct_position_pct=100.0 * self.correct_frames / with_pose if with_pose else 0.0,
+            processing_time=processing_time,
+            realtime_factor=duration / processing_time if processing_time > 0 else 0.0,
+            feedback_cues=self.feedback_cues,
+            **extra
+        )
+
+def _silent_feedback():
+    """Feedback engine whose speech service is never started, so nothing is spoken"""
+    from .feedback import CPRFeedback
+    from .speech import SpeechService
+    return CPRFeedback(SpeechService())
+
+def recording_path(video: str, record_dir: str) -> str:
+    """Landmark recording file for a video inside record_dir"""
+    name = os.path.splitext(os.path.basename(video))[0]
+    return os.path.join(record_dir, name + RECORDING_EXTENSION)
+
+def score_video(path: str, frame_stride: int = 1, analyzer=None,
+                record_dir: Optional[str] = None) -> Tuple[SessionSummary, List[CompressionRecord]]:
+    """Score a recorded session, returning its summary and per-compression records
+
+    path is a video file or any other finite frame source spec, such as
+    synthetic:100:60 for a minute of generated compressions. With
+    record_dir the landmarks behind every frame are saved there so the
+    session can be re-scored later with replay_recording() without
+    decoding or running pose again.
+    """
+    if analyzer is None:
+        if _worker_analyzer is None:
+            _init_worker()
+        analyzer = _worker_analyzer
+    analyzer.reset()
+    inference_start = analyzer.inference_count
+    drift_total, drift_samples = analyzer.drift_total, analyzer.drift_samples
+
+    start = time.perf_counter()
+    source = open_source(path, realtime=False)
+    if not source.is_open():
+        return SessionSummary(path, 0.0, 0, 0, 0, 0.0, 0.0, 0.0, 0.0, 0.0,
+                              error="Could not open video"), []
+    if not source.media_clock or (isinstance(source, SyntheticSource) and source.duration is None):
+        source.release()
+        return SessionSummary(path, 0.0, 0, 0, 0, 0.0, 0.0, 0.0, 0.0, 0.0,
+                              error="Only sources that end can be batch scored"), []
+
+    if record_dir:
+        analyzer.recorder = LandmarkRecorder(recording_path(path, record_dir))
+
+    fps = source.fps
+    scorer = SessionScorer(path, _silent_feedback())
+    timestamp = 0.0
+    frame_index = -1
+    try:
+        while True:
+            frame_index += 1
+            if frame_index % frame_stride:
+                # grab() skips the frame without decoding it
+                if not source.grab():
+                    break
+                continue
+
+            ret, frame = source.read()
+            if not ret:
+                break
+
+            timestamp = source.position()
+            scorer.add(timestamp, analyzer.analyze_frame(frame, timestamp))
+    finally:
+        source.release()
+        if analyzer.recorder is not None:
+            analyzer.recorder.close()
+            analyzer.recorder = None
+
+    processing_time = time.perf_counter() - start
+    drift_samples = analyzer.drift_samples - drift_samples
+    summary = scorer.summary(
+        duration=max(timestamp, frame_index / fps),
+        processing_time=processing_time,
+        inference_runs=analyzer.inference_count - inference_start,
+        pose_latency_ms=analyzer.pose.latency_summary()['mean_ms'],
+        landmark_drift=(analyzer.drift_total - drift_total) / drift_samples if drift_samples else 0.0
+    )
+    return summary, scorer.records
+
+def replay_recording(path: str, analyzer=None) -> Tuple[SessionSummary, List[CompressionRecord]]:
+    """Re-score a landmark recording through the metrics and feedback logic
+
+    Nothing is decoded and no pose model runs, so replays are fast and give
+    the same result every time; use them to check changes to the compression
+    detector or feedback rules against recorded sessions.
+    """
+    from .vision import CPRVisionAnalyzer
+    from .pose_backends import NullPoseBackend
+    if analyzer is None:
+        analyzer = CPRVisionAnalyzer(pose_backend=NullPoseBackend(), use_roi=False)
+    analyzer.reset()
+
+    start = time.perf_counter()
+    replay = LandmarkReplay(path)
+    scorer = SessionScorer(path, _silent_feedback())
+    for timestamp, landmarks, _ in replay:
+        metrics = analyzer.analyze_landmarks(landmarks, timestamp) if landmarks is not None else None
+        scorer.add(timestamp, metrics)
+
+    summary = scorer.summary(duration=replay.duration,
+                             processing_time=time.perf_counter() - start)
+    return summary, scorer.records
+
+def _score_video_safe(path: str, frame_stride: int,
+                      record_dir: Optional[str] = None) -> Tuple[SessionSummary, List[CompressionRecord]]:
+    """Worker entry point that reports failures instead of raising"""
+    try:
+        return score_video(path, frame_stride, record_dir=record_dir)
+    except Exception as e:
+        traceback.print_exc()
+        return SessionSummary(path, 0.0, 0, 0, 0, 0.0, 0.0, 0.0, 0.0, 0.0, error=str(e)), []
+
+def find_videos(paths: Iterable[str]) -> List[str]:
+    """Expand directories into the video and landmark recording files they contain"""
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                videos.extend(os.path.join(root, name) for name in sorted(names)
+                              if name.lower().endswith(VIDEO_EXTENSIONS + (RECORDING_EXTENSION,)))
+        else:
+            videos.append(path)
+    return videos
+
+def score_videos(paths: List[str], workers: Optional[int] = None, frame_stride: int = 1,
+                 inference_interval: int = 1, measure_drift: bool = False,
+                 pose_backend: str = "mediapipe",
+                 pose_options: Optional[dict] = None,
+                 record_dir: Optional[str] = None) -> Iterator[Tuple[SessionSummary, List[CompressionRecord]]]:
+    """Score videos across a process pool, yielding results as they finish"""
+    # Every worker loads its own pose runtime, so never start more than there are videos
+    workers = min(workers or os.cpu_count() or 1, max(len(paths), 1))
+    # Spawn gives every worker a clean MediaPipe runtime
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker,
+                             initargs=(inference_interval, measure_drift,
+                                       pose_backend, pose_options)) as executor:
+        futures = [executor.submit(_score_video_safe, path, frame_stride, record_dir) for path in paths]
+        for future in as_completed(futures):
+            yield future.result()
+
+def write_results(summaries: List[SessionSummary], records: List[CompressionRecord],
+                  output_dir: str, fmt: str = "csv") -> List[str]:
+    """Write session and compression tables, returning the files written"""
+    os.makedirs(output_dir, exist_ok=True)
+    tables = [("sessions", SessionSummary, summaries), ("compressions", CompressionRecord, records)]
+    written = []
+
+    if fmt == "parquet":
+        try:
+            import pandas as pd
+        except ImportError:
+            raise RuntimeError("Parquet output requires pandas and pyarrow: pip install pandas pyarrow")
+        for name, row_type, rows in tables:
+            path = os.path.join(output_dir, f"{name}.parquet")
+            columns = [f.name for f in fields(row_type)]
+            pd.DataFrame([asdict(row) for row in rows], columns=columns).to_parquet(path, index=False)
+            written.append(path)
+        return written
+
+    for name, row_type, rows in tables:
+        path = os.path.join(output_dir, f"{name}.csv")
+        with open(path, "w", newline="") as out:
+            writer = csv.DictWriter(out, fieldnames=[f.name for f in fields(row_type)])
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(asdict(row))
+        written.append(path)
+    return written
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import threading
+import wave
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .recognizers import read_wav
+
+def is_wav(path: str) -> bool:
+    """Whether a file is a RIFF WAVE file, whatever its extension says"""
+    with open(path, 'rb') as f:
+        header = f.read(12)
+    return header[:4] == b"RIFF" and header[8:12] == b"WAVE"
+
+class ClipCache:
+    """Speech clips rendered once and kept on disk
+
+    Each clip is keyed by its text, voice and rate, so changing a message
+    or the voice simply leads to a new file and a stale clip can never be
+    played. prune() removes clips no current message uses.
+    """
+
+    def __init__(self, directory: str = "cache/speech", voice: Optional[str] = None,
+                 rate: int = 150, sample_rate: int = 22050):
+        self.directory = directory
+        self.voice = voice
+        self.rate = rate
+        self.sample_rate = sample_rate  # clips are resampled to this on load
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.voice}|{self.rate}|{text}".encode('utf-8')).hexdigest()[:16]
+
+    def path(self, text: str) -> str:
+        return os.path.join(self.directory, self.key(text) + ".wav")
+
+    def missing(self, texts: Iterable[str]) -> List[str]:
+        """Texts that have no clip yet"""
+        return [text for text in dict.fromkeys(texts) if not os.path.exists(self.path(text))]
+
+    def render(self, texts: Iterable[str]) -> int:
+        """Synthesize every missing clip; returns the number rendered"""
+        missing = self.missing(texts)
+        if not missing:
+            return 0
+        import pyttsx3
+        engine = pyttsx3.init()
+        engine.setProperty('rate', self.rate)
+        if self.voice:
+            engine.setProperty('voice', self.voice)
+        os.makedirs(self.directory, exist_ok=True)
+        for text in missing:
+            engine.save_to_file(text, self.path(text))
+        engine.runAndWait()
+
+        # Some drivers ignore the extension, e.g. macOS writes AIFF; those
+        # clips cannot be played, so remove them and speak the texts live
+        rendered = []
+        for text in missing:
+            path = self.path(text)
+            if not os.path.exists(path):
+                continue
+            if not is_wav(path):
+                print(f"Speech engine did not write a WAV file for {path}; speaking it live")
+                os.remove(path)
+                continue
+            rendered.append(text)
+
+        # Readable index of what each file says
+        manifest_path = os.path.join(self.directory, "manifest.json")
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        for text in rendered:
+            manifest[self.key(text)] = {'text': text, 'voice': self.voice, 'rate': self.rate}
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=1)
+        return len(rendered)
+
+    def load(self, texts: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Samples of every cached clip among texts, ready to play"""
+        clips = {}
+        for text in dict.fromkeys(texts):
+            path = self.path(text)
+            if not os.path.exists(path):
+                continue
+            try:
+                clips[text] = read_wav(path, self.sample_rate)
+            except (OSError, EOFError, ValueError, wave.Error) as e:
+                # e.g. a truncated file from an interrupted render; speak it live instead
+                print(f"Skipping speech clip {path}: {e}")
+        return clips
+
+    def prune(self, texts: Iterable[str]) -> int:
+        """Delete clips not used by any of texts; returns the number deleted"""
+        if not os.path.isdir(self.directory):
+            return 0
+        keep = {self.key(text) + ".wav" for text in texts}
+        removed = 0
+        for name in os.listdir(self.directory):
+            if name.endswith(".wav") and name not in keep:
+                os.remove(os.path.join(self.directory, name))
+                removed += 1
+        manifest_path = os.path.join(self.directory, "manifest.json")
+        if removed and os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            manifest = {key: entry for key, entry in manifest.items() if key + ".wav" in keep}
+            with open(manifest_path, 'w') as f:
+                json.dump(manifest, f, indent=1)
+        return removed
+
+class ClipPlayer:
+    """Plays clips through one output stream that stays open for the session
+
+    play() returns at once; the audio callback copies samples straight
+    from memory, so a cue starts within one audio block.
+    """
+
+    def __init__(self, sample_rate: int = 22050, device=None):
+        import sounddevice as sd
+        self._lock = threading.Lock()
+        self._clip = None
+        self._position = 0
+        self._done = threading.Event()
+        self._done.set()
+        self.stream = sd.OutputStream(samplerate=sample_rate, channels=1, dtype='int16',
+                                      latency='low', device=device, callback=self._callback)
+        self.stream.start()
+
+    def _callback(self, outdata, frames, time_info, status):
+        with self._lock:
+            clip = self._clip
+            if clip is None:
+                outdata.fill(0)
+                return
+            chunk = clip[self._position:self._position + frames]
+            outdata[:len(chunk), 0] = chunk
+            outdata[len(chunk):] = 0
+            self._position += frames
+            if self._position >= len(clip):
+                self._clip = None
+                self._done.set()
+
+    def play(self, samples: np.ndarray) -> threading.Event:
+        """Start a clip, replacing any still playing; the event is set when it ends"""
+        with self._lock:
+            self._clip = samples
+            self._position = 0
+            self._done.clear()
+        return self._done
+
+    def stop(self):
+        with self._lock:
+            self._clip = None
+            self._done.set()
+
+    def close(self):
+        self.stop()
+        self.stream.stop()
+        self.stream.close()
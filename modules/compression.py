@@ -0,0 +1,196 @@
+import numpy as np
+from dataclasses import dataclass
+
+@dataclass
+class CompressionEstimate:
+    rate: float  # compressions per minute
+    count: int  # compressions detected since the last reset
+    amplitude: float  # peak-to-trough height of the last cycle, in signal units
+    new_compression: bool  # True if this sample confirmed a new compression
+
+class CompressionDetector:
+    """Detects chest compressions in the wrist-height signal
+
+    Samples go into a preallocated ring buffer and every update works on a
+    bounded window of it, so the per-frame cost is constant. Compressions are
+    counted from peaks in the detrended signal and the rate comes from the
+    dominant frequency of a windowed FFT, cross-checked against peak spacing.
+    """
+
+    def __init__(self, capacity: int = 256, window_seconds: float = 4.0,
+                 min_rate: float = 50.0, max_rate: float = 180.0,
+                 min_amplitude: float = 0.015, resample_rate: float = 30.0,
+                 fft_size: int = 512):
+        self.capacity = capacity
+        self.window_seconds = window_seconds
+        self.min_rate = min_rate  # cpm
+        self.max_rate = max_rate  # cpm
+        self.min_amplitude = min_amplitude  # smallest peak-to-trough motion counted
+        self.min_interval = 60.0 / max_rate  # seconds between compressions
+        self._smoothing = np.full(3, 1.0 / 3.0)
+
+        # Each sample is written twice so the newest `capacity` samples are
+        # always one contiguous slice and never need to be reordered
+        self._times = np.zeros(2 * capacity)
+        self._values = np.zeros(2 * capacity)
+
+        # Fixed-size uniform grid for the FFT rate estimate
+        self.resample_rate = resample_rate
+        grid_size = int(window_seconds * resample_rate)
+        self._grid_offsets = np.arange(grid_size) / resample_rate - window_seconds
+        self._taper = np.hanning(grid_size)
+        self.fft_size = max(fft_size, grid_size)
+        freqs = np.fft.rfftfreq(self.fft_size, d=1.0 / resample_rate)
+        self._band = np.flatnonzero((freqs >= min_rate / 60.0) & (freqs <= max_rate / 60.0))
+        self._freq_step = freqs[1]
+
+        self.reset()
+
+    def reset(self):
+        """Forget all samples and counts"""
+        self._head = 0
+        self._size = 0
+        self.count = 0
+        self.rate = 0.0
+        self.amplitude = 0.0
+        self.last_peak_time = None
+        self._peak_times = np.empty(0)
+
+    def _window(self):
+        """Return (times, values) for samples inside the analysis window"""
+        end = self._head + self.capacity
+        times = self._times[end - self._size:end]
+        values = self._values[end - self._size:end]
+        start = np.searchsorted(times, times[-1] - self.window_seconds)
+        return times[start:], values[start:]
+
+    def update(self, timestamp: float, value: float) -> CompressionEstimate:
+        """Add a sample and return the current compression estimate"""
+        if self._size and timestamp <= self._times[self._head + self.capacity - 1]:
+            # Out-of-order or repeated sample, keep the previous estimate
+            return CompressionEstimate(self.rate, self.count, self.amplitude, False)
+
+        self._times[self._head] = self._times[self._head + self.capacity] = timestamp
+        self._values[self._head] = self._values[self._head + self.capacity] = value
+        self._head = (self._head + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+        times, values = self._window()
+        if len(times) < 8:
+            return CompressionEstimate(self.rate, self.count, self.amplitude, False)
+
+        # Remove posture drift with a least-squares linear detrend
+        t = times - times.mean()
+        x = values - values.mean()
+        t_var = np.dot(t, t)
+        if t_var > 0:
+            x = x - t * (np.dot(t, x) / t_var)
+
+        new_compression = self._count_peaks(times, x)
+        self.rate = self._estimate_rate(times, x)
+        return CompressionEstimate(self.rate, self.count, self.amplitude, new_compression)
+
+    def _find_peaks(self, times: np.ndarray, x: np.ndarray) -> np.ndarray:
+        """Indices of the highest sample in each completed positive lobe"""
+        # Light smoothing keeps landmark jitter from splitting lobes
+        x = np.convolve(x, self._smoothing, mode='same')
+        positive = x > 0
+        rising = np.flatnonzero(positive[1:] & ~positive[:-1]) + 1
+        falling = np.flatnonzero(~positive[1:] & positive[:-1]) + 1
+        if positive[0]:
+            rising = np.concatenate(([0], rising))
+        # A lobe only counts once the signal has come back down through zero
+        n = min(len(rising), len(falling))
+        rising, falling = rising[:n], falling[:n]
+        # Real compressions keep the hands low for a good part of a cycle
+        long_enough = times[falling] - times[rising] >= 0.3 * self.min_interval
+        rising, falling = rising[long_enough], falling[long_enough]
+        if len(rising) == 0:
+            return rising
+
+        # Label samples by lobe and pick each lobe's maximum in one sort
+        edges = np.zeros(len(x), dtype=np.int64)
+        edges[rising] += 1
+        edges[falling] -= 1
+        inside = np.cumsum(edges) > 0
+        lobe_id = np.cumsum(np.bincount(rising, minlength=len(x)))
+        members = np.flatnonzero(inside)
+        order = members[np.lexsort((x[members], lobe_id[members]))]
+        last_of_lobe = np.flatnonzero(np.diff(lobe_id[order], append=-1) != 0)
+        peaks = np.sort(order[last_of_lobe])
+
+        # Ignore lobes that are too small to be real compressions
+        threshold = max(0.5 * self.min_amplitude, 0.7 * x.std())
+        return peaks[x[peaks] > threshold]
+
+    def _count_peaks(self, times: np.ndarray, x: np.ndarray) -> bool:
+        """Count peaks not seen before; returns True if any were new"""
+        peaks = self._find_peaks(times, x)
+        self._peak_times = times[peaks]
+        if len(peaks) == 0:
+            return False
+
+        # Peak-to-trough height of each cycle from the minimum before the peak
+        bounds = np.concatenate(([0], peaks[:-1]))
+        troughs = np.minimum.reduceat(x, bounds)[:len(peaks)]
+        amplitudes = x[peaks] - troughs
+
+        peak_times = self._peak_times
+        if self.last_peak_time is None:
+            is_new = np.ones(len(peaks), dtype=bool)
+        else:
+            is_new = peak_times > self.last_peak_time + 0.5 * self.min_interval
+        is_new &= amplitudes >= self.min_amplitude
+        if not is_new.any():
+            return False
+
+        # Enforce the minimum spacing between newly counted compressions
+        last_time = self.last_peak_time
+        counted = 0
+        for index in np.flatnonzero(is_new):
+            # Half the minimum interval tolerates frame-time jitter at high rates
+            if last_time is not None and peak_times[index] - last_time < 0.5 * self.min_interval:
+                continue
+            last_time = peak_times[index]
+            self.amplitude = float(amplitudes[index])
+            counted += 1
+
+        self.count += counted
+        self.last_peak_time = last_time
+        return counted > 0
+
+    def _estimate_rate(self, times: np.ndarray, x: np.ndarray) -> float:
+        """Dominant compression frequency in cpm, or 0 when idle"""
+        # Treat the trainee as stopped if no compression for two slow cycles
+        if (self.last_peak_time is None or
+                times[-1] - self.last_peak_time > 2 * 60.0 / self.min_rate):
+            return 0.0
+
+        span = times[-1] - times[0]
+        peak_times = self._peak_times[self._peak_times >= times[0]]
+        if len(peak_times) < 2:
+            return 0.0
+        peak_rate = 0.0
+        if len(peak_times) >= 3:
+            peak_rate = 60.0 / np.median(np.diff(peak_times))
+        if span < 0.5 * self.window_seconds:
+            return float(peak_rate)
+
+        # Resample onto the fixed grid so the FFT cost never changes
+        grid = np.interp(times[-1] + self._grid_offsets, times, x)
+        spectrum = np.abs(np.fft.rfft(grid * self._taper, n=self.fft_size))
+        band = spectrum[self._band]
+        k = int(np.argmax(band))
+        offset = 0.0
+        if 0 < k < len(band) - 1:
+            # Parabolic interpolation between bins for sub-bin accuracy
+            a, b, c = np.log(band[k - 1:k + 2] + 1e-12)
+            denominator = a - 2 * b + c
+            if denominator != 0:
+                offset = 0.5 * (a - c) / denominator
+        fft_rate = (self._band[k] + offset) * self._freq_step * 60.0
+
+        # Non-sinusoidal strokes can lock the FFT onto a harmonic
+        if peak_rate and abs(fft_rate - peak_rate) > 0.2 * peak_rate:
+            return float(peak_rate)
+        return float(fft_rate)
@@ -0,0 +1,112 @@
+from PyQt6.QtWidgets import (QMainWindow, QWidget, QGridLayout, QVBoxLayout, QHBoxLayout,
+                             QLabel, QPushButton, QFrame)
+from PyQt6.QtCore import QTimer
+from PyQt6.QtGui import QKeySequence, QShortcut
+import math
+import numpy as np
+from typing import Callable, List, Optional
+
+from .ui import MetricLabel, VideoWidget
+
+class StationTile(QFrame):
+    """Video thumbnail and key metrics for one station"""
+
+    def __init__(self, name: str):
+        super().__init__()
+        self.setFrameShape(QFrame.Shape.StyledPanel)
+        self.layout = QVBoxLayout(self)
+
+        header = QHBoxLayout()
+        self.name_label = QLabel(name)
+        self.name_label.setStyleSheet("font-size: 15px; font-weight: bold;")
+        self.reset_button = QPushButton("Reset")
+        header.addWidget(self.name_label)
+        header.addStretch()
+        header.addWidget(self.reset_button)
+        self.layout.addLayout(header)
+
+        self.video_widget = VideoWidget()
+        self.video_widget.setMinimumSize(320, 240)
+        self.layout.addWidget(self.video_widget, 1)
+
+        self.rate_label = MetricLabel("Rate: -", "font-size: 13px; padding: 2px;")
+        self.depth_label = MetricLabel("Depth: -", "font-size: 13px; padding: 2px;")
+        self.position_label = MetricLabel("Position: -", "font-size: 13px; padding: 2px;")
+        self.count_label = MetricLabel("Compressions: 0", "font-size: 13px; padding: 2px;")
+        metrics_row = QHBoxLayout()
+        for label in [self.rate_label, self.depth_label, self.position_label, self.count_label]:
+            metrics_row.addWidget(label)
+        self.layout.addLayout(metrics_row)
+        self.pending_metrics = None  # (visual feedback or None, compression count)
+
+    def update_video_frame(self, frame: np.ndarray, overlay: Optional[Callable[[np.ndarray], None]] = None):
+        """Show a frame; the painter scales it to the tile without a separate resize"""
+        self.video_widget.show_frame(frame, overlay)
+
+    def update_metrics(self, metrics: dict, compression_count: int):
+        """Take get_visual_feedback() output; shown on the dashboard's next refresh tick"""
+        self.pending_metrics = (metrics, compression_count)
+
+    def clear_metrics(self):
+        """Show that no trainee is detected"""
+        self.pending_metrics = (None, None)
+
+    def refresh_metrics(self):
+        """Apply the newest metrics, touching only labels that changed"""
+        if self.pending_metrics is None:
+            return
+        metrics, compression_count = self.pending_metrics
+        self.pending_metrics = None
+        if metrics is None:
+            self.rate_label.set_value("Rate: -", 'idle')
+            self.depth_label.set_value("Depth: -", 'idle')
+            self.position_label.set_value("Position: -", 'idle')
+            return
+        self.rate_label.set_value(f"Rate: {metrics['rate_value']:.0f} cpm", metrics['rate_status'])
+        self.depth_label.set_value(f"Depth: {metrics['depth_value']:.1f} cm", metrics['depth_status'])
+        self.position_label.set_value("Position", metrics['position_status'])
+        self.count_label.set_value(f"Compressions: {compression_count}")
+
+class InstructorDashboard(QMainWindow):
+    """Grid of station tiles for the instructor"""
+
+    def __init__(self, station_names: List[str], columns: int = 0, metrics_rate: float = 10.0):
+        super().__init__()
+        self.setWindowTitle("CPR Training - Instructor Dashboard")
+        self.setGeometry(50, 50, 1600, 900)
+
+        self.central_widget = QWidget()
+        self.setCentralWidget(self.central_widget)
+        self.layout = QVBoxLayout(self.central_widget)
+        self.grid = QGridLayout()
+        self.layout.addLayout(self.grid, 1)
+
+        columns = columns or math.ceil(math.sqrt(len(station_names)))
+        self.tiles = []
+        for i, name in enumerate(station_names):
+            tile = StationTile(name)
+            self.grid.addWidget(tile, i // columns, i % columns)
+            self.tiles.append(tile)
+
+        # Tile metrics are shown at most metrics_rate times a second for all stations together
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self.refresh_metrics)
+        self.metrics_timer.start(max(1, int(1000 / metrics_rate)))
+
+        self.status_label = QLabel()
+        self.status_label.setStyleSheet("font-family: monospace; font-size: 11px;")
+        self.layout.addWidget(self.status_label)
+        self.status_label.hide()
+        self.debug_shortcut = QShortcut(QKeySequence("F3"), self)
+        self.debug_shortcut.activated.connect(
+            lambda: self.status_label.setVisible(not self.status_label.isVisible()))
+
+    def refresh_metrics(self):
+        for tile in self.tiles:
+            tile.refresh_metrics()
+
+    def is_debug_overlay_visible(self) -> bool:
+        return self.status_label.isVisible()
+
+    def set_debug_text(self, lines: list):
+        self.status_label.setText("\n".join(lines))
@@ -1,13 +1,21 @@
-import pyttsx3
 import time
 from typing import Optional
 from .vision import CPRMetrics
+from .speech import (SpeechService, PRIORITY_SAFETY, PRIORITY_CORRECTION,
+                     PRIORITY_PRAISE)
 
 class CPRFeedback:
-    def __init__(self):
-        # Initialize text-to-speech engine
-        self.engine = pyttsx3.init()
-        self.engine.setProperty('rate', 150)  # Speed of speech
+    def __init__(self, speech_service: Optional[SpeechService] = None,
+                 speech_key: str = 'cpr_feedback', announce: str = ''):
+        # Share the app-wide speech service, or run a private one
+        if speech_service is None:
+            speech_service = SpeechService(rate=150)
+            speech_service.start()
+        self.speech = speech_service
+        
+        # Stations sharing one speaker each use their own key and a spoken prefix
+        self.speech_key = speech_key
+        self.announce = announce
         
         # Feedback thresholds
         self.rate_threshold = 10  # compressions per minute
@@ -29,51 +37,69 @@ class CPRFeedback:
             'good_position': "Good hand position!"
         }
         
-    def provide_feedback(self, metrics: CPRMetrics) -> Optional[str]:
-        """Analyze metrics and provide appropriate feedback"""
-        current_time = time.time()
+        # Safety cues are spoken ahead of corrections, praise goes last
+        self.feedback_priorities = {
+            'rate_too_slow': PRIORITY_CORRECTION,
+            'rate_too_fast': PRIORITY_CORRECTION,
+            'depth_too_shallow': PRIORITY_CORRECTION,
+            'depth_too_deep': PRIORITY_CORRECTION,
+            'position_incorrect': PRIORITY_SAFETY,
+            'good_rate': PRIORITY_PRAISE,
+            'good_depth': PRIORITY_PRAISE,
+            'good_position': PRIORITY_PRAISE
+        }
+        
+    def provide_feedback(self, metrics: CPRMetrics, timestamp: Optional[float] = None) -> Optional[str]:
+        """Analyze metrics and provide appropriate feedback
+
+        timestamp is the frame time in seconds; replays pass it so the
+        cooldown, and so the cues given, do not depend on wall-clock time.
+        """
+        current_time = time.time() if timestamp is None else timestamp
         
         # Check if enough time has passed since last feedback
         if current_time - self.last_feedback_time < self.feedback_cooldown:
             return None
             
-        feedback_message = None
+        feedback_key = None
         
         # Check compression rate
         if metrics.compression_rate < 90:
-            feedback_message = self.feedback_messages['rate_too_slow']
+            feedback_key = 'rate_too_slow'
         elif metrics.compression_rate > 110:
-            feedback_message = self.feedback_messages['rate_too_fast']
+            feedback_key = 'rate_too_fast'
         elif 95 <= metrics.compression_rate <= 105:
-            feedback_message = self.feedback_messages['good_rate']
+            feedback_key = 'good_rate'
             
         # Check compression depth
         if metrics.compression_depth < 4.0:
-            feedback_message = self.feedback_messages['depth_too_shallow']
+            feedback_key = 'depth_too_shallow'
         elif metrics.compression_depth > 6.0:
-            feedback_message = self.feedback_messages['depth_too_deep']
+            feedback_key = 'depth_too_deep'
         elif 4.5 <= metrics.compression_depth <= 5.5:
-            feedback_message = self.feedback_messages['good_depth']
+            feedback_key = 'good_depth'
             
         # Check hand position
         if not metrics.is_correct_position:
-            feedback_message = self.feedback_messages['position_incorrect']
-        elif feedback_message is None:
-            feedback_message = self.feedback_messages['good_position']
+            feedback_key = 'position_incorrect'
+        elif feedback_key is None:
+            feedback_key = 'good_position'
             
-        if feedback_message:
-            self.last_feedback_time = current_time
-            self.speak_feedback(feedback_message)
+        feedback_message = self.feedback_messages[feedback_key]
+        self.last_feedback_time = current_time
+        self.speak_feedback(feedback_message, self.feedback_priorities[feedback_key])
             
         return feedback_message
         
-    def speak_feedback(self, message: str):
-        """Convert feedback message to speech"""
-        try:
-            self.engine.say(message)
-            self.engine.runAndWait()
-        except Exception as e:
-            print(f"Error in text-to-speech: {e}")
+    def phrases(self) -> list:
+        """Every cue this feedback system can speak, for pre-rendering"""
+        return [self.announce + message for message in self.feedback_messages.values()]
+        
+    def speak_feedback(self, message: str, priority: int = PRIORITY_CORRECTION):
+        """Queue feedback message for speech without blocking the caller"""
+        # All technique cues share one key so a newer cue replaces a stale one
+        self.speech.say(self.announce + message, priority=priority, key=self.speech_key,
+                        max_age=self.feedback_cooldown)
             
     def get_visual_feedback(self, metrics: CPRMetrics) -> dict:
         """Generate visual feedback indicators"""
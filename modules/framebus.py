@@ -0,0 +1,233 @@
+import sys
+import time
+from multiprocessing import shared_memory
+from typing import Optional
+
+import cv2
+import numpy as np
+
+# Layout of the shared segment: header, one metadata record per slot, then
+# the frames themselves, each section aligned to a cache line
+HEADER_DTYPE = np.dtype([
+    ('magic', '<u4'),
+    ('version', '<u4'),
+    ('slots', '<u4'),
+    ('height', '<u4'),
+    ('width', '<u4'),
+    ('channels', '<u4'),
+    ('latest', '<u8'),  # sequence number of the newest complete frame, 0 before the first
+    ('closed', '<u4')  # set when the producer shuts down
+])
+SLOT_DTYPE = np.dtype([
+    ('sequence', '<u8'),  # 0 while the slot is being written
+    ('timestamp', '<f8'),  # frame time in seconds, what rates are computed from
+    ('captured', '<f8')  # time.monotonic() when the frame was read; the clock is system-wide
+])
+_MAGIC = 0x46525043  # "CPRF"
+_VERSION = 1
+_ALIGN = 64
+
+_created = set()  # segments owned by this process
+
+def _aligned(size: int) -> int:
+    return (size + _ALIGN - 1) // _ALIGN * _ALIGN
+
+def _layout(slots: int, height: int, width: int, channels: int):
+    """(slot table offset, frames offset, frame size, total size) of a bus segment"""
+    slots_offset = _aligned(HEADER_DTYPE.itemsize)
+    frames_offset = slots_offset + _aligned(slots * SLOT_DTYPE.itemsize)
+    frame_size = _aligned(height * width * channels)
+    return slots_offset, frames_offset, frame_size, frames_offset + slots * frame_size
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Open an existing segment without taking ownership of it"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    segment = shared_memory.SharedMemory(name)
+    # Before 3.13 attaching also registers the segment for cleanup, which
+    # would delete it from under the producer when this process exits
+    if segment.name not in _created:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+class _BusView:
+    """Numpy views of a bus segment's header, slot table and frames"""
+
+    def __init__(self, segment: shared_memory.SharedMemory, slots: int, height: int, width: int, channels: int,
+                 writeable: bool = True):
+        self.segment = segment
+        self.slots = slots
+        self.shape = (height, width, channels)
+        slots_offset, frames_offset, frame_size, _ = _layout(slots, height, width, channels)
+        self.header = np.ndarray((), HEADER_DTYPE, buffer=segment.buf)
+        table = np.ndarray((slots,), SLOT_DTYPE, buffer=segment.buf, offset=slots_offset)
+        self.sequences = table['sequence']
+        self.timestamps = table['timestamp']
+        self.captured = table['captured']
+        self.frames = [np.ndarray(self.shape, np.uint8, buffer=segment.buf,
+                                  offset=frames_offset + i * frame_size) for i in range(slots)]
+        for frame in self.frames:
+            frame.flags.writeable = writeable
+
+    def release(self):
+        """Drop the views so the segment can be closed"""
+        self.header = self.sequences = self.timestamps = self.captured = None
+        self.frames = []
+
+class BusFrame:
+    """One frame on the bus; image is a view into shared memory, not a copy"""
+
+    __slots__ = ("sequence", "timestamp", "captured", "image")
+
+    def __init__(self, sequence: int, timestamp: float, captured: float, image: np.ndarray):
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self.captured = captured
+        self.image = image
+
+class FrameBus:
+    """Ring of frames in shared memory, written by the one process that owns the camera
+
+    The bus behaves like a pipeline queue, so CaptureWorker(source, [bus])
+    publishes every captured frame with its sequence number and
+    timestamps. Consumers in other processes attach a FrameBusReader by
+    name and read the newest frame in place, each at its own rate; a slow
+    or crashing consumer never holds up capture or the other consumers.
+    A slot is overwritten `slots` frames after it was written, so the ring
+    must cover the time the slowest consumer keeps a frame.
+    """
+
+    def __init__(self, name: Optional[str] = None, width: int = 640, height: int = 480,
+                 channels: int = 3, slots: int = 8):
+        size = _layout(slots, height, width, channels)[3]
+        self.segment = shared_memory.SharedMemory(name, create=True, size=size)
+        self.name = self.segment.name
+        _created.add(self.name)
+        self._view = _BusView(self.segment, slots, height, width, channels)
+        header = self._view.header
+        header['slots'] = slots
+        header['height'] = height
+        header['width'] = width
+        header['channels'] = channels
+        header['latest'] = 0
+        header['closed'] = 0
+        header['version'] = _VERSION
+        header['magic'] = _MAGIC  # last, so a reader never sees a half-initialized header
+        self.sequence = 0
+        self.resized = 0  # frames that had to be scaled to the bus size
+
+    def put(self, item):
+        """Pipeline queue hook: publish a (frame_id, PooledFrame) item"""
+        _, frame = item
+        try:
+            self.publish(frame.image, frame.timestamp, frame.captured)
+        finally:
+            frame.release()
+
+    def publish(self, image: np.ndarray, timestamp: float, captured: float) -> int:
+        """Copy a frame into the next slot and make it the newest; returns its sequence number"""
+        view = self._view
+        sequence = self.sequence + 1
+        slot = sequence % view.slots
+        # Mark the slot as being written so readers never take a torn frame
+        view.sequences[slot] = 0
+        if image.shape == view.shape:
+            np.copyto(view.frames[slot], image)
+        else:
+            self.resized += 1
+            cv2.resize(image, view.shape[1::-1], dst=view.frames[slot])
+        view.timestamps[slot] = timestamp
+        view.captured[slot] = captured
+        view.sequences[slot] = sequence
+        view.header['latest'] = sequence
+        self.sequence = sequence
+        return sequence
+
+    def close(self):
+        """Tell readers the stream has ended and remove the segment"""
+        if self._view.header is None:
+            return
+        self._view.header['closed'] = 1
+        self._view.release()
+        self.segment.close()
+        # Attached readers keep their mapping until they close it
+        self.segment.unlink()
+        _created.discard(self.name)
+
+class FrameBusReader:
+    """Read-only view of a FrameBus, from any process on the machine
+
+    next() returns the newest frame not yet seen, so a slow reader skips
+    frames instead of falling behind; skipped frames are counted in
+    dropped. Frames are views into the ring: use is_current() to check
+    that one was not overwritten while it was being used.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.segment = _attach(name)
+        header = np.ndarray((), HEADER_DTYPE, buffer=self.segment.buf)
+        if int(header['magic']) != _MAGIC or int(header['version']) != _VERSION:
+            del header
+            self.segment.close()
+            raise ValueError(f"{name} is not a frame bus")
+        # Other processes see these frames too, so they are read-only here
+        self._view = _BusView(self.segment, int(header['slots']), int(header['height']),
+                              int(header['width']), int(header['channels']), writeable=False)
+        del header
+        self.last_sequence = 0
+        self.frames_read = 0
+        self.dropped = 0
+
+    @property
+    def shape(self):
+        return self._view.shape
+
+    @property
+    def closed(self) -> bool:
+        return self._view.header is None or bool(self._view.header['closed'])
+
+    def latest(self) -> Optional[BusFrame]:
+        """The newest complete frame, or None if there is none yet"""
+        view = self._view
+        sequence = int(view.header['latest'])
+        if not sequence:
+            return None
+        slot = sequence % view.slots
+        timestamp = float(view.timestamps[slot])
+        captured = float(view.captured[slot])
+        if int(view.sequences[slot]) != sequence:
+            return None  # the producer lapped us between the two reads
+        return BusFrame(sequence, timestamp, captured, view.frames[slot])
+
+    def next(self, timeout: Optional[float] = None) -> Optional[BusFrame]:
+        """Wait for a frame newer than the last one returned; None on timeout or once the bus closes"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            frame = self.latest()
+            if frame is not None and frame.sequence > self.last_sequence:
+                if self.last_sequence:
+                    self.dropped += frame.sequence - self.last_sequence - 1
+                self.last_sequence = frame.sequence
+                self.frames_read += 1
+                return frame
+            if self.closed or (deadline is not None and time.monotonic() >= deadline):
+                return None
+            # Separate processes cannot share a condition variable; frames
+            # arrive every few tens of milliseconds, so a short poll is cheap
+            time.sleep(0.002)
+
+    def is_current(self, frame: BusFrame) -> bool:
+        """False once the frame's slot has been reused for a newer frame"""
+        view = self._view
+        return view.header is not None and int(view.sequences[frame.sequence % view.slots]) == frame.sequence
+
+    def close(self):
+        if self._view.header is None:
+            return
+        self._view.release()
+        try:
+            self.segment.close()
+        except BufferError:
+            pass  # frames still referenced elsewhere; the mapping goes with the process
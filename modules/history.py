@@ -0,0 +1,271 @@
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+from .batch import CompressionRecord, SessionScorer
+
+# A compression is on target when it needs no correction from CPRFeedback
+TARGET_RATE = (90.0, 110.0)  # compressions per minute
+TARGET_DEPTH = (4.0, 6.0)  # cm
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    trainee TEXT NOT NULL,
+    source TEXT NOT NULL,
+    started REAL NOT NULL,
+    duration REAL NOT NULL DEFAULT 0,
+    compressions INTEGER NOT NULL DEFAULT 0,
+    in_target INTEGER NOT NULL DEFAULT 0,
+    correct_position INTEGER NOT NULL DEFAULT 0,
+    rated INTEGER NOT NULL DEFAULT 0,
+    rate_sum REAL NOT NULL DEFAULT 0,
+    rate_sq_sum REAL NOT NULL DEFAULT 0,
+    depth_sum REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_by_trainee ON sessions (trainee, started);
+CREATE TABLE IF NOT EXISTS compressions (
+    session_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    rate REAL NOT NULL,
+    depth REAL NOT NULL,
+    amplitude REAL NOT NULL,
+    hand_x REAL NOT NULL,
+    hand_y REAL NOT NULL,
+    correct_position INTEGER NOT NULL,
+    PRIMARY KEY (session_id, idx)
+) WITHOUT ROWID;
+"""
+
+# Session totals are recomputed from its compressions after every batch,
+# so an interrupted session still has a correct summary
+_UPDATE_TOTALS = """
+UPDATE sessions SET (compressions, in_target, correct_position, rated, rate_sum, rate_sq_sum, depth_sum) = (
+    SELECT COUNT(*),
+           COALESCE(SUM(rate BETWEEN :rate_low AND :rate_high AND depth BETWEEN :depth_low AND :depth_high
+                        AND correct_position), 0),
+           COALESCE(SUM(correct_position), 0),
+           COALESCE(SUM(rate > 0), 0),
+           COALESCE(SUM(CASE WHEN rate > 0 THEN rate END), 0),
+           COALESCE(SUM(CASE WHEN rate > 0 THEN rate * rate END), 0),
+           COALESCE(SUM(depth), 0)
+    FROM compressions WHERE session_id = :id)
+WHERE id = :id
+"""
+
+@dataclass
+class SessionStats:
+    id: str
+    trainee: str
+    source: str
+    started: float  # Unix time
+    duration: float  # seconds
+    compressions: int
+    in_target_pct: float  # compressions at target rate and depth with correct hands
+    correct_position_pct: float
+    mean_rate: float
+    rate_variance: float  # cpm², across compressions
+    mean_depth: float
+
+@dataclass
+class TraineeSummary:
+    trainee: str
+    sessions: int
+    first: float  # Unix time of the first session
+    last: float
+    duration: float  # total seconds of practice
+    compressions: int
+    in_target_pct: float
+    correct_position_pct: float
+    mean_rate: float
+    rate_variance: float  # pooled over every compression, not averaged per session
+    mean_depth: float
+
+def _stats(compressions: int, in_target: int, correct: int, rated: int,
+           rate_sum: float, rate_sq_sum: float, depth_sum: float) -> Tuple[float, ...]:
+    """(in target %, correct position %, mean rate, rate variance, mean depth) from running sums"""
+    mean_rate = rate_sum / rated if rated else 0.0
+    variance = max(0.0, rate_sq_sum / rated - mean_rate * mean_rate) if rated else 0.0
+    if not compressions:
+        return 0.0, 0.0, mean_rate, variance, 0.0
+    return (100.0 * in_target / compressions, 100.0 * correct / compressions,
+            mean_rate, variance, depth_sum / compressions)
+
+class SessionStore(threading.Thread):
+    """Training history in SQLite, written in batches by a background thread
+
+    Callers only put rows on a queue, so the frame loop never waits on the
+    disk. The database runs in WAL mode: queries read from their own
+    connection while the writer appends.
+    """
+
+    def __init__(self, path: str = "sessions.db", flush_interval: float = 0.5):
+        super().__init__(name="SessionStore", daemon=True)
+        self.path = path
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self.rows_written = 0
+        self.batches_written = 0
+        # Create the schema up front so queries work before the first write
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10.0)
+        conn.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints; enough for WAL
+        return conn
+
+    # Writes, safe to call from any thread
+
+    def start_session(self, trainee: str, source: str = "camera", started: Optional[float] = None) -> str:
+        """Register a new session and return its id"""
+        session_id = uuid.uuid4().hex
+        self._queue.put(("session", (session_id, trainee, source, time.time() if started is None else started)))
+        return session_id
+
+    def add_compressions(self, session_id: str, records: Iterable[CompressionRecord]):
+        rows = [(session_id, r.index, r.timestamp, r.compression_rate, r.compression_depth,
+                 r.compression_amplitude, r.hand_x, r.hand_y, int(r.is_correct_position))
+                for r in records]
+        if rows:
+            self._queue.put(("compressions", rows))
+
+    def end_session(self, session_id: str, duration: float):
+        self._queue.put(("end", (duration, session_id)))
+
+    def flush(self):
+        """Block until everything queued so far is on disk; not for the frame path"""
+        self._queue.join()
+
+    # Background writer
+
+    def run(self):
+        conn = self._connect()
+        try:
+            while True:
+                try:
+                    batch = [self._queue.get(timeout=self.flush_interval)]
+                except queue.Empty:
+                    if self._stop_event.is_set():
+                        break
+                    continue
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    self._write(conn, batch)
+                except sqlite3.Error as e:
+                    print(f"Error writing session history: {e}")
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                # Let more rows gather into the next transaction
+                self._stop_event.wait(self.flush_interval)
+        finally:
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: list):
+        touched = set()
+        with conn:  # one transaction per batch
+            for kind, payload in batch:
+                if kind == "session":
+                    conn.execute("INSERT OR IGNORE INTO sessions (id, trainee, source, started) "
+                                 "VALUES (?, ?, ?, ?)", payload)
+                elif kind == "compressions":
+                    conn.executemany("INSERT OR REPLACE INTO compressions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                     payload)
+                    touched.add(payload[0][0])
+                    self.rows_written += len(payload)
+                elif kind == "end":
+                    conn.execute("UPDATE sessions SET duration = ? WHERE id = ?", payload)
+            for session_id in touched:
+                conn.execute(_UPDATE_TOTALS, {'id': session_id,
+                                              'rate_low': TARGET_RATE[0], 'rate_high': TARGET_RATE[1],
+                                              'depth_low': TARGET_DEPTH[0], 'depth_high': TARGET_DEPTH[1]})
+        self.batches_written += 1
+
+    def stop(self, timeout: float = 5.0):
+        """Write what is queued and stop the writer"""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    # Queries, each on its own read connection
+
+    def trainees(self) -> List[str]:
+        with closing(self._connect()) as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT trainee FROM sessions ORDER BY trainee")]
+
+    def sessions(self, trainee: str, since: Optional[float] = None,
+                 limit: Optional[int] = None) -> List[SessionStats]:
+        """A trainee's sessions, oldest first, for trend charts
+
+        limit keeps only the most recent sessions.
+        """
+        query = ("SELECT id, trainee, source, started, duration, compressions, in_target, correct_position, "
+                 "rated, rate_sum, rate_sq_sum, depth_sum FROM sessions WHERE trainee = ? AND started >= ? "
+                 "ORDER BY started DESC")
+        params = [trainee, since or 0.0]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [SessionStats(*row[:6], *_stats(*row[5:])) for row in reversed(rows)]
+
+    def trainee_summary(self, trainee: str, since: Optional[float] = None) -> Optional[TraineeSummary]:
+        """Aggregates over all of a trainee's sessions, or None if there are none"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT COUNT(*), MIN(started), MAX(started), SUM(duration), SUM(compressions), SUM(in_target), "
+                "SUM(correct_position), SUM(rated), SUM(rate_sum), SUM(rate_sq_sum), SUM(depth_sum) "
+                "FROM sessions WHERE trainee = ? AND started >= ?", (trainee, since or 0.0)).fetchone()
+        if not row[0]:
+            return None
+        return TraineeSummary(trainee, *row[:5], *_stats(*row[4:]))
+
+    def compressions(self, session_id: str) -> List[CompressionRecord]:
+        """Every compression of one session, in order"""
+        with closing(self._connect()) as conn:
+            source = conn.execute("SELECT source FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            rows = conn.execute(
+                "SELECT idx, timestamp, rate, depth, amplitude, hand_x, hand_y, correct_position "
+                "FROM compressions WHERE session_id = ? ORDER BY idx", (session_id,)).fetchall()
+        video = source[0] if source else ""
+        return [CompressionRecord(video, idx, t, rate, depth, amplitude, x, y, bool(correct))
+                for idx, t, rate, depth, amplitude, x, y, correct in rows]
+
+class SessionLog:
+    """Feeds one live session's metrics into a SessionStore
+
+    Compressions are picked out of the per-frame metrics the same way
+    batch scoring does, and only new ones are queued for writing.
+    """
+
+    def __init__(self, store: SessionStore, trainee: str, source: str = "camera"):
+        self.store = store
+        self.started = time.time()
+        self.scorer = SessionScorer(source)
+        self.session_id = store.start_session(trainee, source, self.started)
+        self._written = 0
+
+    def add(self, metrics, timestamp: Optional[float] = None):
+        """Account for one frame; timestamp is Unix time, now by default"""
+        now = time.time() if timestamp is None else timestamp
+        self.scorer.add(now - self.started, metrics)
+        if len(self.scorer.records) > self._written:
+            self.store.add_compressions(self.session_id, self.scorer.records[self._written:])
+            self._written = len(self.scorer.records)
+
+    def close(self):
+        self.store.end_session(self.session_id, time.time() - self.started)
@@ -0,0 +1,205 @@
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Stage latency buckets in seconds, dense around one 30 FPS frame
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.033, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+def _format_labels(labels: Dict[str, str], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels.items())
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+class Counter:
+    """Monotonic counter with a single writer thread"""
+
+    def __init__(self, labels: Dict[str, str]):
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def samples(self, name: str) -> List[str]:
+        return [f"{name}{_format_labels(self.labels)} {self.value}"]
+
+class Gauge:
+    """Value read from a callback at scrape time, so the hot path pays nothing"""
+
+    def __init__(self, labels: Dict[str, str], read: Callable[[], float]):
+        self.labels = labels
+        self.read = read
+
+    def samples(self, name: str) -> List[str]:
+        try:
+            value = self.read()
+        except Exception:
+            return []
+        return [f"{name}{_format_labels(self.labels)} {value}"]
+
+class Histogram:
+    """Fixed-bucket latency histogram
+
+    Each histogram has one writer thread and observe() takes no lock;
+    readers see a snapshot that may be off by the observation in flight,
+    which is fine for monitoring.
+    """
+
+    def __init__(self, labels: Dict[str, str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def observe_since(self, start: float):
+        """Record the time elapsed since a time.perf_counter() reading"""
+        self.observe(time.perf_counter() - start)
+
+    def percentile(self, q: float) -> float:
+        """Approximate percentile (0-100) as the upper bound of its bucket"""
+        counts = list(self.counts)
+        total = sum(counts)
+        if total == 0:
+            return 0.0
+        target = total * q / 100.0
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            running += count
+            if running >= target:
+                return bound if bound != float('inf') else self.buckets[-1]
+        return self.buckets[-1]
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def samples(self, name: str) -> List[str]:
+        counts = list(self.counts)
+        lines = []
+        running = 0
+        for bound, count in zip(self.buckets, counts):
+            running += count
+            lines.append(f"{name}_bucket{_format_labels(self.labels, ('le', repr(bound)))} {running}")
+        running += counts[-1]
+        lines.append(f"{name}_bucket{_format_labels(self.labels, ('le', '+Inf'))} {running}")
+        lines.append(f"{name}_sum{_format_labels(self.labels)} {self.sum}")
+        lines.append(f"{name}_count{_format_labels(self.labels)} {running}")
+        return lines
+
+class MetricsRegistry:
+    """Holds named metrics and renders them in Prometheus text format"""
+
+    def __init__(self, prefix: str = "cpr_"):
+        self.prefix = prefix
+        self._families: Dict[str, dict] = {}
+        self._lock = threading.Lock()  # only taken when metrics are created or rendered
+
+    def _get(self, kind: str, name: str, help_text: str, labels: Optional[Dict[str, str]], factory):
+        name = self.prefix + name
+        labels = labels or {}
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.setdefault(name, {'kind': kind, 'help': help_text, 'metrics': {}})
+            if key not in family['metrics']:
+                family['metrics'][key] = factory(labels)
+            return family['metrics'][key]
+
+    def counter(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None) -> Counter:
+        return self._get("counter", name, help_text, labels, Counter)
+
+    def histogram(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None,
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get("histogram", name, help_text, labels, lambda l: Histogram(l, buckets))
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float],
+              labels: Optional[Dict[str, str]] = None, kind: str = "gauge") -> Gauge:
+        """Register a callback metric; use kind='counter' for totals kept elsewhere"""
+        return self._get(kind, name, help_text, labels, lambda l: Gauge(l, read))
+
+    def stage_timer(self, stage: str) -> Histogram:
+        """Histogram for one hot-path stage, in seconds"""
+        return self.histogram("stage_duration_seconds", "Time spent in each pipeline stage",
+                              {'stage': stage})
+
+    def feedback_latency(self, labels: Optional[Dict[str, str]] = None) -> Histogram:
+        """Histogram of the time from frame capture until its feedback was given, in seconds"""
+        return self.histogram("capture_to_feedback_seconds", "Time from frame capture to feedback",
+                              labels)
+
+    def render(self) -> str:
+        """Prometheus text exposition of every metric"""
+        lines = []
+        with self._lock:
+            families = [(name, dict(family), list(family['metrics'].values()))
+                        for name, family in self._families.items()]
+        for name, family, metrics in families:
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['kind']}")
+            for metric in metrics:
+                lines.extend(metric.samples(name))
+        return "\n".join(lines) + "\n"
+
+    def summary_lines(self) -> List[str]:
+        """Short human-readable summary for the on-screen debug overlay"""
+        lines = []
+        with self._lock:
+            families = [(name, family['kind'], list(family['metrics'].values()))
+                        for name, family in self._families.items()]
+        for name, kind, metrics in families:
+            short_name = name[len(self.prefix):]
+            for metric in metrics:
+                label = ",".join(metric.labels.values())
+                title = f"{short_name}[{label}]" if label else short_name
+                if kind == "histogram":
+                    lines.append(f"{title}: mean {metric.mean * 1000:.1f} ms, "
+                                 f"p95 <{metric.percentile(95) * 1000:.0f} ms, n={metric.count}")
+                elif isinstance(metric, Gauge):
+                    value = metric.samples("")
+                    if value:
+                        lines.append(f"{title}: {value[0].split(' ')[-1]}")
+                else:
+                    lines.append(f"{title}: {metric.value}")
+        return lines
+
+class MetricsServer(threading.Thread):
+    """Serves a registry at http://host:port/metrics on a background thread"""
+
+    def __init__(self, registry: MetricsRegistry, port: int = 9108, host: str = "127.0.0.1"):
+        super().__init__(name="MetricsServer", daemon=True)
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = registry_ref.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes would otherwise flood the console
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.server.server_address[1]
+
+    def run(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
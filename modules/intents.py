@@ -0,0 +1,131 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# In a phrase, GAP stands for up to max_gap words that do not matter
+GAP = "..."
+
+# A phrase starting with START only matches at the start of the utterance,
+# for words that are commands on their own but common inside questions
+START = "^"
+
+# A command right after one of these is being negated ("don't stop")
+NEGATIONS = {"don't", "dont", "not", "never", "no"}
+
+@dataclass(frozen=True)
+class Intent:
+    """One thing a trainee can say, declared as word sequences
+
+    Higher priority wins when one utterance matches several intents.
+    Urgent intents are dispatched from partial transcripts as soon as one
+    of their phrases is complete and cannot grow into another intent's
+    phrase; the rest wait for the final transcript.
+    """
+    name: str
+    phrases: Tuple[str, ...]
+    priority: int = 0
+    urgent: bool = False
+
+@dataclass
+class IntentMatch:
+    intent: Intent
+    start: int  # index of the first matched word
+    end: int  # index after the last matched word
+
+class _Node:
+    __slots__ = ("children", "gap", "intents", "ambiguous")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.gap: Optional["_Node"] = None
+        self.intents: List[Intent] = []
+        self.ambiguous = False  # a longer phrase from here means a different intent
+
+    def settle(self) -> set:
+        """Mark ambiguous nodes; returns the intent names reachable from this node"""
+        below = set()
+        for child in list(self.children.values()) + ([self.gap] if self.gap else []):
+            below |= child.settle()
+        own = {intent.name for intent in self.intents}
+        self.ambiguous = bool(below - own)
+        return below | own
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case words of a transcript, keeping apostrophes"""
+    return re.findall(r"[a-z']+", text.lower())
+
+class IntentMatcher:
+    """Word trie compiled from an intent grammar
+
+    Matching walks the trie from every word of the transcript, so only
+    whole words count ("helpful" is not "help") and a phrase only matches
+    with its words in order. Gaps are bounded, so words from different
+    parts of a long sentence do not combine into a command.
+    """
+
+    def __init__(self, intents: Sequence[Intent], max_gap: int = 4):
+        self.intents = list(intents)
+        self.max_gap = max_gap
+        self.root = _Node()
+        self.start_root = _Node()  # phrases anchored with START
+        for intent in self.intents:
+            for phrase in intent.phrases:
+                words = phrase.split()
+                node = self.root
+                if words[0] == START:
+                    node = self.start_root
+                    words = words[1:]
+                for word in words:
+                    if word == GAP:
+                        if node.gap is None:
+                            node.gap = _Node()
+                        node = node.gap
+                    else:
+                        node = node.children.setdefault(word, _Node())
+                node.intents.append(intent)
+        self.root.settle()
+        self.start_root.settle()
+
+    @property
+    def vocabulary(self) -> List[str]:
+        """Every word the grammar uses, for recognizers that take a word list"""
+        words = {word for intent in self.intents for phrase in intent.phrases
+                 for word in phrase.split() if word not in (GAP, START)}
+        return sorted(words)
+
+    def _walk(self, node: _Node, tokens: List[str], i: int) -> Iterator[Tuple[_Node, int]]:
+        if node.intents:
+            yield node, i
+        if i < len(tokens):
+            child = node.children.get(tokens[i])
+            if child is not None:
+                yield from self._walk(child, tokens, i + 1)
+        if node.gap is not None:
+            for skip in range(min(self.max_gap, len(tokens) - i - 1) + 1):
+                child = node.gap.children.get(tokens[i + skip])
+                if child is not None:
+                    yield from self._walk(child, tokens, i + skip + 1)
+
+    def match(self, text: str, partial: bool = False) -> Optional[IntentMatch]:
+        """Best intent in a transcript, or None
+
+        For a partial transcript only urgent intents count, and only once
+        their phrase is settled: more words followed it, or no longer
+        phrase starting with it belongs to another intent.
+        """
+        tokens = tokenize(text)
+        best = None
+        for start in range(len(tokens)):
+            if start > 0 and tokens[start - 1] in NEGATIONS:
+                continue
+            roots = [self.root, self.start_root] if start == 0 else [self.root]
+            for node, end in (found for root in roots for found in self._walk(root, tokens, start)):
+                if partial and end == len(tokens) and node.ambiguous:
+                    continue
+                for intent in node.intents:
+                    if partial and not intent.urgent:
+                        continue
+                    # Highest priority first, then whatever was said first
+                    if best is None or (intent.priority, -end) > (best.intent.priority, -best.end):
+                        best = IntentMatch(intent, start, end)
+        return best
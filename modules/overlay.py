@@ -0,0 +1,174 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+GREEN = (0, 255, 0)
+RED = (0, 0, 255)
+GRAY = (160, 160, 160)
+AMBER = (0, 200, 255)
+WHITE = (255, 255, 255)
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+class Sprite:
+    """Pre-rendered overlay element: BGR pixels and the mask of pixels it covers"""
+
+    __slots__ = ("pixels", "mask", "offset", "_bgra")
+
+    def __init__(self, pixels: np.ndarray, mask: np.ndarray, offset: Tuple[int, int] = (0, 0)):
+        self.pixels = pixels
+        self.mask = mask
+        self.offset = offset  # canvas position of the sprite's anchor point
+        self._bgra = None
+
+    @classmethod
+    def render(cls, size: Tuple[int, int], draw, offset: Tuple[int, int] = (0, 0)) -> "Sprite":
+        """Rasterize once: draw(image, color_or_None) is called on the pixels and on the mask"""
+        w, h = size
+        pixels = np.zeros((h, w, 3), dtype=np.uint8)
+        mask = np.zeros((h, w), dtype=np.uint8)
+        draw(pixels, None)
+        draw(mask, 255)
+        return cls(pixels, mask, offset)
+
+    def blit(self, frame: np.ndarray, x: int, y: int):
+        """Copy the covered pixels so the anchor lands on (x, y), clipped to the frame
+
+        Works on BGR and BGRA frames; only the sprite's own region is touched.
+        """
+        pixels = self.pixels
+        if frame.shape[2] == 4:
+            if self._bgra is None:
+                self._bgra = cv2.cvtColor(self.pixels, cv2.COLOR_BGR2BGRA)
+            pixels = self._bgra
+        h, w = pixels.shape[:2]
+        x -= self.offset[0]
+        y -= self.offset[1]
+        frame_h, frame_w = frame.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, frame_w), min(y + h, frame_h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        # Masked copy straight into the frame region, which is a view
+        cv2.copyTo(pixels[y0 - y:y1 - y, x0 - x:x1 - x], self.mask[y0 - y:y1 - y, x0 - x:x1 - x],
+                   frame[y0:y1, x0:x1])
+
+class OverlayRenderer:
+    """Training overlay composed from cached sprites
+
+    Text labels are rasterized once per formatted string and kept in a
+    small LRU cache, so steady readings cost a masked copy of a few
+    thousand pixels instead of a putText call. The hand target, the depth
+    gauge with its target zone and the metronome frames are rendered once
+    up front. Drawing touches only the regions the elements cover.
+    """
+
+    def __init__(self, target_rate: float = 100.0, depth_zone: Tuple[float, float] = (4.0, 6.0),
+                 max_depth: float = 8.0, pixels_per_cm: int = 20, metronome: bool = True,
+                 cache_size: int = 256):
+        self.target_rate = target_rate
+        self.depth_zone = depth_zone
+        self.max_depth = max_depth
+        self.pixels_per_cm = pixels_per_cm
+        self.metronome = metronome
+        self.cache_size = cache_size
+        self._text_cache = OrderedDict()
+        self._solid_patches = {}
+        self._label_values = None
+        self._labels = ()
+        self.text_renders = 0
+
+        self.hand_target = Sprite.render(
+            (45, 45), lambda image, c: cv2.circle(image, (22, 22), 20, c or GREEN, 2), (22, 22))
+        self.gauge_height = int(max_depth * pixels_per_cm)
+        self.depth_gauge = Sprite.render((34, self.gauge_height + 1), self._draw_gauge,
+                                         (7, self.gauge_height))
+        # A beat flashes large and shrinks over the rest of the interval
+        self.metronome_frames = [
+            Sprite.render((37, 37), lambda image, c, r=radius: cv2.circle(
+                image, (18, 18), r, c or AMBER, -1), (18, 18))
+            for radius in range(16, 4, -2)
+        ]
+
+    def _draw_gauge(self, image: np.ndarray, color):
+        bottom = self.gauge_height
+        cv2.rectangle(image, (7, 0), (27, bottom), color or GRAY, 1)
+        # Target zone limits extend past the bar on both sides
+        for depth in self.depth_zone:
+            y = bottom - int(depth * self.pixels_per_cm)
+            cv2.line(image, (0, y), (33, y), color or WHITE, 2)
+
+    def _solid(self, color: Tuple[int, int, int], h: int, w: int) -> np.ndarray:
+        patch = self._solid_patches.get(color)
+        if patch is None or patch.shape[0] < h or patch.shape[1] < w:
+            size = (max(h, 64), max(w, 512)) if patch is None else \
+                (max(h, patch.shape[0]), max(w, patch.shape[1]))
+            patch = np.empty(size + (3,), dtype=np.uint8)
+            patch[:] = color
+            self._solid_patches[color] = patch
+        return patch[:h, :w]
+
+    def text(self, text: str, color: Tuple[int, int, int] = GREEN, scale: float = 1.0,
+             thickness: int = 2) -> Sprite:
+        """Return the sprite for a label, rendering it on first use; anchored at the text baseline"""
+        key = (text, color, scale, thickness)
+        sprite = self._text_cache.get(key)
+        if sprite is not None:
+            self._text_cache.move_to_end(key)
+            return sprite
+        (text_w, text_h), baseline = cv2.getTextSize(text, FONT, scale, thickness)
+        origin = (thickness, text_h + thickness)
+        # Labels are one color, so only the mask is rasterized and the
+        # pixels are a view of a shared solid patch
+        w, h = text_w + 2 * thickness, text_h + baseline + 2 * thickness
+        mask = np.zeros((h, w), dtype=np.uint8)
+        cv2.putText(mask, text, origin, FONT, scale, 255, thickness)
+        sprite = Sprite(self._solid(color, h, w), mask, origin)
+        self._text_cache[key] = sprite
+        if len(self._text_cache) > self.cache_size:
+            self._text_cache.popitem(last=False)
+        self.text_renders += 1
+        return sprite
+
+    def draw(self, frame: np.ndarray, metrics, timestamp: Optional[float] = None) -> np.ndarray:
+        """Draw the overlay for metrics onto frame in place and return it
+
+        timestamp (seconds) drives the metronome; wall-clock time is used
+        when it is not given.
+        """
+        h, w = frame.shape[:2]
+
+        # Hand target
+        self.hand_target.blit(frame, int(metrics.hand_position[0] * w),
+                              int(metrics.hand_position[1] * h))
+
+        # Depth bar inside the gauge, green when it is in the target zone
+        bottom = h - 100
+        depth = min(max(metrics.compression_depth, 0.0), self.max_depth)
+        bar_top = max(bottom - int(depth * self.pixels_per_cm), 0)
+        if bar_top < bottom and bottom > 0:
+            low, high = self.depth_zone
+            color = GREEN if low <= metrics.compression_depth <= high else RED
+            cv2.rectangle(frame, (10, bar_top), (29, bottom - 1), color, -1)
+        self.depth_gauge.blit(frame, 10, bottom)
+
+        # Metric labels, cached by their formatted text; the display redraws
+        # the same readings until the next result, so skip even the lookup
+        values = (metrics.compression_rate, metrics.compression_depth)
+        if values != self._label_values:
+            self._labels = (self.text(f"Rate: {values[0]:.1f} cpm"),
+                            self.text(f"Depth: {values[1]:.1f} cm"))
+            self._label_values = values
+        self._labels[0].blit(frame, 10, 30)
+        self._labels[1].blit(frame, 10, 60)
+
+        # Metronome pulsing at the target rate
+        if self.metronome:
+            if timestamp is None:
+                timestamp = time.monotonic()
+            phase = (timestamp * self.target_rate / 60.0) % 1.0
+            index = min(int(phase * len(self.metronome_frames)), len(self.metronome_frames) - 1)
+            self.metronome_frames[index].blit(frame, w - 30, 30)
+        return frame
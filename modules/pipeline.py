@@ -0,0 +1,312 @@
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Callable, List, Optional
+
+from .sources import FrameSource
+from .vision import CPRVisionAnalyzer, CPRMetrics
+from .instrumentation import MetricsRegistry
+
+class PooledFrame:
+    """Capture buffer shared by pipeline consumers
+
+    Every holder calls release() when done; the buffer goes back to its
+    pool after the last release and is then reused for a later frame.
+    """
+
+    __slots__ = ("image", "timestamp", "captured", "intact", "_pool", "_refs")
+
+    def __init__(self, pool: "FramePool"):
+        self.image = None  # filled in by the frame source
+        self.timestamp = 0.0  # frame time in seconds, what rates are computed from
+        self.captured = 0.0  # time.monotonic() when the frame was read, for latency
+        self.intact = None  # FrameSource.frame_check() of the frame, for shared buffers
+        self._pool = pool
+        self._refs = 1
+
+    def retain(self, count: int = 1):
+        with self._pool._lock:
+            self._refs += count
+
+    def release(self):
+        self._pool._release(self)
+
+    def is_intact(self) -> bool:
+        """False if the source has overwritten the image, e.g. a slot of a shared frame bus"""
+        return self.intact is None or self.intact()
+
+class FramePool:
+    """Recycles capture buffers so steady-state capture allocates nothing"""
+
+    def __init__(self, max_free: int = 8):
+        self.max_free = max_free
+        self._free: List[PooledFrame] = []
+        self._lock = threading.Lock()
+        self.allocated = 0
+
+    def acquire(self) -> PooledFrame:
+        """Return a free buffer, or a new one if all are in use"""
+        with self._lock:
+            if self._free:
+                frame = self._free.pop()
+                frame._refs = 1
+                return frame
+            self.allocated += 1
+        return PooledFrame(self)
+
+    def _release(self, frame: PooledFrame):
+        with self._lock:
+            frame._refs -= 1
+            if frame._refs == 0 and len(self._free) < self.max_free:
+                self._free.append(frame)
+
+def release_item(item: Any):
+    """Release the pooled frame of a (frame_id, frame) queue item, if it has one"""
+    if isinstance(item, tuple) and len(item) == 2 and isinstance(item[1], PooledFrame):
+        item[1].release()
+
+class LatestQueue:
+    """Bounded queue that keeps only the newest items and drops stale ones"""
+
+    def __init__(self, maxsize: int = 1):
+        self._items = deque(maxlen=maxsize)
+        self._condition = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item: Any):
+        """Add an item, discarding the oldest one if the queue is full"""
+        with self._condition:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+                release_item(self._items[0])
+            self._items.append(item)
+            self._condition.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Any]:
+        """Wait for the newest item; returns None on timeout"""
+        with self._condition:
+            if not self._items:
+                self._condition.wait(timeout)
+            if not self._items:
+                return None
+            item = self._items.pop()
+            # Anything older than the newest item is already stale
+            self.dropped += len(self._items)
+            for stale in self._items:
+                release_item(stale)
+            self._items.clear()
+            return item
+
+    def get_nowait(self) -> Optional[Any]:
+        """Return the newest item without waiting, or None if empty"""
+        return self.get(timeout=0)
+
+    def __len__(self) -> int:
+        with self._condition:
+            return len(self._items)
+
+class CaptureWorker(threading.Thread):
+    """Reads frames from a frame source and fans them out to consumer queues
+
+    Frames are read into pooled buffers and queued as (frame_id,
+    PooledFrame) items; each consumer releases its frame when done.
+    Every frame is stamped when it is read, on the monotonic clock. For
+    sources with a media clock, such as video files, their own frame times
+    are used instead (shifted to start at the first read), so rates stay
+    right however fast or slowly the source is read. The worker exits when
+    a finite source ends.
+    """
+
+    def __init__(self, source: FrameSource, queues: List[LatestQueue],
+                 metrics: Optional[MetricsRegistry] = None, pool: Optional[FramePool] = None):
+        super().__init__(name="CaptureWorker", daemon=True)
+        self.source = source
+        self.queues = queues
+        self.pool = pool or FramePool()
+        self.frame_count = 0
+        self.read_failures = 0
+        self.gap_frames = 0  # frames the source skipped, judged from timestamp gaps
+        self._clock_offset = None  # media time -> monotonic time
+        self._last_timestamp = None
+        self._interval = None  # smoothed frame interval in seconds
+        self._stop_event = threading.Event()
+        
+        self._timer = None
+        if metrics is not None:
+            self._timer = metrics.stage_timer("capture")
+            metrics.gauge("captured_frames_total", "Frames read from the frame source",
+                          lambda: self.frame_count, kind="counter")
+            metrics.gauge("capture_failures_total", "Failed frame source reads",
+                          lambda: self.read_failures, kind="counter")
+            metrics.gauge("capture_gap_frames_total", "Frames missing from the source, from timestamp gaps",
+                          lambda: self.gap_frames, kind="counter")
+            metrics.gauge("frame_buffers_allocated", "Capture buffers created by the frame pool",
+                          lambda: self.pool.allocated)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                start = time.perf_counter()
+                frame = self.pool.acquire()
+                ret, image = self.source.read(frame.image)  # decode into the recycled buffer
+                if self._timer is not None:
+                    self._timer.observe_since(start)
+                if not ret:
+                    frame.release()
+                    if self.source.ended:
+                        print(f"{self.source.name} ended after {self.frame_count} frames")
+                        break
+                    self.read_failures += 1
+                    if self.read_failures % 100 == 1:
+                        print(f"WARNING: Could not read frame from {self.source.name}")
+                    time.sleep(0.03)
+                    continue
+
+                # Sources return a new array if the frame size changed
+                frame.image = image
+                # Frames from another process were captured there, not now
+                frame.captured = self.source.captured_at() or time.monotonic()
+                frame.timestamp = self._frame_time(frame.captured)
+                frame.intact = self.source.frame_check()
+                self.frame_count += 1
+                item = (self.frame_count, frame)
+                frame.retain(len(self.queues))
+                for frame_queue in self.queues:
+                    frame_queue.put(item)
+                frame.release()
+            except Exception as e:
+                print(f"Error in capture worker: {e}")
+                traceback.print_exc()
+                time.sleep(0.1)
+
+    def _frame_time(self, captured: float) -> float:
+        """Timestamp for the frame just read, counting gaps in the sequence"""
+        timestamp = captured
+        if self.source.media_clock:
+            position = self.source.position()
+            if self._clock_offset is None:
+                self._clock_offset = captured - position
+            timestamp = self._clock_offset + position
+        last = self._last_timestamp
+        if last is not None:
+            if timestamp <= last:
+                # Sources without usable positions; step by the usual interval
+                timestamp = last + (self._interval or 1 / 30)
+            elapsed = timestamp - last
+            if self._interval is None:
+                self._interval = elapsed
+            elif elapsed > 1.5 * self._interval:
+                self.gap_frames += int(round(elapsed / self._interval)) - 1
+            else:
+                self._interval += 0.1 * (elapsed - self._interval)
+        self._last_timestamp = timestamp
+        return timestamp
+
+    def stop(self, timeout: float = 1.0):
+        """Stop reading frames and wait for the thread to exit"""
+        self._stop_event.set()
+        self.join(timeout)
+
+class InferenceWorker(threading.Thread):
+    """Runs pose analysis on the newest captured frame and reports the result"""
+
+    def __init__(self, analyzer: CPRVisionAnalyzer, frame_queue: LatestQueue,
+                 on_result: Callable[[int, Optional[CPRMetrics]], None],
+                 metrics: Optional[MetricsRegistry] = None):
+        super().__init__(name="InferenceWorker", daemon=True)
+        self.analyzer = analyzer
+        self.frame_queue = frame_queue
+        self.on_result = on_result
+        self.frames_analyzed = 0
+        self.frames_without_pose = 0
+        self.frames_skipped = 0  # captured frames never analyzed, e.g. dropped under load
+        self.frames_torn = 0  # analyzed frames the source overwrote meanwhile
+        self._last_frame_id = None
+        self._active = threading.Event()
+        self._analyze_once = threading.Event()
+        self._reset_requested = threading.Event()
+        self._stop_event = threading.Event()
+        
+        self._timer = None
+        if metrics is not None:
+            self._timer = metrics.stage_timer("inference")
+            metrics.gauge("analyzed_frames_total", "Frames run through the analyzer",
+                          lambda: self.frames_analyzed, kind="counter")
+            metrics.gauge("no_landmark_frames_total", "Analyzed frames where no pose was found",
+                          lambda: self.frames_without_pose, kind="counter")
+            metrics.gauge("skipped_frames_total", "Captured frames dropped before analysis",
+                          lambda: self.frames_skipped, kind="counter")
+            metrics.gauge("torn_frames_total", "Results dropped because the frame was overwritten during analysis",
+                          lambda: self.frames_torn, kind="counter")
+
+    def set_active(self, active: bool):
+        """Enable or disable analysis without stopping the thread"""
+        if active:
+            self._active.set()
+        else:
+            self._active.clear()
+
+    def analyze_once(self):
+        """Analyze the next frame even while inactive, as a trial run before a session
+
+        The result is reported as usual, then the analyzer is reset so the
+        frame does not count towards the session; it is not recorded.
+        """
+        self._analyze_once.set()
+
+    def reset_analyzer(self):
+        """Reset the analyzer before the next frame it analyzes, e.g. for a new session"""
+        self._reset_requested.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            item = self.frame_queue.get(timeout=0.1)
+            if item is None:
+                continue
+            trial = not self._active.is_set()
+            if trial and not self._analyze_once.is_set():
+                release_item(item)
+                self._last_frame_id = None  # frames are not analyzed on purpose while paused
+                continue
+
+            frame_id, frame = item
+            recorder = self.analyzer.recorder
+            try:
+                if self._reset_requested.is_set():
+                    # On this thread, so no analysis is in progress
+                    self._reset_requested.clear()
+                    self.analyzer.reset()
+                if trial:
+                    self._analyze_once.clear()
+                    self.analyzer.recorder = None
+                elif self._last_frame_id is not None:
+                    self.frames_skipped += frame_id - self._last_frame_id - 1
+                self._last_frame_id = None if trial else frame_id
+                start = time.perf_counter()
+                # Rates come from the capture timestamps, so skipped frames do not distort them
+                metrics = self.analyzer.analyze_frame(frame.image, frame.timestamp)
+                if trial:
+                    self.analyzer.reset()
+                if self._timer is not None:
+                    self._timer.observe_since(start)
+                self.frames_analyzed += 1
+                if not frame.is_intact():
+                    self.frames_torn += 1
+                    continue
+                if metrics is None:
+                    self.frames_without_pose += 1
+                else:
+                    metrics.captured = frame.captured
+                self.on_result(frame_id, metrics)
+            except Exception as e:
+                print(f"Error in inference worker: {e}")
+                traceback.print_exc()
+            finally:
+                self.analyzer.recorder = recorder
+                frame.release()
+
+    def stop(self, timeout: float = 1.0):
+        """Stop analyzing frames and wait for the thread to exit"""
+        self._stop_event.set()
+        self.join(timeout)
@@ -0,0 +1,364 @@
+import inspect
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Landmark indices follow MediaPipe Pose; every backend returns a
+# (NUM_LANDMARKS, 4) array of normalized x, y, z and visibility.
+NUM_LANDMARKS = 33
+NOSE = 0
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+LEFT_ELBOW = 13
+RIGHT_ELBOW = 14
+LEFT_WRIST = 15
+RIGHT_WRIST = 16
+LEFT_HIP = 23
+RIGHT_HIP = 24
+
+# Joints of the stick figure drawn by modules.sources. Each is a disc in
+# pure blue with the red channel set to MARKER_STEP * (position + 1), so
+# StickFigureBackend can read the pose back without a model.
+STICK_FIGURE_JOINTS = (NOSE, LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW,
+                       LEFT_WRIST, RIGHT_WRIST, LEFT_HIP, RIGHT_HIP)
+MARKER_STEP = 16
+
+# Maps landmarks normalized to the processed image into the caller's
+# coordinates, e.g. from a region-of-interest crop back to the full frame
+LandmarkMapping = Callable[[np.ndarray], np.ndarray]
+
+class PoseBackend:
+    """Common interface for pose estimators
+
+    Subclasses implement _process(), taking an RGB image and returning
+    landmarks in MediaPipe indexing or None. process() wraps it to record
+    per-call latency so backends can be compared on the target hardware.
+    Backends whose results arrive for earlier images override
+    _process_mapped() instead, to map each result as its own image.
+    """
+
+    name = "base"
+
+    def __init__(self, latency_window: int = 300):
+        self._latencies = deque(maxlen=latency_window)  # milliseconds
+
+    def process(self, rgb_image: np.ndarray, timestamp: Optional[float] = None,
+                to_frame: Optional[LandmarkMapping] = None) -> Optional[np.ndarray]:
+        """Estimate landmarks for an RGB image captured at timestamp (seconds)
+
+        to_frame, if given, maps landmarks of this image to the caller's
+        coordinates and is applied before they are returned.
+        """
+        start = time.perf_counter()
+        landmarks = self._process_mapped(rgb_image, timestamp, to_frame)
+        self._latencies.append((time.perf_counter() - start) * 1000.0)
+        return landmarks
+
+    def _process(self, rgb_image: np.ndarray, timestamp: Optional[float]) -> Optional[np.ndarray]:
+        raise NotImplementedError
+
+    def _process_mapped(self, rgb_image: np.ndarray, timestamp: Optional[float],
+                        to_frame: Optional[LandmarkMapping]) -> Optional[np.ndarray]:
+        landmarks = self._process(rgb_image, timestamp)
+        if landmarks is not None and to_frame is not None:
+            landmarks = to_frame(landmarks)
+        return landmarks
+
+    def reset(self):
+        """Drop any tracking state carried between frames"""
+        pass
+
+    def warmup(self, width: int = 640, height: int = 480):
+        """Run the model once on a blank frame so the first real frame is not slow
+
+        Graph setup, weight upload and kernel selection happen on the first
+        inference; doing it here keeps it off the first analyzed frame.
+        """
+        self._process_mapped(np.zeros((height, width, 3), dtype=np.uint8), 0.0, None)
+        self.reset()
+
+    def close(self):
+        """Release model resources"""
+        pass
+
+    def latency_summary(self) -> Dict[str, float]:
+        """Mean, median and 95th percentile latency in ms over recent calls"""
+        if not self._latencies:
+            return {'count': 0, 'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0}
+        values = np.fromiter(self._latencies, dtype=np.float64)
+        return {
+            'count': len(values),
+            'mean_ms': float(values.mean()),
+            'p50_ms': float(np.percentile(values, 50)),
+            'p95_ms': float(np.percentile(values, 95))
+        }
+
+class MediaPipePoseBackend(PoseBackend):
+    """Legacy MediaPipe Pose solution, model complexity 0 (lite), 1 (full) or 2 (heavy)"""
+
+    name = "mediapipe"
+
+    def __init__(self, model_complexity: int = 1, min_detection_confidence: float = 0.5,
+                 min_tracking_confidence: float = 0.5):
+        super().__init__()
+        import mediapipe as mp
+        self.model_complexity = model_complexity
+        self.pose = mp.solutions.pose.Pose(
+            model_complexity=model_complexity,
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence
+        )
+
+    def _process(self, rgb_image, timestamp):
+        results = self.pose.process(rgb_image)
+        if not results.pose_landmarks:
+            return None
+        return np.array([(lm.x, lm.y, lm.z, lm.visibility)
+                         for lm in results.pose_landmarks.landmark], dtype=np.float32)
+
+    def reset(self):
+        if hasattr(self.pose, 'reset'):
+            self.pose.reset()
+
+    def close(self):
+        self.pose.close()
+
+class MediaPipeTasksBackend(PoseBackend):
+    """MediaPipe Tasks PoseLandmarker in VIDEO or LIVE_STREAM mode
+
+    In live-stream mode frames are submitted asynchronously and process()
+    returns the newest finished result, so latency is the submit cost and
+    the model's own delay is reported separately as result_delay_ms. That
+    result is usually for an earlier image, so each submission keeps its
+    own mapping and the result is mapped with it, not with the current one.
+    """
+
+    name = "mediapipe-tasks"
+
+    def __init__(self, model_path: str = "pose_landmarker_lite.task", running_mode: str = "video",
+                 min_detection_confidence: float = 0.5, min_tracking_confidence: float = 0.5):
+        super().__init__()
+        import mediapipe as mp
+        from mediapipe.tasks import python as mp_tasks
+        from mediapipe.tasks.python import vision as mp_vision
+
+        self._mp = mp
+        self.running_mode = running_mode
+        mode = {
+            'video': mp_vision.RunningMode.VIDEO,
+            'live_stream': mp_vision.RunningMode.LIVE_STREAM
+        }[running_mode]
+
+        options = dict(
+            base_options=mp_tasks.BaseOptions(model_asset_path=model_path),
+            running_mode=mode,
+            num_poses=1,
+            min_pose_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence
+        )
+        if running_mode == 'live_stream':
+            options['result_callback'] = self._on_result
+        self.landmarker = mp_vision.PoseLandmarker.create_from_options(
+            mp_vision.PoseLandmarkerOptions(**options))
+
+        self._last_timestamp_ms = -1
+        # The landmarker calls back on its own thread
+        self._lock = threading.Lock()
+        self._latest = None
+        self._submissions: Dict[int, Tuple[float, Optional[LandmarkMapping]]] = {}  # by timestamp_ms
+        self.result_delay_ms = 0.0
+
+    def _next_timestamp_ms(self, timestamp: Optional[float]) -> int:
+        """Timestamps given to the landmarker must strictly increase"""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        timestamp_ms = max(int(timestamp * 1000), self._last_timestamp_ms + 1)
+        self._last_timestamp_ms = timestamp_ms
+        return timestamp_ms
+
+    @staticmethod
+    def _to_array(result) -> Optional[np.ndarray]:
+        if not result.pose_landmarks:
+            return None
+        return np.array([(lm.x, lm.y, lm.z, lm.visibility or 0.0)
+                         for lm in result.pose_landmarks[0]], dtype=np.float32)
+
+    def _on_result(self, result, image, timestamp_ms: int):
+        with self._lock:
+            submission = self._submissions.pop(timestamp_ms, None)
+        if submission is None:
+            return  # submitted before a reset, or evicted; its mapping is unknown
+        submitted, to_frame = submission
+        landmarks = self._to_array(result)
+        if landmarks is not None and to_frame is not None:
+            landmarks = to_frame(landmarks)
+        with self._lock:
+            self.result_delay_ms = (time.perf_counter() - submitted) * 1000.0
+            self._latest = landmarks
+
+    def _image(self, rgb_image: np.ndarray):
+        return self._mp.Image(image_format=self._mp.ImageFormat.SRGB,
+                              data=np.ascontiguousarray(rgb_image))
+
+    def _process(self, rgb_image, timestamp):
+        image = self._image(rgb_image)
+        return self._to_array(self.landmarker.detect_for_video(image, self._next_timestamp_ms(timestamp)))
+
+    def _process_mapped(self, rgb_image, timestamp, to_frame):
+        if self.running_mode != 'live_stream':
+            return super()._process_mapped(rgb_image, timestamp, to_frame)
+        image = self._image(rgb_image)
+        timestamp_ms = self._next_timestamp_ms(timestamp)
+        with self._lock:
+            self._submissions[timestamp_ms] = (time.perf_counter(), to_frame)
+            if len(self._submissions) > 30:
+                self._submissions.pop(next(iter(self._submissions)))
+        self.landmarker.detect_async(image, timestamp_ms)
+        with self._lock:
+            return None if self._latest is None else self._latest.copy()
+
+    def reset(self):
+        with self._lock:
+            self._latest = None
+            self._submissions.clear()
+
+    def close(self):
+        self.landmarker.close()
+
+class MoveNetBackend(PoseBackend):
+    """Single-person MoveNet (e.g. Lightning) ONNX model on CPU
+
+    Only the 17 COCO keypoints are produced; they are placed at their
+    MediaPipe indices and every other landmark has zero visibility.
+    onnxruntime is used when installed, otherwise OpenCV DNN.
+    """
+
+    name = "movenet"
+
+    # COCO keypoint order -> MediaPipe landmark index
+    COCO_TO_MEDIAPIPE = np.array([0, 2, 5, 7, 8, 11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28])
+
+    def __init__(self, model_path: str = "movenet_lightning.onnx", input_size: int = 192,
+                 min_score: float = 0.3):
+        super().__init__()
+        self.input_size = input_size
+        self.min_score = min_score
+        self._input = np.zeros((1, input_size, input_size, 3), dtype=np.int32)
+
+        try:
+            import onnxruntime as ort
+            self.session = ort.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+            self.input_name = self.session.get_inputs()[0].name
+            self.net = None
+        except ImportError:
+            self.session = None
+            self.net = cv2.dnn.readNetFromONNX(model_path)
+
+    def _process(self, rgb_image, timestamp):
+        # Letterbox into the square model input, keeping the aspect ratio
+        h, w = rgb_image.shape[:2]
+        scale = self.input_size / max(h, w)
+        new_w, new_h = int(round(w * scale)), int(round(h * scale))
+        pad_x = (self.input_size - new_w) // 2
+        pad_y = (self.input_size - new_h) // 2
+        self._input.fill(0)
+        self._input[0, pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(
+            rgb_image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+        if self.session is not None:
+            output = self.session.run(None, {self.input_name: self._input})[0]
+        else:
+            self.net.setInput(self._input)
+            output = self.net.forward()
+        keypoints = np.asarray(output, dtype=np.float32).reshape(17, 3)  # y, x, score
+
+        if keypoints[[5, 6, 9, 10], 2].min() < self.min_score:
+            return None  # shoulders or wrists not found
+
+        landmarks = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+        landmarks[self.COCO_TO_MEDIAPIPE, 0] = (keypoints[:, 1] * self.input_size - pad_x) / new_w
+        landmarks[self.COCO_TO_MEDIAPIPE, 1] = (keypoints[:, 0] * self.input_size - pad_y) / new_h
+        landmarks[self.COCO_TO_MEDIAPIPE, 3] = keypoints[:, 2]
+        return landmarks
+
+class NullPoseBackend(PoseBackend):
+    """Backend that never finds a pose, for driving the analyzer from recorded landmarks"""
+
+    name = "none"
+
+    def _process(self, rgb_image, timestamp):
+        return None
+
+class StickFigureBackend(PoseBackend):
+    """Reads the pose back from the stick figure drawn by synthetic and replay sources
+
+    No model runs, so the whole pipeline can be exercised on machines
+    without a camera or pose model; the cost is one pass over the image.
+    """
+
+    name = "stick"
+
+    def __init__(self):
+        super().__init__()
+        self._joints = np.array(STICK_FIGURE_JOINTS)
+        self._required = np.isin(self._joints, (LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_WRIST, RIGHT_WRIST))
+
+    def _process(self, rgb_image, timestamp):
+        h, w = rgb_image.shape[:2]
+        ys, xs = np.nonzero((rgb_image[:, :, 2] == 255) & (rgb_image[:, :, 1] == 0))
+        codes = rgb_image[ys, xs, 0].astype(np.intp)
+        labels = codes // MARKER_STEP - 1
+        valid = (codes % MARKER_STEP == 0) & (labels >= 0) & (labels < len(self._joints))
+        labels = labels[valid]
+        counts = np.bincount(labels, minlength=len(self._joints))
+        found = counts > 0
+        if not found[self._required].all():
+            return None
+
+        landmarks = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+        joints = self._joints[found]
+        counts = counts[found]
+        # Marker centroids, at pixel centers
+        landmarks[joints, 0] = (np.bincount(labels, xs[valid], len(self._joints))[found] / counts + 0.5) / w
+        landmarks[joints, 1] = (np.bincount(labels, ys[valid], len(self._joints))[found] / counts + 0.5) / h
+        landmarks[joints, 3] = 1.0
+        return landmarks
+
+class LeasedPoseBackend(PoseBackend):
+    """One analyzer's view of whichever shared backend is serving its frame
+
+    The code that owns the shared backends sets backend before each call,
+    so every analyzer keeps its own state while the pose models are pooled.
+    """
+
+    name = "pooled"
+
+    def __init__(self, backend: Optional[PoseBackend] = None):
+        super().__init__()
+        self.backend = backend
+
+    def _process_mapped(self, rgb_image, timestamp, to_frame):
+        return self.backend.process(rgb_image, timestamp, to_frame)
+
+BACKENDS: Dict[str, Callable[..., PoseBackend]] = {
+    MediaPipePoseBackend.name: MediaPipePoseBackend,
+    MediaPipeTasksBackend.name: MediaPipeTasksBackend,
+    MoveNetBackend.name: MoveNetBackend,
+    NullPoseBackend.name: NullPoseBackend,
+    StickFigureBackend.name: StickFigureBackend
+}
+
+def create_pose_backend(name: str = "mediapipe", **options) -> PoseBackend:
+    """Create a pose backend by name with backend-specific options"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown pose backend '{name}', choose from: {', '.join(BACKENDS)}")
+    # Drop options that were not set or that this backend does not take,
+    # so one set of command-line options works for every backend
+    accepted = inspect.signature(BACKENDS[name]).parameters
+    options = {key: value for key, value in options.items()
+               if value is not None and key in accepted}
+    return BACKENDS[name](**options)
@@ -0,0 +1,259 @@
+import inspect
+import json
+import time
+import wave
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Every backend takes 16 kHz mono 16-bit PCM, fed in 20 ms chunks
+SAMPLE_RATE = 16000
+CHUNK_SAMPLES = 320
+
+@dataclass
+class Hypothesis:
+    text: str
+    final: bool  # False for partial results while the utterance continues
+
+class SpeechRecognizer:
+    """Common interface for speech recognition engines
+
+    Audio is fed through accept(), which returns a Hypothesis whenever the
+    transcript of the current utterance changes. Streaming engines report
+    partial hypotheses while the trainee is still talking and may end an
+    utterance themselves with a final one; finish() ends it explicitly.
+    phrases is the command vocabulary; engines that support a grammar
+    listen for nothing else.
+    """
+
+    name = "base"
+    streaming = True
+
+    def __init__(self, phrases: Optional[Sequence[str]] = None):
+        self.phrases = list(phrases or [])
+        self._partial = ""
+
+    def accept(self, pcm: bytes) -> Optional[Hypothesis]:
+        """Feed a chunk of audio; returns a hypothesis if the transcript changed"""
+        hypothesis = self._accept(pcm)
+        if hypothesis is None:
+            return None
+        if not hypothesis.final and hypothesis.text == self._partial:
+            return None
+        self._partial = "" if hypothesis.final else hypothesis.text
+        return hypothesis
+
+    def finish(self) -> Hypothesis:
+        """End the current utterance and return its final transcript"""
+        self._partial = ""
+        return self._finish()
+
+    def _accept(self, pcm: bytes) -> Optional[Hypothesis]:
+        raise NotImplementedError
+
+    def _finish(self) -> Hypothesis:
+        raise NotImplementedError
+
+    def close(self):
+        """Release model resources"""
+        pass
+
+def _clean(text: str) -> str:
+    """Drop the unknown-word token grammar-restricted engines emit"""
+    return " ".join(word for word in text.split() if word != "[unk]")
+
+class VoskRecognizer(SpeechRecognizer):
+    """Vosk (Kaldi) streaming recognizer, restricted to the command vocabulary
+
+    Runs fully offline; the small English model is about 40 MB:
+    https://alphacephei.com/vosk/models
+    """
+
+    name = "vosk"
+
+    def __init__(self, phrases: Optional[Sequence[str]] = None,
+                 model_path: str = "models/vosk-model-small-en-us-0.15"):
+        super().__init__(phrases)
+        from vosk import Model, KaldiRecognizer, SetLogLevel
+        SetLogLevel(-1)
+        self.model = Model(model_path)
+        if self.phrases:
+            # A small grammar decodes faster and cannot drift into free text
+            grammar = json.dumps(self.phrases + ["[unk]"])
+            self.recognizer = KaldiRecognizer(self.model, SAMPLE_RATE, grammar)
+        else:
+            self.recognizer = KaldiRecognizer(self.model, SAMPLE_RATE)
+
+    def _accept(self, pcm):
+        if self.recognizer.AcceptWaveform(pcm):
+            # Vosk found the end of the utterance on its own
+            return Hypothesis(_clean(json.loads(self.recognizer.Result())['text']), True)
+        return Hypothesis(_clean(json.loads(self.recognizer.PartialResult())['partial']), False)
+
+    def _finish(self):
+        return Hypothesis(_clean(json.loads(self.recognizer.FinalResult())['text']), True)
+
+class PocketSphinxRecognizer(SpeechRecognizer):
+    """PocketSphinx 5 recognizer with a JSGF grammar over the command words
+
+    Offline and lighter than Vosk but less accurate; the English model
+    ships with the package.
+    """
+
+    name = "pocketsphinx"
+
+    def __init__(self, phrases: Optional[Sequence[str]] = None, model_path: Optional[str] = None):
+        super().__init__(phrases)
+        from pocketsphinx import Decoder
+        config = {'samprate': SAMPLE_RATE, 'loglevel': 'FATAL'}
+        if model_path:
+            config['hmm'] = model_path
+        self.decoder = Decoder(**config)
+        words = sorted({word for phrase in self.phrases for word in phrase.split()
+                        if self.decoder.lookup_word(word) is not None})
+        if words:
+            self.decoder.add_jsgf_string("commands", (
+                "#JSGF V1.0;\ngrammar commands;\n"
+                f"public <command> = <word>+;\n<word> = {' | '.join(words)};\n"))
+            self.decoder.activate_search("commands")
+        self.decoder.start_utt()
+
+    def _text(self) -> str:
+        hypothesis = self.decoder.hyp()
+        return hypothesis.hypstr if hypothesis is not None else ""
+
+    def _accept(self, pcm):
+        self.decoder.process_raw(pcm, False, False)
+        return Hypothesis(self._text(), False)
+
+    def _finish(self):
+        self.decoder.end_utt()
+        text = self._text()
+        self.decoder.start_utt()
+        return Hypothesis(text, True)
+
+class GoogleRecognizer(SpeechRecognizer):
+    """Google Web Speech API through SpeechRecognition
+
+    Needs a network connection and only answers once the utterance has
+    ended, so it gives no partial results.
+    """
+
+    name = "google"
+    streaming = False
+
+    def __init__(self, phrases: Optional[Sequence[str]] = None, language: str = "en-US"):
+        super().__init__(phrases)
+        import speech_recognition as sr
+        self._sr = sr
+        self.recognizer = sr.Recognizer()
+        self.language = language
+        self._audio = bytearray()
+
+    def _accept(self, pcm):
+        self._audio += pcm
+        return None
+
+    def _finish(self):
+        audio = self._sr.AudioData(bytes(self._audio), SAMPLE_RATE, 2)
+        self._audio.clear()
+        try:
+            text = self.recognizer.recognize_google(audio, language=self.language).lower()
+        except self._sr.UnknownValueError:
+            text = ""
+        except self._sr.RequestError as e:
+            print(f"Could not request results; {e}")
+            text = ""
+        return Hypothesis(text, True)
+
+RECOGNIZERS: Dict[str, Callable[..., SpeechRecognizer]] = {
+    VoskRecognizer.name: VoskRecognizer,
+    PocketSphinxRecognizer.name: PocketSphinxRecognizer,
+    GoogleRecognizer.name: GoogleRecognizer
+}
+
+def create_recognizer(name: str = "vosk", **options) -> SpeechRecognizer:
+    """Create a speech recognizer by name with engine-specific options"""
+    if name not in RECOGNIZERS:
+        raise ValueError(f"Unknown recognizer '{name}', choose from: {', '.join(RECOGNIZERS)}")
+    # Same convention as the pose backends: unset or foreign options are dropped
+    accepted = inspect.signature(RECOGNIZERS[name]).parameters
+    options = {key: value for key, value in options.items()
+               if value is not None and key in accepted}
+    return RECOGNIZERS[name](**options)
+
+def rms(samples: np.ndarray) -> float:
+    """Root-mean-square level of 16-bit samples"""
+    if len(samples) == 0:
+        return 0.0
+    values = samples.astype(np.float32)
+    return float(np.sqrt(np.dot(values, values) / len(values)))
+
+def read_wav(path: str, rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Load a 16-bit PCM WAV file as mono int16 samples at the given rate"""
+    with wave.open(path, 'rb') as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        source_rate = wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+    if width != 2:
+        raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+    samples = np.frombuffer(frames, dtype='<i2').reshape(-1, channels).astype(np.float32).mean(axis=1)
+    if source_rate != rate:
+        duration = len(samples) / source_rate
+        positions = np.arange(int(duration * rate)) * (source_rate / rate)
+        samples = np.interp(positions, np.arange(len(samples)), samples)
+    return np.clip(np.round(samples), -32768, 32767).astype(np.int16)
+
+def iter_chunks(samples: np.ndarray, chunk_samples: int = CHUNK_SAMPLES) -> Iterator[bytes]:
+    """Split samples into PCM chunks the way a microphone delivers them"""
+    for start in range(0, len(samples), chunk_samples):
+        yield samples[start:start + chunk_samples].tobytes()
+
+@dataclass
+class Transcription:
+    text: str
+    speech_start: Optional[float]  # audio seconds where the level first crossed the threshold
+    partials: List[Tuple[float, str]] = field(default_factory=list)  # (audio seconds, text)
+    audio_seconds: float = 0.0
+    decode_seconds: float = 0.0  # processing time spent in the recognizer
+
+    @property
+    def first_partial_latency(self) -> Optional[float]:
+        """Audio seconds from speech start to the first non-empty partial"""
+        if self.speech_start is None:
+            return None
+        for t, text in self.partials:
+            if text and t > self.speech_start:
+                return t - self.speech_start
+        return None
+
+def transcribe(recognizer: SpeechRecognizer, chunks: Iterable[bytes],
+               speech_threshold: float = 300.0) -> Transcription:
+    """Stream audio through a recognizer, timing partial results against the audio clock
+
+    Works on recorded fixtures with no microphone or network, so engines
+    can be compared on the same utterances.
+    """
+    result = Transcription("", None)
+    finals = []
+    for pcm in chunks:
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        result.audio_seconds += len(samples) / SAMPLE_RATE
+        if result.speech_start is None and rms(samples) >= speech_threshold:
+            result.speech_start = result.audio_seconds - len(samples) / SAMPLE_RATE
+        start = time.perf_counter()
+        hypothesis = recognizer.accept(pcm)
+        result.decode_seconds += time.perf_counter() - start
+        if hypothesis is None:
+            continue
+        if hypothesis.final:
+            finals.append(hypothesis.text)
+        else:
+            result.partials.append((result.audio_seconds, hypothesis.text))
+    start = time.perf_counter()
+    finals.append(recognizer.finish().text)
+    result.decode_seconds += time.perf_counter() - start
+    result.text = " ".join(text for text in finals if text)
+    return result
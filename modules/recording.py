@@ -0,0 +1,113 @@
+import os
+import struct
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+from .pose_backends import NUM_LANDMARKS
+
+RECORDING_EXTENSION = ".cprlm"
+
+# Fixed-size records so a session file can be memory-mapped as one array
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),  # capture time in seconds
+    ('flags', 'u1'),
+    ('landmarks', '<f4', (NUM_LANDMARKS, 4))  # normalized x, y, z, visibility
+])
+FLAG_POSE = 1  # landmarks are valid
+FLAG_PREDICTED = 2  # landmarks were predicted instead of inferred
+
+_MAGIC = b"CPRLM\x00"
+_VERSION = 1
+_HEADER = struct.Struct("<6sHII")  # magic, version, landmark count, record size
+HEADER_SIZE = 64
+
+class LandmarkRecorder:
+    """Appends per-frame pose landmarks to a compact binary session file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "wb", buffering=1 << 20)
+        header = _HEADER.pack(_MAGIC, _VERSION, NUM_LANDMARKS, RECORD_DTYPE.itemsize)
+        self._file.write(header.ljust(HEADER_SIZE, b"\x00"))
+        # One reusable record; its buffer is written without an extra copy
+        self._record = np.zeros(1, dtype=RECORD_DTYPE)
+        self.frames_written = 0
+
+    def write(self, timestamp: float, landmarks: Optional[np.ndarray], predicted: bool = False):
+        """Record one frame; landmarks is None when no pose was found"""
+        record = self._record[0]
+        record['timestamp'] = timestamp
+        if landmarks is None:
+            record['flags'] = 0
+            record['landmarks'] = 0.0
+        else:
+            record['flags'] = FLAG_POSE | (FLAG_PREDICTED if predicted else 0)
+            record['landmarks'] = landmarks
+        self._file.write(self._record.data)
+        self.frames_written += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class LandmarkReplay:
+    """Memory-mapped, read-only view of a recorded session"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, num_landmarks, record_size = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a landmark recording")
+        if version != _VERSION or num_landmarks != NUM_LANDMARKS or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"{path} uses an unsupported recording layout (version {version})")
+
+        # A partly written last record from an interrupted session is ignored
+        count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r",
+                                     offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self.records['timestamp']
+
+    @property
+    def landmarks(self) -> np.ndarray:
+        return self.records['landmarks']
+
+    @property
+    def has_pose(self) -> np.ndarray:
+        return (self.records['flags'] & FLAG_POSE) != 0
+
+    @property
+    def duration(self) -> float:
+        if len(self.records) == 0:
+            return 0.0
+        return float(self.timestamps[-1] - self.timestamps[0])
+
+    def __iter__(self) -> Iterator[Tuple[float, Optional[np.ndarray], bool]]:
+        """Yield (timestamp, landmarks or None, predicted) for every frame"""
+        timestamps = self.timestamps
+        flags = self.records['flags']
+        landmarks = self.landmarks
+        for i in range(len(self.records)):
+            if flags[i] & FLAG_POSE:
+                yield float(timestamps[i]), landmarks[i], bool(flags[i] & FLAG_PREDICTED)
+            else:
+                yield float(timestamps[i]), None, False
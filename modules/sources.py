@@ -0,0 +1,382 @@
+import math
+import os
+import time
+from functools import partial
+from typing import Callable, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from .pose_backends import (NUM_LANDMARKS, STICK_FIGURE_JOINTS, MARKER_STEP, NOSE, LEFT_SHOULDER,
+                            RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW, LEFT_WRIST, RIGHT_WRIST,
+                            LEFT_HIP, RIGHT_HIP)
+from .recording import RECORDING_EXTENSION, LandmarkReplay
+from .framebus import FrameBusReader
+
+SOURCE_HELP = ("camera index, video file or stream URL, landmark recording "
+               f"({RECORDING_EXTENSION}), synthetic[:cpm[:seconds]] for a generated trainee, "
+               "or bus:NAME for frames shared by frame_bus.py")
+
+STICK_FIGURE_BONES = ((LEFT_SHOULDER, RIGHT_SHOULDER), (LEFT_SHOULDER, LEFT_ELBOW),
+                      (LEFT_ELBOW, LEFT_WRIST), (RIGHT_SHOULDER, RIGHT_ELBOW),
+                      (RIGHT_ELBOW, RIGHT_WRIST), (LEFT_SHOULDER, LEFT_HIP),
+                      (RIGHT_SHOULDER, RIGHT_HIP), (LEFT_HIP, RIGHT_HIP))
+_BACKGROUND = 45
+_BONE_COLOR = (180, 180, 180)
+# BGR, so the blue channel is first; see STICK_FIGURE_JOINTS
+_MARKER_COLORS = [(255, 0, MARKER_STEP * (i + 1)) for i in range(len(STICK_FIGURE_JOINTS))]
+
+class FrameSource:
+    """Where frames come from: a camera, a video file, a generator or a replay
+
+    read() follows cv2.VideoCapture, decoding into the buffer it is given
+    when it can, so the pipeline's pooled buffers work with every source.
+    Sources with media_clock have their own frame times, returned by
+    position(); the pipeline uses those instead of the time of the read.
+    Finite sources set ended once they run out. With realtime set, media
+    sources hold each frame back until its time, otherwise they deliver
+    frames as fast as they are read.
+    """
+
+    name = "source"
+    media_clock = False
+    fps = 30.0
+
+    def __init__(self, realtime: bool = True):
+        self.realtime = realtime
+        self.ended = False
+        self._origin = None  # (wall clock, media time) of the first paced frame
+
+    def is_open(self) -> bool:
+        return True
+
+    def read(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        raise NotImplementedError
+
+    def grab(self) -> bool:
+        """Skip a frame; sources that can avoid decoding it override this"""
+        return self.read()[0]
+
+    def position(self) -> float:
+        """Time of the last frame on the source's own clock, in seconds"""
+        return 0.0
+
+    def captured_at(self) -> Optional[float]:
+        """time.monotonic() when the last frame was captured, if it was not just now"""
+        return None
+
+    def frame_check(self) -> Optional[Callable[[], bool]]:
+        """For sources whose frames are views of shared buffers: a check that
+        the last frame read has not been overwritten since, or None"""
+        return None
+
+    def release(self):
+        pass
+
+    def _pace(self, position: float):
+        """In realtime mode, wait until the frame at position is due"""
+        if not self.realtime:
+            return
+        now = time.monotonic()
+        if self._origin is None:
+            self._origin = (now, position)
+            return
+        delay = self._origin[0] + position - self._origin[1] - now
+        if delay > 0:
+            time.sleep(delay)
+
+class CameraSource(FrameSource):
+    """A camera by index, or a live stream URL"""
+
+    def __init__(self, device: Union[int, str] = 0, width: int = 640, height: int = 480, fps: float = 30.0):
+        super().__init__(realtime=False)  # live sources pace themselves
+        self.name = f"camera {device}"
+        self.cap = cv2.VideoCapture(device)
+        if self.cap.isOpened() and isinstance(device, int):
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or fps
+
+    def is_open(self) -> bool:
+        return self.cap.isOpened()
+
+    def read(self, image=None):
+        return self.cap.read(image) if image is not None else self.cap.read()
+
+    def grab(self) -> bool:
+        return self.cap.grab()
+
+    def release(self):
+        self.cap.release()
+
+class VideoFileSource(FrameSource):
+    """A recorded video, at its own frame rate or as fast as it decodes
+
+    Frame times come from the container, falling back to the frame count
+    where it has none. With loop the video restarts at the end and its
+    clock keeps counting up.
+    """
+
+    media_clock = True
+
+    def __init__(self, path: str, realtime: bool = True, loop: bool = False):
+        super().__init__(realtime)
+        self.name = os.path.basename(path)
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frames = 0  # frames delivered, over all loops
+        self._pass_frames = 0
+        self._pass_offset = 0.0  # media time at which the current loop started
+        self._position = 0.0
+
+    def is_open(self) -> bool:
+        return self.cap.isOpened()
+
+    def read(self, image=None):
+        if self.ended:
+            return False, None
+        ret, image = self.cap.read(image) if image is not None else self.cap.read()
+        if not ret and self.loop and self._pass_frames:
+            self._restart()
+            ret, image = self.cap.read(image) if image is not None else self.cap.read()
+        if not ret:
+            self.ended = True
+            return False, None
+        self._advance()
+        return True, image
+
+    def grab(self) -> bool:
+        if self.ended:
+            return False
+        ret = self.cap.grab()
+        if not ret and self.loop and self._pass_frames:
+            self._restart()
+            ret = self.cap.grab()
+        if not ret:
+            self.ended = True
+            return False
+        self._advance()
+        return True
+
+    def _restart(self):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        self._pass_offset = self._position + 1.0 / self.fps
+        self._pass_frames = 0
+
+    def _advance(self):
+        self.frames += 1
+        self._pass_frames += 1
+        position_msec = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        media_time = position_msec / 1000.0 if position_msec > 0 else (self._pass_frames - 1) / self.fps
+        self._position = self._pass_offset + media_time
+        self._pace(self._position)
+
+    def position(self) -> float:
+        return self._position
+
+    def release(self):
+        self.cap.release()
+
+def draw_stick_figure(image: np.ndarray, landmarks: Optional[np.ndarray]) -> np.ndarray:
+    """Draw visible (33, 4) normalized landmarks as a stick figure over a plain background
+
+    Joints are drawn as the markers StickFigureBackend reads back; with
+    no landmarks the frame is left empty.
+    """
+    image[:] = _BACKGROUND
+    if landmarks is None:
+        return image
+    h, w = image.shape[:2]
+    points = {joint: (int(landmarks[joint, 0] * w), int(landmarks[joint, 1] * h))
+              for joint in STICK_FIGURE_JOINTS if landmarks[joint, 3] >= 0.5}
+    for a, b in STICK_FIGURE_BONES:
+        if a in points and b in points:
+            cv2.line(image, points[a], points[b], _BONE_COLOR, 3)
+    if NOSE in points:
+        cv2.circle(image, points[NOSE], max(8, h // 24), _BONE_COLOR, 2)
+    # Hard-edged discs, so every marker pixel keeps its exact color
+    for joint, color in zip(STICK_FIGURE_JOINTS, _MARKER_COLORS):
+        if joint in points:
+            cv2.circle(image, points[joint], 4, color, -1, cv2.LINE_8)
+    return image
+
+def synthetic_pose(t: float, rate: float = 100.0, depth: float = 5.0, travel: float = 0.03) -> np.ndarray:
+    """(33, 4) landmarks of a trainee compressing at rate cpm, seen from the front
+
+    depth is the mean hand offset below the shoulders as the analyzer
+    reports it and travel the wrist motion per compression, normalized.
+    """
+    landmarks = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+    press = 0.5 * (1.0 - math.cos(2.0 * math.pi * rate / 60.0 * t))  # 0 at the top, 1 at the bottom
+    shoulder_y = 0.40
+    wrist_y = shoulder_y + depth / 100.0 + travel * (press - 0.5)
+    landmarks[NOSE, :2] = (0.50, 0.27)
+    landmarks[LEFT_SHOULDER, :2] = (0.42, shoulder_y)
+    landmarks[RIGHT_SHOULDER, :2] = (0.58, shoulder_y)
+    landmarks[LEFT_WRIST, :2] = (0.47, wrist_y)
+    landmarks[RIGHT_WRIST, :2] = (0.53, wrist_y)
+    landmarks[LEFT_ELBOW, :2] = (0.43, (shoulder_y + wrist_y) / 2)
+    landmarks[RIGHT_ELBOW, :2] = (0.57, (shoulder_y + wrist_y) / 2)
+    landmarks[LEFT_HIP, :2] = (0.45, 0.68)
+    landmarks[RIGHT_HIP, :2] = (0.55, 0.68)
+    landmarks[STICK_FIGURE_JOINTS, 3] = 1.0
+    return landmarks
+
+class SyntheticSource(FrameSource):
+    """A generated trainee compressing at a fixed rate, for runs without a camera
+
+    Use it with the stick pose backend to exercise the whole pipeline, or
+    with a real pose model to load-test it. Runs forever unless a
+    duration in seconds is given.
+    """
+
+    media_clock = True
+
+    def __init__(self, rate: float = 100.0, depth: float = 5.0, travel: float = 0.03,
+                 fps: float = 30.0, width: int = 640, height: int = 480,
+                 realtime: bool = True, duration: Optional[float] = None):
+        super().__init__(realtime)
+        self.name = f"synthetic {rate:g} cpm"
+        self.rate = rate
+        self.depth = depth
+        self.travel = travel
+        self.fps = fps
+        self.shape = (height, width, 3)
+        self.duration = duration
+        self.frames = 0
+
+    def read(self, image=None):
+        t = self.frames / self.fps
+        if self.duration is not None and t >= self.duration:
+            self.ended = True
+            return False, None
+        if image is None or image.shape != self.shape:
+            image = np.empty(self.shape, dtype=np.uint8)
+        draw_stick_figure(image, synthetic_pose(t, self.rate, self.depth, self.travel))
+        self.frames += 1
+        self._pace(t)
+        return True, image
+
+    def grab(self) -> bool:
+        t = self.frames / self.fps
+        if self.duration is not None and t >= self.duration:
+            self.ended = True
+            return False
+        self.frames += 1
+        self._pace(t)
+        return True
+
+    def position(self) -> float:
+        return (self.frames - 1) / self.fps
+
+class ReplaySource(FrameSource):
+    """Frames rendered from a landmark recording, at the recorded times
+
+    Frames without a pose are blank. With the stick pose backend the
+    recorded landmarks come back out, so a recorded session can be run
+    through the full live pipeline.
+    """
+
+    media_clock = True
+
+    def __init__(self, path: str, realtime: bool = True, width: int = 640, height: int = 480):
+        super().__init__(realtime)
+        self.name = os.path.basename(path)
+        self.replay = LandmarkReplay(path)
+        self.shape = (height, width, 3)
+        if len(self.replay) > 1 and self.replay.duration > 0:
+            self.fps = (len(self.replay) - 1) / self.replay.duration
+        self._index = -1
+
+    def read(self, image=None):
+        if self._index + 1 >= len(self.replay):
+            self.ended = True
+            return False, None
+        self._index += 1
+        if image is None or image.shape != self.shape:
+            image = np.empty(self.shape, dtype=np.uint8)
+        has_pose = self.replay.has_pose[self._index]
+        draw_stick_figure(image, self.replay.landmarks[self._index] if has_pose else None)
+        self._pace(self.position())
+        return True, image
+
+    def grab(self) -> bool:
+        if self._index + 1 >= len(self.replay):
+            self.ended = True
+            return False
+        self._index += 1
+        self._pace(self.position())
+        return True
+
+    def position(self) -> float:
+        return float(self.replay.timestamps[max(self._index, 0)])
+
+class BusSource(FrameSource):
+    """Frames published on a FrameBus by another process, read without copying
+
+    Each image is a view into the shared ring and stays intact until the
+    producer comes around to its slot again, `slots` frames later. The
+    pipeline checks frame_check() once it is done with a frame and drops
+    results from frames that were overwritten meanwhile. Frames keep the
+    producer's timestamps, so rates and capture latency span both processes.
+    """
+
+    media_clock = True
+
+    def __init__(self, name: str, timeout: float = 5.0):
+        super().__init__(realtime=False)  # the producer sets the pace
+        self.name = f"bus {name}"
+        self.timeout = timeout
+        self.reader = None
+        try:
+            self.reader = FrameBusReader(name)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"WARNING: Could not attach to frame bus {name}: {e}")
+        self._frame = None
+
+    def is_open(self) -> bool:
+        return self.reader is not None and not self.reader.closed
+
+    def read(self, image=None):
+        frame = self.reader.next(self.timeout) if self.reader is not None else None
+        if frame is None:
+            if self.reader is None or self.reader.closed:
+                self.ended = True
+            return False, None
+        self._frame = frame
+        return True, frame.image
+
+    def position(self) -> float:
+        return self._frame.timestamp if self._frame is not None else 0.0
+
+    def captured_at(self) -> Optional[float]:
+        return self._frame.captured if self._frame is not None else None
+
+    def frame_check(self) -> Optional[Callable[[], bool]]:
+        return partial(self.reader.is_current, self._frame) if self._frame is not None else None
+
+    def release(self):
+        self._frame = None
+        if self.reader is not None:
+            self.reader.close()
+
+def open_source(spec: Union[int, str], realtime: bool = True, width: int = 640, height: int = 480) -> FrameSource:
+    """Open a frame source from a command-line style spec, see SOURCE_HELP"""
+    spec = str(spec)
+    if spec.startswith("bus:"):
+        return BusSource(spec[4:])
+    if spec.isdigit():
+        return CameraSource(int(spec), width, height)
+    if spec == "synthetic" or spec.startswith("synthetic:"):
+        parts = spec.split(":")
+        rate = float(parts[1]) if len(parts) > 1 and parts[1] else 100.0
+        duration = float(parts[2]) if len(parts) > 2 and parts[2] else None
+        return SyntheticSource(rate, width=width, height=height, realtime=realtime, duration=duration)
+    if spec.lower().endswith(RECORDING_EXTENSION):
+        return ReplaySource(spec, realtime, width, height)
+    if "://" in spec:
+        return CameraSource(spec)
+    return VideoFileSource(spec, realtime)
@@ -0,0 +1,236 @@
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .clips import ClipCache, ClipPlayer
+
+# Utterance priorities, lower values are spoken first
+PRIORITY_SAFETY = 0
+PRIORITY_CORRECTION = 1
+PRIORITY_RESPONSE = 2
+PRIORITY_PRAISE = 3
+
+@dataclass(order=True)
+class Utterance:
+    priority: int
+    sequence: int
+    text: str = field(compare=False)
+    key: str = field(compare=False)
+    created: float = field(compare=False)
+    max_age: float = field(compare=False)
+    cancelled: bool = field(default=False, compare=False)
+    started: Optional[float] = field(default=None, compare=False)  # perf_counter() when speaking began
+    finished: Optional[float] = field(default=None, compare=False)  # perf_counter() when it ended
+    done: threading.Event = field(default_factory=threading.Event, compare=False)
+
+    def cancel(self):
+        """Mark the utterance as never to be spoken"""
+        self.cancelled = True
+        self.done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until this utterance was spoken or dropped; not for use on the frame path"""
+        return self.done.wait(timeout)
+
+class SpeechService(threading.Thread):
+    """Speaks queued utterances on a dedicated thread that owns the TTS engine
+
+    With a ClipCache, texts registered through preload() are rendered to
+    clips once and played from memory; the TTS engine is only started for
+    text that has no clip.
+    """
+
+    def __init__(self, rate: int = 150, max_pending: int = 8, repeat_interval: float = 3.0,
+                 clips: Optional[ClipCache] = None):
+        super().__init__(name="SpeechService", daemon=True)
+        self.rate = rate
+        self.max_pending = max_pending
+        self.repeat_interval = repeat_interval  # seconds before the same text may repeat
+
+        self.clips = clips
+        self._preload: List[str] = []  # texts waiting to be rendered and loaded
+        self._clip_audio: Dict[str, np.ndarray] = {}
+        self._player: Optional[ClipPlayer] = None
+        self._engine = None
+        self.ready = threading.Event()  # set while every preloaded clip is loaded
+        self.ready.set()
+
+        self._heap: List[Utterance] = []
+        self._pending: Dict[str, Utterance] = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._speaking = False
+        self._last_spoken_text = None
+        self._last_spoken_time = 0.0
+
+        self.spoken_count = 0
+        self.dropped_count = 0
+        self.synthesized_count = 0  # utterances spoken live because no clip existed
+
+    def preload(self, texts: Iterable[str]):
+        """Register fixed messages to be played from pre-rendered clips"""
+        if self.clips is None:
+            return
+        with self._condition:
+            self._preload.extend(texts)
+            self.ready.clear()
+            self._condition.notify()
+
+    def say(self, text: str, priority: int = PRIORITY_CORRECTION,
+            key: Optional[str] = None, max_age: float = 3.0) -> Optional[Utterance]:
+        """Queue text to be spoken without blocking
+
+        Returns the utterance that will speak the text, which is an
+        already pending one if the same text was merged into it, or None
+        if the text was dropped as a repeat.
+        """
+        key = key or text
+        now = time.time()
+        with self._condition:
+            # Drop immediate repeats of what was just said
+            if (text == self._last_spoken_text and
+                    now - self._last_spoken_time < self.repeat_interval):
+                self.dropped_count += 1
+                return None
+
+            existing = self._pending.get(key)
+            if existing is not None:
+                if existing.text == text and existing.priority <= priority:
+                    # Same message already waiting, just keep it fresh
+                    existing.created = now
+                    return existing
+                # A newer message for the same key supersedes the old one
+                existing.cancel()
+                self.dropped_count += 1
+
+            utterance = Utterance(priority, next(self._sequence), text, key, now, max_age)
+            self._pending[key] = utterance
+            heapq.heappush(self._heap, utterance)
+
+            if len(self._pending) > self.max_pending:
+                self._drop_lowest_priority()
+
+            self._condition.notify()
+            return utterance
+
+    def _drop_lowest_priority(self):
+        """Cancel the least important pending utterance"""
+        lowest = max(self._pending.values(), key=lambda u: (u.priority, -u.sequence))
+        lowest.cancel()
+        del self._pending[lowest.key]
+        self.dropped_count += 1
+
+    def _next_utterance(self, timeout: float) -> Optional[Utterance]:
+        """Pop the most important utterance that is still worth saying"""
+        with self._condition:
+            if not self._pending and not self._preload:
+                self._condition.wait(timeout)
+            if self._preload:
+                # Load new clips first so nothing is synthesized that has one
+                return None
+            now = time.time()
+            while self._heap:
+                utterance = heapq.heappop(self._heap)
+                if utterance.cancelled:
+                    continue
+                del self._pending[utterance.key]
+                if now - utterance.created > utterance.max_age:
+                    utterance.cancel()
+                    self.dropped_count += 1
+                    continue
+                self._speaking = True
+                return utterance
+            return None
+
+    @property
+    def backlog(self) -> int:
+        """Number of utterances waiting to be spoken"""
+        with self._condition:
+            return len(self._pending)
+
+    def is_busy(self) -> bool:
+        """Check if the service is speaking or has speech waiting"""
+        with self._condition:
+            return self._speaking or bool(self._pending)
+
+    def wait_until_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until all queued speech has been spoken; not for use on the frame path"""
+        deadline = None if timeout is None else time.time() + timeout
+        while self.is_busy():
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _load_clips(self):
+        """Render and load clips for preloaded texts; the first run renders them all"""
+        with self._condition:
+            texts, self._preload = self._preload, []
+        if not texts:
+            return
+        try:
+            rendered = self.clips.render(texts)
+            if rendered:
+                print(f"Rendered {rendered} speech clips to {self.clips.directory}")
+            if self._player is None:
+                self._player = ClipPlayer(self.clips.sample_rate)
+            self._clip_audio.update(self.clips.load(texts))
+        except Exception as e:
+            print(f"Speech clips unavailable, speaking live: {e}")
+        with self._condition:
+            if not self._preload:
+                self.ready.set()
+
+    def _speak(self, text: str):
+        clip = self._clip_audio.get(text)
+        if clip is not None:
+            # Only this thread waits; callers returned when they queued the text
+            self._player.play(clip).wait()
+            return
+        if self._engine is None:
+            import pyttsx3
+            self._engine = pyttsx3.init()
+            self._engine.setProperty('rate', self.rate)
+            if self.clips is not None and self.clips.voice:
+                self._engine.setProperty('voice', self.clips.voice)
+        self._engine.say(text)
+        self._engine.runAndWait()
+        self.synthesized_count += 1
+
+    def run(self):
+        # The engine and the player must be created and driven from this thread only
+        while not self._stop_event.is_set():
+            if self._preload:
+                self._load_clips()
+            utterance = self._next_utterance(timeout=0.1)
+            if utterance is None:
+                continue
+            try:
+                utterance.started = time.perf_counter()
+                self._speak(utterance.text)
+                self.spoken_count += 1
+            except Exception as e:
+                print(f"Error in text-to-speech: {e}")
+            finally:
+                utterance.finished = time.perf_counter()
+                with self._condition:
+                    self._speaking = False
+                    self._last_spoken_text = utterance.text
+                    self._last_spoken_time = time.time()
+                utterance.done.set()
+        if self._player is not None:
+            self._player.close()
+
+    def stop(self, timeout: float = 1.0):
+        """Stop the speech thread once the current utterance finishes"""
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify()
+        if self.is_alive():
+            self.join(timeout)
@@ -0,0 +1,190 @@
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Callable, Optional
+
+from .vision import CPRVisionAnalyzer, CPRMetrics
+from .pose_backends import PoseBackend, LeasedPoseBackend
+from .pipeline import LatestQueue, CaptureWorker, PooledFrame, release_item
+from .sources import FrameSource
+from .instrumentation import MetricsRegistry
+
+class Station:
+    """One manikin station: a frame source, its analyzer state and its latest results"""
+
+    def __init__(self, index: int, name: str, source: FrameSource, pool: "PosePool",
+                 inference_interval: int = 1, feedback=None,
+                 on_result: Optional[Callable[[int, Optional[CPRMetrics]], None]] = None,
+                 metrics: Optional[MetricsRegistry] = None):
+        self.index = index
+        self.name = name
+        self.source = source
+        self.pool = pool
+        self.feedback = feedback
+        self.on_result = on_result
+        self.pose = LeasedPoseBackend()
+        self.analyzer = CPRVisionAnalyzer(pose_backend=self.pose,
+                                          inference_interval=inference_interval)
+
+        # Pool bookkeeping, guarded by the pool's condition
+        self.pending = None  # newest (frame_id, frame) not yet analyzed
+        self.busy = False
+        self.queued = False
+        self.reset_requested = False
+        self.dropped = 0
+        self.frames_analyzed = 0
+        self.torn_frames = 0  # results dropped because the source overwrote the frame
+
+        self.display_queue = LatestQueue()
+        self.capture_worker = CaptureWorker(source, [self.display_queue, self])
+
+        self._timer = None
+        self.feedback_latency = None
+        if metrics is not None:
+            labels = {'station': name}
+            self._timer = metrics.histogram("station_analysis_seconds",
+                                            "Time spent analyzing a station frame", labels)
+            self.feedback_latency = metrics.feedback_latency(labels)
+            metrics.gauge("station_analyzed_frames_total", "Frames analyzed per station",
+                          lambda: self.frames_analyzed, labels, kind="counter")
+            metrics.gauge("station_dropped_frames_total", "Frames dropped while the pool was busy",
+                          lambda: self.dropped, labels, kind="counter")
+            metrics.gauge("station_torn_frames_total", "Results dropped because the frame was overwritten",
+                          lambda: self.torn_frames, labels, kind="counter")
+            metrics.gauge("station_capture_gap_frames_total", "Frames missing from the source, from timestamp gaps",
+                          lambda: self.capture_worker.gap_frames, labels, kind="counter")
+
+    def put(self, item):
+        """Capture worker hook: offer the newest frame to the pose pool"""
+        self.pool.submit(self, item)
+
+    def reset(self):
+        """Clear compression state before the next trainee, on the next analyzed frame"""
+        self.reset_requested = True
+
+    def analyze(self, frame: PooledFrame, backend: PoseBackend) -> Optional[CPRMetrics]:
+        """Analyze a frame with a pooled backend; only one pool worker calls this at a time"""
+        if self.reset_requested:
+            self.reset_requested = False
+            self.analyzer.reset()
+        start = time.perf_counter()
+        self.pose.backend = backend
+        metrics = self.analyzer.analyze_frame(frame.image, frame.timestamp)
+        if self._timer is not None:
+            self._timer.observe_since(start)
+        self.frames_analyzed += 1
+        if metrics is not None:
+            metrics.captured = frame.captured
+        return metrics
+
+    def start(self):
+        self.capture_worker.start()
+
+    def stop(self):
+        self.capture_worker.stop()
+        self.source.release()
+
+class PosePool:
+    """Fixed set of pose workers shared by every station
+
+    Stations with a new frame wait in a FIFO, so each gets a turn before
+    any station gets a second one and a busy station cannot starve the
+    rest. Only the newest frame of each station is kept. A worker prefers
+    the station it served last when that station is near the front of the
+    line, which keeps the pose model's own tracking valid without breaking
+    fairness.
+    """
+
+    def __init__(self, backend_factory: Callable[[], PoseBackend], size: int = 2):
+        self.backends = [backend_factory() for _ in range(size)]
+        self._ready = deque()
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._workers = [threading.Thread(target=self._run, args=(backend,),
+                                          name=f"PoseWorker-{i}", daemon=True)
+                         for i, backend in enumerate(self.backends)]
+        self.station_switches = 0
+
+    def start(self):
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, station: Station, item):
+        """Replace the station's pending frame and put it in line if needed"""
+        with self._condition:
+            if station.pending is not None:
+                station.dropped += 1
+                release_item(station.pending)
+            station.pending = item
+            if not station.busy and not station.queued:
+                station.queued = True
+                self._ready.append(station)
+                self._condition.notify()
+
+    def _take(self, previous: Optional[Station]) -> Optional[Station]:
+        with self._condition:
+            while not self._ready:
+                if self._stop_event.is_set():
+                    return None
+                self._condition.wait(0.1)
+            station = self._ready[0]
+            # Affinity only within the first len(workers) places, so nobody waits long
+            lookahead = min(len(self._ready), len(self._workers))
+            for i in range(lookahead):
+                if self._ready[i] is previous:
+                    station = previous
+                    break
+            self._ready.remove(station)
+            station.queued = False
+            station.busy = True
+            return station
+
+    def _release(self, station: Station):
+        with self._condition:
+            station.busy = False
+            if station.pending is not None and not station.queued:
+                station.queued = True
+                self._ready.append(station)
+                self._condition.notify()
+
+    def _run(self, backend: PoseBackend):
+        previous = None
+        while not self._stop_event.is_set():
+            station = self._take(previous)
+            if station is None:
+                continue
+            with self._condition:
+                frame_id, frame = station.pending
+                station.pending = None
+            try:
+                if station is not previous:
+                    # Tracking state in the model belongs to another trainee
+                    backend.reset()
+                    self.station_switches += 1
+                    previous = station
+                metrics = station.analyze(frame, backend)
+                if not frame.is_intact():
+                    station.torn_frames += 1
+                elif station.on_result is not None:
+                    station.on_result(station.index, metrics)
+            except Exception as e:
+                print(f"Error analyzing {station.name}: {e}")
+                traceback.print_exc()
+            finally:
+                frame.release()
+                self._release(station)
+
+    def stop(self, timeout: float = 1.0):
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join(timeout)
+        for backend in self.backends:
+            backend.close()
+
+    def latency_summary(self) -> dict:
+        """Pose latency of the busiest worker"""
+        summaries = [backend.latency_summary() for backend in self.backends]
+        return max(summaries, key=lambda summary: summary['count'])
@@ -0,0 +1,384 @@
+import re
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+import cv2
+
+from .vision import CPRVisionAnalyzer, CPRMetrics
+from .pose_backends import create_pose_backend
+from .feedback import CPRFeedback
+from .speech import SpeechService
+from .pipeline import LatestQueue, CaptureWorker, InferenceWorker, release_item
+from .sources import open_source
+from .instrumentation import MetricsRegistry
+from .websocket import WebSocket, WebSocketClosed
+
+class MetricsSubscription:
+    """Pending metric changes for one websocket client
+
+    Deltas that arrive while the client is still sending are merged, so a
+    slow client gets fewer, larger updates instead of a growing backlog.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, object] = {}
+        self._condition = threading.Condition()
+
+    def push(self, delta: Dict[str, object]):
+        with self._condition:
+            self._pending.update(delta)
+            self._condition.notify()
+
+    def get(self, timeout: float) -> Dict[str, object]:
+        """Wait for changes; returns an empty dict on timeout"""
+        with self._condition:
+            if not self._pending:
+                self._condition.wait(timeout)
+            pending, self._pending = self._pending, {}
+            return pending
+
+class SessionWorker(threading.Thread):
+    """Long-lived frame source, analyzer and JPEG encoder for one web session
+
+    Capture and inference run on the pipeline workers used by the desktop
+    app. This thread draws the overlay and encodes each displayed frame to
+    JPEG once, and every MJPEG viewer of the session shares those bytes.
+    The session stops itself after idle_timeout seconds without viewers.
+    """
+
+    def __init__(self, session_id: str, source: str = "0", jpeg_quality: int = 75, max_fps: float = 30.0,
+                 idle_timeout: float = 30.0, pose_backend: str = "mediapipe",
+                 pose_options: Optional[dict] = None):
+        super().__init__(name=f"SessionWorker-{session_id[:8]}", daemon=True)
+        self.session_id = session_id
+        self.source = source
+        self.jpeg_quality = jpeg_quality
+        self.frame_interval = 1.0 / max_fps
+        self.idle_timeout = idle_timeout
+
+        self.metrics = MetricsRegistry()
+        self.encode_timer = self.metrics.stage_timer("encode")
+        self.feedback_latency = self.metrics.feedback_latency()
+        self.analyzer = CPRVisionAnalyzer(
+            pose_backend=create_pose_backend(pose_backend, **(pose_options or {})))
+        # Cues reach the browser as visual state; a speech service that is
+        # never started keeps them off the server's speakers
+        self.feedback = CPRFeedback(SpeechService())
+
+        self.frame_source = None
+        self.display_queue = LatestQueue()
+        self.inference_queue = LatestQueue()
+        self.capture_worker = None
+        self.inference_worker = None
+        self.active = True
+        self.error = ""
+
+        # Newest encoded frame, handed to MJPEG viewers
+        self._jpeg: Optional[bytes] = None
+        self._jpeg_seq = 0
+        self._jpeg_condition = threading.Condition()
+        self.viewers = 0
+        self._last_viewer_time = time.monotonic()
+
+        # Metric state as last published, and the websocket clients to notify
+        self._latest_metrics: Optional[CPRMetrics] = None
+        self._state: Dict[str, object] = {'detected': False}
+        self._subscribers = []
+        self._state_lock = threading.Lock()
+        self.messages_sent = 0
+
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            self.frame_source = open_source(self.source)
+            if not self.frame_source.is_open():
+                self.error = f"Could not open {self.frame_source.name}"
+                return
+            self.capture_worker = CaptureWorker(
+                self.frame_source, [self.display_queue, self.inference_queue], self.metrics)
+            self.inference_worker = InferenceWorker(
+                self.analyzer, self.inference_queue, self._on_result, self.metrics)
+            self.inference_worker.set_active(self.active)
+            self.capture_worker.start()
+            self.inference_worker.start()
+            self._encode_loop()
+        except Exception as e:
+            self.error = str(e)
+            traceback.print_exc()
+        finally:
+            self._shutdown()
+
+    def _encode_loop(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        next_frame = 0.0
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            if self.viewers == 0:
+                if now - self._last_viewer_time > self.idle_timeout:
+                    print(f"Session {self.session_id[:8]} idle, stopping")
+                    return
+                # Nobody is watching, so skip the overlay and encoding entirely
+                release_item(self.display_queue.get(timeout=0.1))
+                continue
+            self._last_viewer_time = now
+
+            if now < next_frame:
+                time.sleep(next_frame - now)
+            item = self.display_queue.get(timeout=0.1)
+            if item is None:
+                continue
+            next_frame = time.monotonic() + self.frame_interval
+
+            start = time.perf_counter()
+            frame_id, frame = item
+            try:
+                image = frame.image
+                metrics = self._latest_metrics
+                if metrics and self.active:
+                    image = self.analyzer.draw_guidelines(image.copy(), metrics)
+                ok, jpeg = cv2.imencode(".jpg", image, params)
+                # A frame bus slot may have been reused while it was encoded
+                ok = ok and frame.is_intact()
+            finally:
+                frame.release()
+            self.encode_timer.observe_since(start)
+            if not ok:
+                continue
+            with self._jpeg_condition:
+                self._jpeg = jpeg.tobytes()
+                self._jpeg_seq += 1
+                self._jpeg_condition.notify_all()
+
+    def _shutdown(self):
+        if self.inference_worker is not None:
+            self.inference_worker.stop()
+        if self.capture_worker is not None:
+            self.capture_worker.stop()
+        if self.frame_source is not None:
+            self.frame_source.release()
+        self.analyzer.pose.close()
+        with self._jpeg_condition:
+            self._jpeg_condition.notify_all()
+
+    def _on_result(self, frame_id: int, metrics: Optional[CPRMetrics]):
+        """Inference worker callback: publish only the values that changed"""
+        self._latest_metrics = metrics
+        if metrics is None:
+            state = {'detected': False}
+        else:
+            visual = self.feedback.get_visual_feedback(metrics)
+            state = {
+                'detected': True,
+                'rate': round(metrics.compression_rate, 1),
+                'depth': round(metrics.compression_depth, 1),
+                'position_correct': bool(metrics.is_correct_position),
+                'count': metrics.compression_count,
+                'rate_status': visual['rate_status'],
+                'depth_status': visual['depth_status'],
+                'position_status': visual['position_status']
+            }
+            self.feedback.provide_feedback(metrics)
+            if metrics.captured:
+                self.feedback_latency.observe(time.monotonic() - metrics.captured)
+        with self._state_lock:
+            delta = {key: value for key, value in state.items() if self._state.get(key) != value}
+            if not delta:
+                return
+            self._state.update(delta)
+            for subscription in self._subscribers:
+                subscription.push(delta)
+
+    def set_active(self, active: bool):
+        """Pause or resume analysis; the video keeps streaming"""
+        self.active = active
+        if self.inference_worker is not None:
+            self.inference_worker.set_active(active)
+        if not active:
+            self._latest_metrics = None
+
+    def add_viewer(self, change: int):
+        with self._jpeg_condition:
+            self.viewers += change
+            self._last_viewer_time = time.monotonic()
+
+    def subscribe(self) -> MetricsSubscription:
+        """Register a metrics client; its first update is the full current state"""
+        subscription = MetricsSubscription()
+        with self._state_lock:
+            subscription.push(dict(self._state))
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: MetricsSubscription):
+        with self._state_lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def wait_for_jpeg(self, last_seq: int, timeout: float = 1.0) -> Tuple[int, Optional[bytes]]:
+        """Wait for a frame newer than last_seq; returns (seq, jpeg) or (last_seq, None)"""
+        with self._jpeg_condition:
+            if self._jpeg_seq == last_seq and not self._stop_event.is_set():
+                self._jpeg_condition.wait(timeout)
+            if self._jpeg_seq == last_seq:
+                return last_seq, None
+            return self._jpeg_seq, self._jpeg
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop_event.is_set() or (self.ident is not None and not self.is_alive())
+
+    def stop(self, timeout: float = 2.0):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+_SESSION_PATH = re.compile(r"^/(stream|ws)/([A-Za-z0-9_-]+)(\.mjpg)?$")
+
+class StreamServer(threading.Thread):
+    """Serves each session's annotated video as MJPEG and its metrics over a websocket
+
+    GET /stream/<session>.mjpg  multipart JPEG stream for an <img> tag
+    GET /ws/<session>           JSON metric deltas; add ?debug=1 for pipeline timings
+    """
+
+    BOUNDARY = "cprframe"
+
+    def __init__(self, port: int = 8502, host: str = "127.0.0.1", registry: Optional[MetricsRegistry] = None):
+        super().__init__(name="StreamServer", daemon=True)
+        self.sessions: Dict[str, SessionWorker] = {}
+        self._lock = threading.Lock()
+        self.mjpeg_clients = 0
+        self.ws_clients = 0
+        self.bytes_sent = 0
+        if registry is not None:
+            registry.gauge("stream_sessions", "Web sessions with a running worker",
+                           lambda: len(self.sessions))
+            registry.gauge("stream_mjpeg_clients", "Connected MJPEG viewers", lambda: self.mjpeg_clients)
+            registry.gauge("stream_ws_clients", "Connected metrics websockets", lambda: self.ws_clients)
+            registry.gauge("stream_bytes_sent_total", "JPEG bytes sent to viewers",
+                           lambda: self.bytes_sent, kind="counter")
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                path, _, query = self.path.partition('?')
+                match = _SESSION_PATH.match(path)
+                session = server.get_session(match.group(2)) if match else None
+                if session is None:
+                    self.send_error(404)
+                    return
+                if match.group(1) == "stream":
+                    server._serve_mjpeg(self, session)
+                else:
+                    server._serve_metrics(self, session, "debug=1" in query)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+
+    def open_session(self, session_id: str, **options) -> SessionWorker:
+        """Start a session's worker, or return the one already running"""
+        with self._lock:
+            worker = self.sessions.get(session_id)
+            if worker is None or worker.stopped:
+                worker = SessionWorker(session_id, **options)
+                worker.start()
+                self.sessions[session_id] = worker
+            return worker
+
+    def get_session(self, session_id: str) -> Optional[SessionWorker]:
+        with self._lock:
+            worker = self.sessions.get(session_id)
+            if worker is not None and worker.stopped:
+                del self.sessions[session_id]
+                return None
+            return worker
+
+    def close_session(self, session_id: str):
+        with self._lock:
+            worker = self.sessions.pop(session_id, None)
+        if worker is not None:
+            worker.stop()
+
+    def _serve_mjpeg(self, handler: BaseHTTPRequestHandler, session: SessionWorker):
+        handler.send_response(200)
+        handler.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={self.BOUNDARY}")
+        handler.send_header("Cache-Control", "no-cache, private")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        handler.close_connection = True
+        session.add_viewer(1)
+        with self._lock:
+            self.mjpeg_clients += 1
+        seq = 0
+        try:
+            while not session.stopped:
+                seq, jpeg = session.wait_for_jpeg(seq)
+                if jpeg is None:
+                    continue
+                handler.wfile.write(f"--{self.BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                    f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                handler.wfile.write(jpeg)
+                handler.wfile.write(b"\r\n")
+                handler.wfile.flush()
+                self.bytes_sent += len(jpeg)
+        except OSError:
+            pass  # Viewer went away
+        finally:
+            session.add_viewer(-1)
+            with self._lock:
+                self.mjpeg_clients -= 1
+
+    def _serve_metrics(self, handler: BaseHTTPRequestHandler, session: SessionWorker, debug: bool):
+        ws = WebSocket.accept(handler)
+        if ws is None:
+            return
+        subscription = session.subscribe()
+        with self._lock:
+            self.ws_clients += 1
+        # The reader only notices the client closing; clients send nothing else
+        reader = threading.Thread(target=self._drain, args=(ws,), daemon=True)
+        reader.start()
+        next_debug = 0.0
+        try:
+            while not ws.closed and not session.stopped:
+                message = subscription.get(timeout=0.5)
+                if debug and time.monotonic() >= next_debug:
+                    message['debug'] = session.metrics.summary_lines()
+                    next_debug = time.monotonic() + 0.5
+                if message:
+                    ws.send_json(message)
+                    session.messages_sent += 1
+        except WebSocketClosed:
+            pass
+        finally:
+            session.unsubscribe(subscription)
+            with self._lock:
+                self.ws_clients -= 1
+            ws.close()
+
+    @staticmethod
+    def _drain(ws: WebSocket):
+        try:
+            while True:
+                ws.recv()
+        except (WebSocketClosed, OSError, ValueError):
+            ws.closed = True
+
+    def run(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        for session_id in list(self.sessions):
+            self.close_session(session_id)
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,165 @@
+import numpy as np
+from typing import Optional, Tuple
+
+class RoiTracker:
+    """Tracks a padded torso and arm box so pose inference can run on a crop
+
+    The box only moves when the tracked landmarks drift near its edge or
+    shrink well inside it, so consecutive crops stay identical while the
+    trainee is in place and the pose model's own tracking stays valid.
+    """
+
+    # Nose, ears, shoulders, elbows, wrists and hips in MediaPipe indexing.
+    # The head is kept in the crop so the pose detector can re-acquire.
+    TRACKED_LANDMARKS = np.array([0, 7, 8, 11, 12, 13, 14, 15, 16, 23, 24])
+
+    def __init__(self, padding: float = 0.35, min_size: int = 160,
+                 min_visibility: float = 0.5, edge_margin: float = 0.1):
+        self.padding = padding  # fraction of the box size added on each side
+        self.min_size = min_size  # smallest crop side in pixels
+        self.min_visibility = min_visibility
+        self.edge_margin = edge_margin  # refit when landmarks enter this border
+        self.roi: Optional[Tuple[int, int, int, int]] = None  # x0, y0, x1, y1 in pixels
+
+        # Counters for measuring how often the crop is used
+        self.crop_frames = 0
+        self.full_frames = 0
+        self.lost_count = 0
+
+    def crop(self, frame: np.ndarray) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """Return a view of the tracked region and its offset, or the full frame"""
+        if self.roi is None:
+            return frame, (0, 0)
+        x0, y0, x1, y1 = self.roi
+        self.crop_frames += 1
+        return frame[y0:y1, x0:x1], (x0, y0)
+
+    def to_frame(self, landmarks: np.ndarray, crop_shape: Tuple[int, int],
+                 offset: Tuple[int, int], frame_shape: Tuple[int, int]) -> np.ndarray:
+        """Map crop-normalized landmarks back to full-frame normalized coordinates"""
+        crop_h, crop_w = crop_shape[:2]
+        frame_h, frame_w = frame_shape[:2]
+        landmarks[:, 0] = (landmarks[:, 0] * crop_w + offset[0]) / frame_w
+        landmarks[:, 1] = (landmarks[:, 1] * crop_h + offset[1]) / frame_h
+        # z is relative to the hip midpoint scale, which follows the x axis
+        landmarks[:, 2] *= crop_w / frame_w
+        return landmarks
+
+    def lost(self):
+        """Drop the tracked region so the next frame runs full-frame detection"""
+        if self.roi is not None:
+            self.lost_count += 1
+        self.roi = None
+
+    def update(self, landmarks: np.ndarray, frame_shape: Tuple[int, int]):
+        """Refit the tracked region from full-frame landmarks if needed"""
+        frame_h, frame_w = frame_shape[:2]
+        tracked = landmarks[self.TRACKED_LANDMARKS]
+        visible = tracked[tracked[:, 3] >= self.min_visibility]
+        if len(visible) < 4:
+            self.lost()
+            return
+
+        xs = visible[:, 0] * frame_w
+        ys = visible[:, 1] * frame_h
+        box = (xs.min(), ys.min(), xs.max(), ys.max())
+        if self.roi is not None and not self._needs_refit(box):
+            return
+
+        box_w = box[2] - box[0]
+        box_h = box[3] - box[1]
+        side_w = max(box_w * (1 + 2 * self.padding), self.min_size)
+        side_h = max(box_h * (1 + 2 * self.padding), self.min_size)
+        center_x = (box[0] + box[2]) / 2
+        center_y = (box[1] + box[3]) / 2
+        x0 = int(max(0, center_x - side_w / 2))
+        y0 = int(max(0, center_y - side_h / 2))
+        x1 = int(min(frame_w, center_x + side_w / 2))
+        y1 = int(min(frame_h, center_y + side_h / 2))
+        if x1 - x0 >= frame_w * 0.9 and y1 - y0 >= frame_h * 0.9:
+            # The crop would be almost the whole frame, so skip cropping
+            self.roi = None
+            return
+        self.roi = (x0, y0, x1, y1)
+
+    def _needs_refit(self, box: Tuple[float, float, float, float]) -> bool:
+        """Check if the landmark box drifted to the edge or shrank well inside the crop"""
+        x0, y0, x1, y1 = self.roi
+        margin_x = (x1 - x0) * self.edge_margin
+        margin_y = (y1 - y0) * self.edge_margin
+        if (box[0] < x0 + margin_x or box[1] < y0 + margin_y or
+                box[2] > x1 - margin_x or box[3] > y1 - margin_y):
+            return True
+        box_area = (box[2] - box[0]) * (box[3] - box[1])
+        return box_area < 0.15 * (x1 - x0) * (y1 - y0)
+
+class LandmarkPredictor:
+    """Predicts landmarks between pose runs with a vectorized alpha-beta filter
+
+    Each coordinate is modelled as motion around a slowly moving centre.
+    While the compression rate is known the motion is propagated as a
+    harmonic oscillator at that rate, which follows the periodic stroke far
+    better than straight-line extrapolation; otherwise it falls back to
+    constant velocity. All landmarks are updated at once.
+    """
+
+    def __init__(self, alpha: float = 0.7, beta: float = 0.3,
+                 center_time_constant: float = 1.0, max_gap: float = 0.5):
+        self.alpha = alpha  # position correction gain
+        self.beta = beta  # velocity correction gain
+        self.center_time_constant = center_time_constant  # seconds
+        self.max_gap = max_gap  # seconds without a measurement before predictions stop
+        self.reset()
+
+    def reset(self):
+        """Forget the motion state"""
+        self.center = None  # (N, 3) slowly moving mean position
+        self.offset = None  # (N, 3) displacement from the centre
+        self.velocity = None
+        self.visibility = None
+        self.last_time = None
+        self.angular_rate = 0.0  # rad/s of the periodic motion, 0 if unknown
+
+    def set_rate(self, rate_cpm: float):
+        """Set the expected periodic motion rate in cycles per minute"""
+        self.angular_rate = 2 * np.pi * rate_cpm / 60.0 if rate_cpm > 0 else 0.0
+
+    def _propagate(self, dt: float):
+        """Return (offset, velocity) advanced by dt seconds"""
+        w = self.angular_rate
+        if w > 0:
+            cos_w, sin_w = np.cos(w * dt), np.sin(w * dt)
+            offset = self.offset * cos_w + self.velocity * (sin_w / w)
+            velocity = self.velocity * cos_w - self.offset * (w * sin_w)
+            return offset, velocity
+        return self.offset + self.velocity * dt, self.velocity
+
+    def update(self, timestamp: float, landmarks: np.ndarray):
+        """Correct the motion state with measured (N, 4) landmarks"""
+        measured = landmarks[:, :3].astype(np.float64)
+        dt = None if self.last_time is None else timestamp - self.last_time
+        if self.center is None or dt is None or dt <= 0 or dt > self.max_gap:
+            self.center = measured
+            self.offset = np.zeros_like(measured)
+            self.velocity = np.zeros_like(measured)
+        else:
+            self.center += (1 - np.exp(-dt / self.center_time_constant)) * (measured - self.center)
+            offset, velocity = self._propagate(dt)
+            residual = measured - self.center - offset
+            self.offset = offset + self.alpha * residual
+            self.velocity = velocity + (self.beta / dt) * residual
+        self.visibility = landmarks[:, 3].copy()
+        self.last_time = timestamp
+
+    def predict(self, timestamp: float) -> Optional[np.ndarray]:
+        """Extrapolate (N, 4) landmarks to a timestamp, or None if the state is stale"""
+        if self.center is None:
+            return None
+        dt = timestamp - self.last_time
+        if dt < 0 or dt > self.max_gap:
+            return None
+        offset, _ = self._propagate(dt)
+        predicted = np.empty((len(self.center), 4), dtype=np.float32)
+        predicted[:, :3] = self.center + offset
+        predicted[:, 3] = self.visibility
+        return predicted
@@ -1,13 +1,97 @@
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QLabel, QPushButton, QFrame)
-from PyQt6.QtCore import Qt, QTimer
-from PyQt6.QtGui import QImage, QPixmap, QColor
+from PyQt6.QtCore import Qt, QTimer, QRect, pyqtSignal
+from PyQt6.QtGui import QImage, QColor, QKeySequence, QShortcut, QPainter
 import cv2
 import numpy as np
-from typing import Optional
+from typing import Callable, Dict, Optional
+
+# Text colour for each status reported by CPRFeedback.get_visual_feedback()
+STATUS_COLORS = {'good': 'green', 'warning': 'red', 'idle': 'gray'}
+
+def status_styles(base: str) -> Dict[str, str]:
+    """One complete stylesheet per status, built once instead of on every update"""
+    return {status: f"{base} color: {color};" for status, color in STATUS_COLORS.items()}
+
+class MetricLabel(QLabel):
+    """Label that only calls into Qt when its text or status actually changes
+
+    Setting a stylesheet makes Qt re-polish the widget, so colours switch
+    between the precomputed styles, and only on a change of status.
+    """
+
+    def __init__(self, text: str, base_style: str):
+        super().__init__(text)
+        self._text = text
+        self._status = None
+        self._styles = status_styles(base_style)
+        self.setStyleSheet(base_style)
+
+    def set_value(self, text: str, status: Optional[str] = None):
+        if text != self._text:
+            self._text = text
+            self.setText(text)
+        if status is not None and status != self._status:
+            self._status = status
+            self.setStyleSheet(self._styles.get(status, self._styles['warning']))
+
+class VideoWidget(QWidget):
+    """Paints BGR frames directly, without per-frame allocations or pixmaps
+
+    Each frame is converted once into a BGRA buffer owned by the widget;
+    on little-endian machines that is Qt's native RGB32 layout, so the
+    painter scales it without another conversion. The optional overlay
+    draws on that buffer, never on the caller's frame, and the target
+    rectangle is only recomputed when the widget or frame size changes.
+    """
+
+    def __init__(self, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+        self._buffer = None
+        self._image = None
+        self._target = QRect()
+
+    def show_frame(self, frame: np.ndarray, overlay: Optional[Callable[[np.ndarray], None]] = None):
+        """Copy a BGR frame into the display buffer, draw the overlay on it and schedule a repaint"""
+        h, w = frame.shape[:2]
+        if self._buffer is None or self._buffer.shape[:2] != (h, w):
+            self._buffer = np.empty((h, w, 4), dtype=np.uint8)
+            # The QImage shares the buffer's memory, which lives as long as the widget
+            self._image = QImage(self._buffer.data, w, h, self._buffer.strides[0],
+                                 QImage.Format.Format_RGB32)
+            self._update_target()
+        cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA, dst=self._buffer)
+        if overlay is not None:
+            overlay(self._buffer)
+        self.update()
+
+    def _update_target(self):
+        if self._buffer is None:
+            return
+        h, w = self._buffer.shape[:2]
+        scale = min(self.width() / w, self.height() / h)
+        target_w, target_h = int(w * scale), int(h * scale)
+        self._target = QRect((self.width() - target_w) // 2, (self.height() - target_h) // 2,
+                             target_w, target_h)
+
+    def resizeEvent(self, event):
+        self._update_target()
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.GlobalColor.black)
+        if self._image is not None:
+            painter.drawImage(self._target, self._image)
+        painter.end()
 
 class CPRTrainingUI(QMainWindow):
-    def __init__(self):
+    # Emitted when a training session starts or ends, from buttons or voice commands
+    training_started = pyqtSignal()
+    training_stopped = pyqtSignal()
+
+    def __init__(self, metrics_rate: float = 10.0):
         super().__init__()
         self.setWindowTitle("CPR Training Module")
         self.setGeometry(100, 100, 1200, 800)
@@ -21,10 +105,9 @@ class CPRTrainingUI(QMainWindow):
         self.video_frame = QFrame()
         self.video_frame.setMinimumSize(800, 600)
         self.video_frame.setStyleSheet("background-color: black;")
-        self.video_label = QLabel()
-        self.video_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.video_widget = VideoWidget()
         self.video_layout = QVBoxLayout(self.video_frame)
-        self.video_layout.addWidget(self.video_label)
+        self.video_layout.addWidget(self.video_widget)
         
         # Create metrics display area
         self.metrics_frame = QFrame()
@@ -32,24 +115,32 @@ class CPRTrainingUI(QMainWindow):
         self.metrics_layout = QVBoxLayout(self.metrics_frame)
         
         # Create metric labels
-        self.rate_label = QLabel("Compression Rate: 0 cpm")
-        self.depth_label = QLabel("Compression Depth: 0 cm")
-        self.position_label = QLabel("Hand Position: Not Detected")
-        
-        # Style the metric labels
+        self.rate_label = MetricLabel("Compression Rate: 0 cpm", "font-size: 16px; padding: 10px;")
+        self.depth_label = MetricLabel("Compression Depth: 0 cm", "font-size: 16px; padding: 10px;")
+        self.position_label = MetricLabel("Hand Position: Not Detected", "font-size: 16px; padding: 10px;")
         for label in [self.rate_label, self.depth_label, self.position_label]:
-            label.setStyleSheet("font-size: 16px; padding: 10px;")
             self.metrics_layout.addWidget(label)
             
         # Add status indicators
-        self.rate_status = QLabel("Rate Status: Waiting...")
-        self.depth_status = QLabel("Depth Status: Waiting...")
-        self.position_status = QLabel("Position Status: Waiting...")
-        
+        self.rate_status = MetricLabel("Rate Status: Waiting...", "font-size: 14px; padding: 5px;")
+        self.depth_status = MetricLabel("Depth Status: Waiting...", "font-size: 14px; padding: 5px;")
+        self.position_status = MetricLabel("Position Status: Waiting...", "font-size: 14px; padding: 5px;")
         for status in [self.rate_status, self.depth_status, self.position_status]:
-            status.setStyleSheet("font-size: 14px; padding: 5px;")
             self.metrics_layout.addWidget(status)
             
+        # Metrics arrive with every analyzed frame but are shown at most
+        # metrics_rate times a second, independent of the video refresh
+        self.pending_metrics = None
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self.refresh_metrics)
+        self.metrics_timer.start(max(1, int(1000 / metrics_rate)))
+            
+        # Readiness of the components that load after the window is shown
+        self.startup_label = QLabel()
+        self.startup_label.setStyleSheet("font-size: 12px; color: gray; padding: 5px;")
+        self.metrics_layout.addWidget(self.startup_label)
+        self.component_status = {}
+            
         # Add control buttons
         self.start_button = QPushButton("Start Training")
         self.pause_button = QPushButton("Pause")
@@ -83,56 +174,73 @@ class CPRTrainingUI(QMainWindow):
         self.pause_button.clicked.connect(self.pause_training)
         self.stop_button.clicked.connect(self.stop_training)
         
+        # Debug overlay with live pipeline timings, toggled with F3
+        self.debug_label = QLabel(self.video_frame)
+        self.debug_label.setStyleSheet(
+            "background-color: rgba(0, 0, 0, 160); color: #00ff00; "
+            "font-family: monospace; font-size: 11px; padding: 6px;"
+        )
+        self.debug_label.move(10, 10)
+        self.debug_label.hide()
+        self.debug_shortcut = QShortcut(QKeySequence("F3"), self)
+        self.debug_shortcut.activated.connect(self.toggle_debug_overlay)
+        
         # Initialize state
         self.is_training = False
         self.is_paused = False
         
-    def update_video_frame(self, frame: np.ndarray):
-        """Update the video display with a new frame"""
+    def update_video_frame(self, frame: np.ndarray, overlay: Optional[Callable[[np.ndarray], None]] = None):
+        """Update the video display with a new BGR frame
+
+        overlay, if given, draws on the display copy of the frame, so the
+        caller's frame is never modified.
+        """
         if frame is None:
             return
             
         try:
-            # Convert frame to RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Convert to QImage
-            h, w, ch = rgb_frame.shape
-            bytes_per_line = ch * w
-            qt_image = QImage(rgb_frame.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-            
-            # Scale image to fit label while maintaining aspect ratio
-            scaled_pixmap = QPixmap.fromImage(qt_image).scaled(
-                self.video_label.size(),
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.FastTransformation
-            )
-            
-            self.video_label.setPixmap(scaled_pixmap)
+            self.video_widget.show_frame(frame, overlay)
         except Exception as e:
             print(f"Error updating video frame: {e}")
         
     def update_metrics(self, metrics: dict):
-        """Update the metrics display"""
-        # Update rate
-        self.rate_label.setText(f"Compression Rate: {metrics['rate_value']:.1f} cpm")
-        self.rate_status.setText(f"Rate Status: {metrics['rate_status'].upper()}")
-        self.rate_status.setStyleSheet(
-            f"color: {'green' if metrics['rate_status'] == 'good' else 'red'};"
-        )
+        """Take the latest metrics; the labels catch up on the next refresh tick"""
+        self.pending_metrics = metrics
         
-        # Update depth
-        self.depth_label.setText(f"Compression Depth: {metrics['depth_value']:.1f} cm")
-        self.depth_status.setText(f"Depth Status: {metrics['depth_status'].upper()}")
-        self.depth_status.setStyleSheet(
-            f"color: {'green' if metrics['depth_status'] == 'good' else 'red'};"
-        )
+    def refresh_metrics(self):
+        """Show the newest metrics, touching only labels whose text or status changed"""
+        metrics = self.pending_metrics
+        if metrics is None:
+            return
+        self.pending_metrics = None
+        self.rate_label.set_value(f"Compression Rate: {metrics['rate_value']:.1f} cpm")
+        self.rate_status.set_value(f"Rate Status: {metrics['rate_status'].upper()}", metrics['rate_status'])
+        self.depth_label.set_value(f"Compression Depth: {metrics['depth_value']:.1f} cm")
+        self.depth_status.set_value(f"Depth Status: {metrics['depth_status'].upper()}", metrics['depth_status'])
+        self.position_status.set_value(f"Position Status: {metrics['position_status'].upper()}",
+                                       metrics['position_status'])
         
-        # Update position
-        self.position_status.setText(f"Position Status: {metrics['position_status'].upper()}")
-        self.position_status.setStyleSheet(
-            f"color: {'green' if metrics['position_status'] == 'good' else 'red'};"
-        )
+    def set_component_status(self, name: str, status: str):
+        """Show the startup state of a component, e.g. 'loading...' or 'ready'"""
+        self.component_status[name] = status
+        self.startup_label.setText("\n".join(f"{component}: {state}"
+                                             for component, state in self.component_status.items()))
+        
+    def toggle_debug_overlay(self):
+        """Show or hide the debug overlay"""
+        visible = not self.debug_label.isVisible()
+        self.debug_label.setVisible(visible)
+        if visible:
+            self.debug_label.raise_()
+            
+    def is_debug_overlay_visible(self) -> bool:
+        """Check if the debug overlay is shown"""
+        return self.debug_label.isVisible()
+        
+    def set_debug_text(self, lines: list):
+        """Replace the debug overlay text"""
+        self.debug_label.setText("\n".join(lines))
+        self.debug_label.adjustSize()
         
     def start_training(self):
         """Start the training session"""
@@ -141,20 +249,28 @@ class CPRTrainingUI(QMainWindow):
         self.start_button.setEnabled(False)
         self.pause_button.setEnabled(True)
         self.stop_button.setEnabled(True)
+        self.training_started.emit()
         
     def pause_training(self):
-        """Pause the training session"""
-        self.is_paused = not self.is_paused
+        """Toggle pause, as the Pause/Resume button does"""
+        self.set_paused(not self.is_paused)
+        
+    def set_paused(self, paused: bool):
+        """Pause or resume the training session"""
+        self.is_paused = paused
         self.pause_button.setText("Resume" if self.is_paused else "Pause")
         
     def stop_training(self):
         """Stop the training session"""
+        was_training = self.is_training
         self.is_training = False
         self.is_paused = False
         self.start_button.setEnabled(True)
         self.pause_button.setEnabled(False)
         self.stop_button.setEnabled(False)
         self.pause_button.setText("Pause")
+        if was_training:
+            self.training_stopped.emit()
         
     def is_active(self) -> bool:
         """Check if the training session is active"""
@@ -1,8 +1,14 @@
+import time
 import cv2
-import mediapipe as mp
 import numpy as np
 from dataclasses import dataclass
+from functools import partial
 from typing import Tuple, Optional
+from .compression import CompressionDetector
+from .tracking import RoiTracker, LandmarkPredictor
+from .overlay import OverlayRenderer
+from .pose_backends import (PoseBackend, LandmarkMapping, create_pose_backend, LEFT_SHOULDER,
+                            RIGHT_SHOULDER, LEFT_WRIST, RIGHT_WRIST)
 
 @dataclass
 class CPRMetrics:
@@ -10,112 +16,207 @@ class CPRMetrics:
     compression_depth: float  # estimated depth in cm
     hand_position: Tuple[float, float]  # normalized coordinates
     is_correct_position: bool
+    compression_count: int = 0  # compressions detected so far
+    compression_amplitude: float = 0.0  # wrist travel of the last cycle, normalized
+    timestamp: float = 0.0  # time of the analyzed frame in seconds
+    captured: float = 0.0  # time.monotonic() when that frame was read, 0 if unknown
+
+# Shoulders and wrists, the landmarks the CPR metrics are computed from
+CPR_LANDMARKS = [LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_WRIST, RIGHT_WRIST]
 
 class CPRVisionAnalyzer:
-    def __init__(self):
-        self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-        self.mp_draw = mp.solutions.drawing_utils
+    def __init__(self, pose_backend: Optional[PoseBackend] = None, use_roi: bool = True,
+                 inference_interval: int = 1, inference_budget: Optional[float] = None,
+                 measure_drift: bool = False):
+        # Pose estimator, MediaPipe Pose by default
+        self.pose = pose_backend or create_pose_backend("mediapipe")
         
         # CPR parameters
         self.target_compression_rate = 100  # compressions per minute
         self.target_compression_depth = 5.0  # cm
-        self.compression_threshold = 0.1  # normalized distance threshold
+        
+        # Overlay elements are pre-rendered, labels cached by their text
+        self.overlay = OverlayRenderer(target_rate=self.target_compression_rate)
         
         # State tracking
-        self.last_compression_time = 0
+        self.compression_detector = CompressionDetector()
+        self.compression_count = 0
+        
+        # Run inference on a cropped torso window once the trainee is found
+        self.use_roi = use_roi
+        self.roi_tracker = RoiTracker()
+        self._rgb_buffer = np.empty(0, dtype=np.uint8)
+        
+        # Inference decimation: run pose every Nth frame, or at most once per
+        # inference_budget seconds, and predict landmarks in between
+        self.inference_interval = max(1, inference_interval)
+        self.inference_budget = inference_budget
+        self.landmark_predictor = LandmarkPredictor()
+        self.frames_since_inference = 0
+        self.last_inference_time = None
+        self.inference_count = 0
+        self.predicted_count = 0
+        
+        # Optionally run pose on predicted frames too, to measure prediction drift
+        self.measure_drift = measure_drift
+        self.drift_total = 0.0
+        self.drift_max = 0.0
+        self.drift_samples = 0
+        
+        # Optional LandmarkRecorder receiving the landmarks used for every frame
+        self.recorder = None
+        
+    def reset(self):
+        """Clear compression tracking so the analyzer can score a new session"""
+        self.compression_detector.reset()
         self.compression_count = 0
-        self.compression_times = []
+        self.roi_tracker.lost()
+        self.landmark_predictor.reset()
+        self.frames_since_inference = 0
+        self.last_inference_time = None
+        self.pose.reset()
         
-    def analyze_frame(self, frame: np.ndarray) -> Optional[CPRMetrics]:
-        """Analyze a single frame for CPR metrics"""
+    def analyze_frame(self, frame: np.ndarray, timestamp: Optional[float] = None) -> Optional[CPRMetrics]:
+        """Analyze a single frame for CPR metrics
+
+        timestamp is the frame time in seconds; when omitted the monotonic
+        clock is used, which is only correct for live capture. Pass the
+        capture timestamp so rates survive frames dropped under load.
+        """
         try:
-            # Convert BGR to RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Process the frame with MediaPipe
-            results = self.pose.process(rgb_frame)
-            
-            if not results.pose_landmarks:
-                return None
+            if timestamp is None:
+                timestamp = time.monotonic()
                 
-            # Extract relevant landmarks
-            landmarks = results.pose_landmarks.landmark
-            
-            # Get hand and chest positions
-            left_wrist = (landmarks[self.mp_pose.PoseLandmark.LEFT_WRIST].x,
-                         landmarks[self.mp_pose.PoseLandmark.LEFT_WRIST].y)
-            right_wrist = (landmarks[self.mp_pose.PoseLandmark.RIGHT_WRIST].x,
-                          landmarks[self.mp_pose.PoseLandmark.RIGHT_WRIST].y)
-            left_shoulder = (landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER].x,
-                            landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER].y)
-            right_shoulder = (landmarks[self.mp_pose.PoseLandmark.RIGHT_SHOULDER].x,
-                             landmarks[self.mp_pose.PoseLandmark.RIGHT_SHOULDER].y)
-            
-            # Calculate hand position relative to chest
-            chest_center = ((left_shoulder[0] + right_shoulder[0]) / 2,
-                           (left_shoulder[1] + right_shoulder[1]) / 2)
-            hand_center = ((left_wrist[0] + right_wrist[0]) / 2,
-                          (left_wrist[1] + right_wrist[1]) / 2)
-            
-            # Calculate compression depth (normalized)
-            compression_depth = abs(hand_center[1] - chest_center[1])
-            
-            # Update compression tracking
-            current_time = cv2.getTickCount() / cv2.getTickFrequency()
-            if compression_depth > self.compression_threshold:
-                if self.last_compression_time == 0:
-                    self.last_compression_time = current_time
-                elif current_time - self.last_compression_time > 0.5:  # Minimum time between compressions
-                    self.compression_count += 1
-                    self.compression_times.append(current_time)
-                    self.last_compression_time = current_time
-                    
-                    # Keep only the last 10 compressions for rate calculation
-                    if len(self.compression_times) > 10:
-                        self.compression_times.pop(0)
-            
-            # Calculate compression rate
-            if len(self.compression_times) >= 2:
-                time_span = self.compression_times[-1] - self.compression_times[0]
-                compression_rate = (len(self.compression_times) - 1) * 60 / time_span
-            else:
-                compression_rate = 0
+            landmarks = None
+            if not self._inference_due(timestamp):
+                landmarks = self.landmark_predictor.predict(timestamp)
                 
-            # Check if hands are in correct position
-            is_correct_position = (abs(hand_center[0] - chest_center[0]) < 0.1 and
-                                 abs(hand_center[1] - chest_center[1]) < 0.1)
-            
-            return CPRMetrics(
-                compression_rate=compression_rate,
-                compression_depth=compression_depth * 100,  # Convert to cm (approximate)
-                hand_position=hand_center,
-                is_correct_position=is_correct_position
-            )
+            if landmarks is None:
+                landmarks = self.detect_landmarks(frame, timestamp)
+                self.frames_since_inference = 0
+                self.last_inference_time = timestamp
+                self.inference_count += 1
+                if landmarks is None:
+                    self.landmark_predictor.reset()
+                    if self.recorder is not None:
+                        self.recorder.write(timestamp, None)
+                    return None
+                self.landmark_predictor.update(timestamp, landmarks)
+                predicted = False
+            else:
+                self.frames_since_inference += 1
+                self.predicted_count += 1
+                predicted = True
+                if self.measure_drift:
+                    self._record_drift(frame, landmarks, timestamp)
+                    
+            if self.recorder is not None:
+                self.recorder.write(timestamp, landmarks, predicted)
+            return self.analyze_landmarks(landmarks, timestamp)
         except Exception as e:
             print(f"Error in analyze_frame: {e}")
             return None
+            
+    def _inference_due(self, timestamp: float) -> bool:
+        """Check if this frame should run pose instead of using a prediction"""
+        if self.last_inference_time is None:
+            return True
+        if self.inference_budget is not None:
+            return timestamp - self.last_inference_time >= self.inference_budget
+        return self.frames_since_inference + 1 >= self.inference_interval
         
-    def draw_guidelines(self, frame: np.ndarray, metrics: CPRMetrics) -> np.ndarray:
-        """Draw visual guidelines on the frame"""
-        h, w = frame.shape[:2]
+    def _record_drift(self, frame: np.ndarray, predicted: np.ndarray, timestamp: float):
+        """Compare predicted CPR landmarks against a real pose run"""
+        measured = self.detect_landmarks(frame, timestamp)
+        if measured is None:
+            return
+        error = np.abs(predicted[CPR_LANDMARKS, :2] - measured[CPR_LANDMARKS, :2]).mean()
+        self.drift_total += float(error)
+        self.drift_max = max(self.drift_max, float(error))
+        self.drift_samples += 1
         
-        # Draw target hand position
-        target_x = int(metrics.hand_position[0] * w)
-        target_y = int(metrics.hand_position[1] * h)
-        cv2.circle(frame, (target_x, target_y), 20, (0, 255, 0), 2)
+    @property
+    def mean_drift(self) -> float:
+        """Mean normalized error of predicted CPR landmarks versus real pose runs"""
+        return self.drift_total / self.drift_samples if self.drift_samples else 0.0
         
-        # Draw compression depth indicator
-        depth_bar_height = int(metrics.compression_depth * 2)  # Scale for visibility
-        cv2.rectangle(frame, (10, h-100), (30, h-100-depth_bar_height), (0, 255, 0), -1)
+    def _run_pose(self, image: np.ndarray, timestamp: Optional[float],
+                  to_frame: Optional[LandmarkMapping] = None) -> Optional[np.ndarray]:
+        """Run the pose backend on a BGR image and return (33, 4) landmarks or None"""
+        # Convert BGR to RGB into a reused buffer; ROI crops change size every
+        # frame, so keep one flat buffer and view a contiguous prefix of it
+        h, w = image.shape[:2]
+        size = h * w * 3
+        if self._rgb_buffer.size < size:
+            self._rgb_buffer = np.empty(size, dtype=np.uint8)
+        rgb_image = self._rgb_buffer[:size].reshape(h, w, 3)
+        cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=rgb_image)
+        return self.pose.process(rgb_image, timestamp, to_frame)
         
-        # Draw metrics text
-        cv2.putText(frame, f"Rate: {metrics.compression_rate:.1f} cpm", (10, 30),
-                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-        cv2.putText(frame, f"Depth: {metrics.compression_depth:.1f} cm", (10, 60),
-                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    def detect_landmarks(self, frame: np.ndarray, timestamp: Optional[float] = None) -> Optional[np.ndarray]:
+        """Find pose landmarks in full-frame normalized coordinates
+
+        While a trainee is tracked only the padded torso crop is processed;
+        if the crop loses them the same frame is retried full-frame.
+        """
+        if self.use_roi and self.roi_tracker.roi is not None:
+            crop, offset = self.roi_tracker.crop(frame)
+            # Bound to this crop, since a backend may return it with a later frame's result
+            to_frame = partial(self.roi_tracker.to_frame, crop_shape=crop.shape,
+                               offset=offset, frame_shape=frame.shape)
+            landmarks = self._run_pose(crop, timestamp, to_frame)
+            if landmarks is not None:
+                self.roi_tracker.update(landmarks, frame.shape)
+                return landmarks
+            self.roi_tracker.lost()
+            
+        landmarks = self._run_pose(frame, timestamp)
+        if self.use_roi:
+            self.roi_tracker.full_frames += 1
+            if landmarks is not None:
+                self.roi_tracker.update(landmarks, frame.shape)
+        return landmarks
+        
+    def analyze_landmarks(self, landmarks: np.ndarray, timestamp: Optional[float] = None) -> CPRMetrics:
+        """Compute CPR metrics from full-frame normalized (33, 4) landmarks"""
+        # Get hand and chest positions
+        left_wrist = landmarks[LEFT_WRIST, :2]
+        right_wrist = landmarks[RIGHT_WRIST, :2]
+        left_shoulder = landmarks[LEFT_SHOULDER, :2]
+        right_shoulder = landmarks[RIGHT_SHOULDER, :2]
+        
+        # Calculate hand position relative to chest
+        chest_center = (float(left_shoulder[0] + right_shoulder[0]) / 2,
+                        float(left_shoulder[1] + right_shoulder[1]) / 2)
+        hand_center = (float(left_wrist[0] + right_wrist[0]) / 2,
+                       float(left_wrist[1] + right_wrist[1]) / 2)
+        
+        # Calculate compression depth (normalized)
+        compression_depth = abs(hand_center[1] - chest_center[1])
         
-        return frame 
\ No newline at end of file
+        # Update compression tracking from the wrist height signal
+        if timestamp is None:
+            timestamp = time.monotonic()
+        estimate = self.compression_detector.update(timestamp, hand_center[1])
+        self.compression_count = estimate.count
+        self.landmark_predictor.set_rate(estimate.rate)
+        compression_rate = estimate.rate
+            
+        # Check if hands are in correct position
+        is_correct_position = (abs(hand_center[0] - chest_center[0]) < 0.1 and
+                             abs(hand_center[1] - chest_center[1]) < 0.1)
+        
+        return CPRMetrics(
+            compression_rate=compression_rate,
+            compression_depth=compression_depth * 100,  # Convert to cm (approximate)
+            hand_position=hand_center,
+            is_correct_position=is_correct_position,
+            compression_count=self.compression_count,
+            compression_amplitude=estimate.amplitude,
+            timestamp=timestamp
+        )
+    
+    def draw_guidelines(self, frame: np.ndarray, metrics: CPRMetrics,
+                        timestamp: Optional[float] = None) -> np.ndarray:
+        """Draw the hand target, depth gauge, metric labels and metronome on the frame"""
+        return self.overlay.draw(frame, metrics, timestamp)
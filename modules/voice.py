@@ -1,18 +1,72 @@
-import speech_recognition as sr
-import pyttsx3
 import time
+from collections import deque
 from typing import Optional, Callable
+from .speech import SpeechService, PRIORITY_RESPONSE
+from .recognizers import create_recognizer, SAMPLE_RATE
+from .audio import AudioCapture, SpeechSegment, WavSource
+from .intents import Intent, IntentMatcher, GAP, START
+from .instrumentation import MetricsRegistry
+
+# What the trainee can say. Urgent commands act on partial transcripts;
+# questions wait for the whole utterance.
+COMMAND_GRAMMAR = [
+    Intent('stop', ("stop", "stop training", "end session"), priority=100, urgent=True),
+    # "wait" ends many questions ("how long should I wait"), so only as the first word
+    Intent('pause', ("pause", f"{START} wait"), priority=90, urgent=True),
+    Intent('resume', ("resume", "continue"), priority=80, urgent=True),
+    Intent('compression_depth', (f"how {GAP} deep", "depth"), priority=50),
+    Intent('compression_rate', (f"how {GAP} fast", "rate", "speed"), priority=50),
+    Intent('hand_position', (f"where {GAP} hands", f"where {GAP} hand", "hand position"), priority=50),
+    Intent('general', (f"what {GAP} cpr",), priority=40),
+    Intent('help', ("help",), priority=30),
+    Intent('explain', ("explain",), priority=20)
+]
+
+# Common words outside the grammar, so the rest of a question is not
+# forced onto a command word by grammar-restricted recognizers
+FILLER_WORDS = ["do", "i", "my", "go", "put", "should", "press", "please", "is", "don't", "not"]
+
+COMMAND_MATCHER = IntentMatcher(COMMAND_GRAMMAR)
+
+# Seconds after a response ends during which the microphone may still hear it
+ECHO_TAIL = 0.3
+
+# Vocabulary the local recognizers listen for
+COMMAND_PHRASES = sorted(set(COMMAND_MATCHER.vocabulary + FILLER_WORDS))
 
 class VoiceInterface:
-    def __init__(self):
-        # Initialize speech recognition
-        self.recognizer = sr.Recognizer()
-        self.recognizer.energy_threshold = 4000  # Adjust based on your microphone
-        self.recognizer.dynamic_energy_threshold = True
+    def __init__(self, speech_service: Optional[SpeechService] = None,
+                 recognizer: Optional[str] = "vosk", recognizer_options: Optional[dict] = None,
+                 metrics: Optional[MetricsRegistry] = None, audio_source=None):
+        # Initialize speech recognition; local engines stream partial results.
+        # Without a recognizer the interface only answers, e.g. to pre-render its responses.
+        self.recognizer = None
+        if recognizer is not None:
+            self.recognizer = create_recognizer(recognizer, phrases=COMMAND_PHRASES,
+                                                **(recognizer_options or {}))
+        self.matcher = COMMAND_MATCHER
         
-        # Initialize text-to-speech
-        self.engine = pyttsx3.init()
-        self.engine.setProperty('rate', 150)
+        # Audio is captured by a background thread that starts on first listen
+        self.audio_source = audio_source
+        self.capture = None
+        self._metrics = metrics
+        
+        # Stream position of the current utterance, for command latency
+        self._speech_start = None  # audio seconds
+        self._position = 0.0  # audio seconds at the end of the current chunk
+        self._chunk_time = 0.0  # perf_counter() when the current chunk was captured
+        self.command_latencies = deque(maxlen=100)  # seconds from speech start to dispatch
+        self._latency_timer = None
+        if metrics is not None:
+            self._latency_timer = metrics.histogram(
+                "voice_command_latency_seconds", "Time from the start of speech to command dispatch")
+        
+        # Share the app-wide speech service, or run a private one
+        if speech_service is None:
+            speech_service = SpeechService(rate=150)
+            speech_service.start()
+        self.speech = speech_service
+        self._reply = None  # our last queued response, see wait_for_speech()
         
         # Command handlers
         self.command_handlers = {
@@ -35,51 +89,149 @@ class VoiceInterface:
                       "focus on chest compressions at a rate of 100-120 per minute and a depth of 5-6 centimeters."
         }
         
-    def listen_for_command(self) -> Optional[str]:
-        """Listen for voice commands and return the recognized text"""
-        with sr.Microphone() as source:
-            print("Listening for command...")
-            try:
-                audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=5)
-                text = self.recognizer.recognize_google(audio).lower()
-                print(f"Recognized: {text}")
-                return text
-            except sr.WaitTimeoutError:
+    def listen_for_command(self, on_partial: Optional[Callable[[str], None]] = None,
+                           timeout: float = 5.0) -> Optional[str]:
+        """Wait for the next utterance and return the recognized text
+
+        on_partial, if given, receives each partial transcript while the
+        trainee is still speaking.
+        """
+        if self.capture is None:
+            # Opened once; from here on audio is captured continuously
+            self.capture = AudioCapture(self.audio_source, metrics=self._metrics)
+            self.capture.start()
+        segment = self.capture.next_segment(timeout)
+        if segment is None:
+            return None
+        return self.recognize_stream(segment, on_partial)
+            
+    def recognize_wav(self, path: str, on_partial: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        """Recognize a command from a WAV file, exactly as if it came from the microphone"""
+        capture = AudioCapture(WavSource([path]))
+        capture.start()
+        try:
+            segment = capture.next_segment()
+            if segment is None:
                 print("No speech detected")
                 return None
-            except sr.UnknownValueError:
-                print("Could not understand audio")
-                return None
-            except sr.RequestError as e:
-                print(f"Could not request results; {e}")
-                return None
+            return self.recognize_stream(segment, on_partial)
+        finally:
+            capture.stop()
+        
+    def recognize_stream(self, segment: SpeechSegment,
+                         on_partial: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        """Feed a speech segment to the recognizer as it is captured"""
+        self._speech_start = segment.onset
+        for pcm in segment:
+            self._position = (segment.position - segment.start) / SAMPLE_RATE
+            self._chunk_time = segment.ring.captured_at(segment.position - 1)
+            hypothesis = self.recognizer.accept(pcm)
+            if hypothesis is not None:
+                if hypothesis.final and hypothesis.text:
+                    # The engine ended the utterance; the rest of the segment is not needed
+                    print(f"Recognized: {hypothesis.text}")
+                    return hypothesis.text
+                if not hypothesis.final and on_partial:
+                    on_partial(hypothesis.text)
+                    
+        text = self.recognizer.finish().text
+        if not text:
+            print("Could not understand audio")
+            return None
+        print(f"Recognized: {text}")
+        return text
+        
+    def command_latency(self) -> Optional[float]:
+        """Seconds from the start of speech in the current utterance until now
+
+        Counted on the audio clock plus the time since the current chunk
+        was captured, so it means the same for live audio and WAV files.
+        """
+        if self._speech_start is None:
+            return None
+        return self._position - self._speech_start + (time.perf_counter() - self._chunk_time)
+        
+    def listen_and_dispatch(self, dispatch: Callable[[str], None]) -> Optional[str]:
+        """Recognize one utterance and dispatch the intent it contains
+
+        Urgent commands are dispatched from the partial transcript as soon
+        as they are unambiguous; anything else once the utterance ends.
+        Each intent is dispatched at most once per utterance. Returns the
+        dispatched intent name, or None.
+        """
+        dispatched = []
+        
+        def fire(name: str):
+            dispatched.append(name)
+            latency = self.command_latency()
+            if latency is not None:
+                self.command_latencies.append(latency)
+                if self._latency_timer is not None:
+                    self._latency_timer.observe(latency)
+                print(f"Voice command '{name}' {latency * 1000:.0f} ms after speech start")
+            dispatch(name)
+            
+        def on_partial(text: str):
+            if dispatched:
+                return
+            match = self.matcher.match(text, partial=True)
+            if match is not None:
+                fire(match.intent.name)
                 
+        text = self.listen_for_command(on_partial)
+        if text and not dispatched:
+            match = self.matcher.match(text)
+            if match is not None:
+                fire(match.intent.name)
+            else:
+                self.speak_response(self.unknown_response())
+        return dispatched[0] if dispatched else None
+        
     def process_command(self, command: str) -> Optional[str]:
         """Process the recognized command and return a response"""
-        # Check for specific CPR-related questions
-        if 'how' in command and 'deep' in command:
-            return self.cpr_responses['compression_depth']
-        elif 'how' in command and 'fast' in command:
-            return self.cpr_responses['compression_rate']
-        elif 'where' in command and 'hands' in command:
-            return self.cpr_responses['hand_position']
-        elif 'what' in command and 'cpr' in command:
-            return self.cpr_responses['general']
-            
-        # Check for registered commands
-        for cmd, handler in self.command_handlers.items():
-            if cmd in command:
-                return handler()
-                
+        match = self.matcher.match(command)
+        if match is None:
+            return self.unknown_response()
+        return self.respond(match.intent.name)
+        
+    def respond(self, intent: str) -> str:
+        """Spoken response for an intent from COMMAND_GRAMMAR"""
+        handler = self.command_handlers.get(intent)
+        if handler is not None:
+            return handler()
+        return self.cpr_responses[intent]
+        
+    def phrases(self) -> list:
+        """Every response this interface can speak, for pre-rendering"""
+        return [self.respond(intent.name) for intent in COMMAND_GRAMMAR] + [self.unknown_response()]
+        
+    def unknown_response(self) -> str:
         return "I'm not sure about that. You can ask for help to see available commands."
         
     def speak_response(self, response: str):
-        """Convert response to speech"""
-        try:
-            self.engine.say(response)
-            self.engine.runAndWait()
-        except Exception as e:
-            print(f"Error in text-to-speech: {e}")
+        """Queue response for speech without blocking the caller"""
+        self._reply = self.speech.say(response, priority=PRIORITY_RESPONSE,
+                                      key='voice_response', max_age=10.0)
+        
+    def wait_for_speech(self, timeout: float = 15.0):
+        """Wait for our last response to be spoken and drop whatever the microphone heard of it
+
+        Only the response is waited for, not feedback cues sharing the
+        speech service, so commands are heard again as soon as it ends.
+        """
+        reply, self._reply = self._reply, None
+        if reply is None:
+            return
+        reply.wait(timeout)
+        if self.capture is not None and reply.started is not None:
+            end = reply.finished if reply.finished is not None else time.perf_counter()
+            self.capture.discard(reply.started, end + ECHO_TAIL)
+            
+    def close(self):
+        """Stop audio capture and release the input device"""
+        if self.capture is not None:
+            self.capture.stop()
+            self.capture = None
             
     # Command handlers
     def handle_help(self) -> str:
@@ -99,22 +251,28 @@ class VoiceInterface:
         return self.cpr_responses['general']
         
     def start_voice_interface(self, callback: Optional[Callable[[str], None]] = None):
-        """Start the voice interface in a loop"""
+        """Start the voice interface in a loop
+
+        callback receives the name of each dispatched intent, e.g. 'pause'.
+        """
         print("Voice interface started in background")
+        
+        def dispatch(intent: str):
+            # Act first, then answer; the response is spoken asynchronously
+            if callback:
+                callback(intent)
+            self.speak_response(self.respond(intent))
+            
         while True:
+            if self.capture is not None and self.capture.finished.is_set():
+                print("Audio input closed, voice interface stopped")
+                break
             try:
-                command = self.listen_for_command()
-                if command:
-                    if 'stop' in command:
-                        response = self.handle_stop()
-                        self.speak_response(response)
-                        break
-                        
-                    response = self.process_command(command)
-                    self.speak_response(response)
-                    
-                    if callback:
-                        callback(command)
+                intent = self.listen_and_dispatch(dispatch)
+                if intent == 'stop':
+                    break
+                if intent is not None:
+                    self.wait_for_speech()
             except Exception as e:
                 print(f"Voice interface error: {e}")
-                continue  # Continue listening even if there's an error 
\ No newline at end of file
+                continue  # Continue listening even if there's an error
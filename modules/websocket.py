@@ -0,0 +1,182 @@
+import base64
+import hashlib
+import json
+import os
+import socket
+import struct
+import threading
+from typing import Optional, Tuple
+
+# Minimal RFC 6455 WebSocket support on top of http.server handlers, plus a
+# client for load testing, so the servers need nothing beyond the standard library.
+
+_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+class WebSocketClosed(Exception):
+    """The peer closed the connection"""
+
+def accept_key(key: str) -> str:
+    return base64.b64encode(hashlib.sha1((key + _GUID).encode()).digest()).decode()
+
+def _apply_mask(payload: bytes, mask: bytes) -> bytes:
+    # XOR with the repeated 4-byte mask in one big-integer operation
+    length = len(payload)
+    repeated = (mask * (length // 4 + 1))[:length]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")).to_bytes(length, "big")
+
+class WebSocket:
+    """One WebSocket connection, server side (accept) or client side (connect)
+
+    send_*() may be called from any thread; recv() from one thread only.
+    """
+
+    def __init__(self, rfile, wfile, max_message_size: int = 4 << 20, client: bool = False):
+        self.rfile = rfile
+        self.wfile = wfile
+        self.max_message_size = max_message_size
+        self.client = client  # clients must mask what they send
+        self._send_lock = threading.Lock()
+        self.closed = False
+        self._socket = None
+
+    @classmethod
+    def accept(cls, handler, **kwargs) -> Optional["WebSocket"]:
+        """Complete the upgrade handshake, or answer 400 and return None"""
+        key = handler.headers.get("Sec-WebSocket-Key")
+        if not key or "websocket" not in handler.headers.get("Upgrade", "").lower():
+            handler.send_error(400, "Expected a WebSocket upgrade")
+            return None
+        handler.send_response(101, "Switching Protocols")
+        handler.send_header("Upgrade", "websocket")
+        handler.send_header("Connection", "Upgrade")
+        handler.send_header("Sec-WebSocket-Accept", accept_key(key))
+        handler.end_headers()
+        handler.close_connection = True  # http.server must not reuse the socket afterwards
+        return cls(handler.rfile, handler.wfile, **kwargs)
+
+    @classmethod
+    def connect(cls, host: str, port: int, path: str = "/", timeout: Optional[float] = 10.0,
+                **kwargs) -> "WebSocket":
+        """Open a client connection to ws://host:port/path"""
+        sock = socket.create_connection((host, port), timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        key = base64.b64encode(os.urandom(16)).decode()
+        sock.sendall((f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\n"
+                      f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+                      f"Sec-WebSocket-Version: 13\r\n\r\n").encode())
+        rfile = sock.makefile("rb")
+        status = rfile.readline()
+        headers = {}
+        while True:
+            line = rfile.readline().decode().strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if b" 101 " not in status or headers.get("sec-websocket-accept") != accept_key(key):
+            sock.close()
+            raise ConnectionError(f"WebSocket handshake failed: {status.decode().strip()}")
+        sock.settimeout(None)
+        ws = cls(rfile, sock.makefile("wb"), client=True, **kwargs)
+        ws._socket = sock
+        return ws
+
+    def _send_frame(self, opcode: int, payload: bytes):
+        length = len(payload)
+        mask_bit = 0x80 if self.client else 0
+        if length < 126:
+            header = struct.pack("!BB", 0x80 | opcode, mask_bit | length)
+        elif length < 1 << 16:
+            header = struct.pack("!BBH", 0x80 | opcode, mask_bit | 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, mask_bit | 127, length)
+        if self.client:
+            mask = os.urandom(4)
+            header += mask
+            payload = _apply_mask(payload, mask) if payload else payload
+        with self._send_lock:
+            if self.closed:
+                raise WebSocketClosed()
+            try:
+                self.wfile.write(header + payload)
+                self.wfile.flush()
+            except OSError:
+                self.closed = True
+                raise WebSocketClosed()
+
+    def send_text(self, text: str):
+        self._send_frame(OP_TEXT, text.encode())
+
+    def send_json(self, value):
+        self.send_text(json.dumps(value, separators=(",", ":")))
+
+    def send_binary(self, data: bytes):
+        self._send_frame(OP_BINARY, data)
+
+    def _read_exact(self, count: int) -> bytes:
+        data = self.rfile.read(count)
+        if len(data) < count:
+            self.closed = True
+            raise WebSocketClosed()
+        return data
+
+    def _recv_frame(self) -> Tuple[bool, int, bytes]:
+        first, second = self._read_exact(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", self._read_exact(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", self._read_exact(8))[0]
+        if length > self.max_message_size:
+            self.close(1009)
+            raise WebSocketClosed()
+        mask = self._read_exact(4) if second & 0x80 else None
+        payload = self._read_exact(length)
+        if mask and payload:
+            payload = _apply_mask(payload, mask)
+        return bool(first & 0x80), first & 0x0F, payload
+
+    def recv(self) -> Tuple[int, bytes]:
+        """Return the next (OP_TEXT or OP_BINARY, payload) message; raises WebSocketClosed"""
+        message_opcode = None
+        parts = []
+        size = 0
+        while True:
+            final, opcode, payload = self._recv_frame()
+            if opcode == OP_PING:
+                self._send_frame(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                self.close()
+                raise WebSocketClosed()
+            if opcode != OP_CONTINUATION:
+                message_opcode = opcode
+                parts = []
+                size = 0
+            # Frames are checked one by one; the whole message has the same limit
+            size += len(payload)
+            if size > self.max_message_size:
+                self.close(1009)
+                raise WebSocketClosed()
+            parts.append(payload)
+            if final:
+                return message_opcode, b"".join(parts)
+
+    def close(self, code: int = 1000):
+        if not self.closed:
+            try:
+                self._send_frame(OP_CLOSE, struct.pack("!H", code))
+            except WebSocketClosed:
+                pass
+            self.closed = True
+        if self._socket is not None:
+            self._socket.close()
@@ -0,0 +1,48 @@
+import argparse
+import sys
+import traceback
+
+from modules.clips import ClipCache
+from modules.feedback import CPRFeedback
+from modules.speech import SpeechService
+from modules.voice import VoiceInterface
+
+def all_phrases(stations: int) -> list:
+    """Every fixed message the training app and the instructor dashboard can speak"""
+    # The service is never started; it only receives the messages
+    speech = SpeechService()
+    phrases = CPRFeedback(speech).phrases()
+    phrases += VoiceInterface(speech, recognizer=None).phrases()
+    for i in range(stations):
+        phrases += CPRFeedback(speech, announce=f"Station {i + 1}: ").phrases()
+    return phrases
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render every fixed feedback message to a speech clip ahead of a session")
+    parser.add_argument("--cache", default="cache/speech", help="Clip directory, as --speech-cache")
+    parser.add_argument("--voice", help="TTS voice id (default: the system voice)")
+    parser.add_argument("--rate", type=int, default=150, help="Speaking rate in words per minute")
+    parser.add_argument("--stations", type=int, default=8,
+                        help="Also render the announcements of this many dashboard stations")
+    parser.add_argument("--prune", action="store_true",
+                        help="Delete clips of messages that no longer exist")
+    args = parser.parse_args()
+
+    try:
+        cache = ClipCache(args.cache, voice=args.voice, rate=args.rate)
+        phrases = all_phrases(args.stations)
+        cached = len(set(phrases)) - len(cache.missing(phrases))
+        rendered = cache.render(phrases)
+        print(f"{rendered} clips rendered, {cached} already cached in {args.cache}")
+        if args.prune:
+            print(f"{cache.prune(phrases)} stale clips removed")
+        return 0
+    except Exception as e:
+        print(f"Fatal error: {e}")
+        print("Traceback:")
+        traceback.print_exc()
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import argparse
+import os
+import sys
+import time
+import traceback
+from functools import partial
+from typing import List, Optional
+
+import cv2
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from modules.dashboard import InstructorDashboard
+from modules.feedback import CPRFeedback
+from modules.instrumentation import MetricsRegistry, MetricsServer
+from modules.pose_backends import BACKENDS, create_pose_backend
+from modules.speech import SpeechService
+from modules.clips import ClipCache
+from modules.stations import PosePool, Station
+from modules.sources import SOURCE_HELP, open_source
+
+class StationSignals(QObject):
+    """Hands pool results back to the GUI thread, tagged with the station index"""
+    metrics_ready = pyqtSignal(int, object)
+
+class MultiStationApp:
+    """Runs several stations in one process with a shared pose worker pool
+
+    Capture costs one thread per camera, but pose inference is bounded by
+    the pool size: with more stations than workers each station is simply
+    analyzed at a lower frame rate, and landmark prediction fills the gaps
+    when an inference interval is set.
+    """
+
+    def __init__(self, sources: List[str], pose_workers: int = 2, inference_interval: int = 1,
+                 pose_backend: str = "mediapipe", pose_options: Optional[dict] = None,
+                 columns: int = 0, speak: bool = False, metrics_port: int = 9110, ui_rate: float = 10.0,
+                 realtime: bool = True):
+        print(f"Starting {len(sources)} stations with {pose_workers} pose workers...")
+        self.metrics = MetricsRegistry()
+        self.metrics_server = None
+        if metrics_port:
+            try:
+                self.metrics_server = MetricsServer(self.metrics, metrics_port)
+                self.metrics_server.start()
+                print(f"Metrics at http://127.0.0.1:{self.metrics_server.port}/metrics")
+            except OSError as e:
+                print(f"WARNING: Could not start metrics endpoint: {e}")
+
+        names = [f"Station {i + 1}" for i in range(len(sources))]
+        self.ui = InstructorDashboard(names, columns, ui_rate)
+
+        # One speaker for the room: cues are prefixed with the station name.
+        # Without --speak the service is never started and nothing is spoken.
+        self.speech_service = SpeechService(rate=150, clips=ClipCache(rate=150))
+        if speak:
+            self.speech_service.start()
+        self.speak = speak
+
+        self.pool = PosePool(lambda: create_pose_backend(pose_backend, **(pose_options or {})),
+                             pose_workers)
+        self.signals = StationSignals()
+        self.signals.metrics_ready.connect(self.handle_metrics)
+        self.stations = []
+        for i, (name, source) in enumerate(zip(names, sources)):
+            feedback = CPRFeedback(self.speech_service, speech_key=f"station_{i}",
+                                   announce=f"{name}: ")
+            self.speech_service.preload(feedback.phrases())
+            frame_source = open_source(source, realtime)
+            if not frame_source.is_open():
+                print(f"WARNING: Could not open {source}")
+            station = Station(i, name, frame_source, self.pool, inference_interval,
+                              feedback, self.signals.metrics_ready.emit, self.metrics)
+            self.ui.tiles[i].reset_button.clicked.connect(
+                lambda checked=False, s=station: self.reset_station(s))
+            self.stations.append(station)
+        self.metrics.gauge("pose_station_switches_total", "Times a pose worker moved to another station",
+                           lambda: self.pool.station_switches, kind="counter")
+
+        self.pool.start()
+        for station in self.stations:
+            station.start()
+
+        # Thumbnails do not need the full camera rate
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.update_frames)
+        self.timer.start(66)
+        self.debug_timer = QTimer()
+        self.debug_timer.timeout.connect(self.update_debug_overlay)
+        self.debug_timer.start(500)
+        self.latest_metrics = [None] * len(self.stations)
+
+    def update_frames(self):
+        """Render the newest frame of each station with its latest overlay"""
+        for station, tile, metrics in zip(self.stations, self.ui.tiles, self.latest_metrics):
+            item = station.display_queue.get_nowait()
+            if item is None:
+                continue
+            frame_id, frame = item
+            try:
+                overlay = None
+                if metrics:
+                    overlay = partial(station.analyzer.draw_guidelines, metrics=metrics)
+                tile.update_video_frame(frame.image, overlay)
+            finally:
+                frame.release()
+
+    def handle_metrics(self, index: int, metrics):
+        """Receive a station's analysis on the GUI thread"""
+        try:
+            self.latest_metrics[index] = metrics
+            station = self.stations[index]
+            tile = self.ui.tiles[index]
+            if not metrics:
+                tile.clear_metrics()
+                return
+            tile.update_metrics(station.feedback.get_visual_feedback(metrics),
+                                metrics.compression_count)
+            if self.speak:
+                station.feedback.provide_feedback(metrics)
+            if metrics.captured and station.feedback_latency is not None:
+                station.feedback_latency.observe(time.monotonic() - metrics.captured)
+        except Exception as e:
+            print(f"Error handling metrics: {e}")
+            traceback.print_exc()
+
+    def reset_station(self, station: Station):
+        """Start a new trainee on a station"""
+        station.reset()
+        self.latest_metrics[station.index] = None
+        self.ui.tiles[station.index].clear_metrics()
+        self.ui.tiles[station.index].count_label.setText("Compressions: 0")
+
+    def update_debug_overlay(self):
+        if self.ui.is_debug_overlay_visible():
+            self.ui.set_debug_text(self.metrics.summary_lines())
+
+    def run(self) -> int:
+        self.ui.show()
+        return QApplication.instance().exec()
+
+    def cleanup(self):
+        print("Cleaning up resources...")
+        self.timer.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        for station in self.stations:
+            station.stop()
+        latency = self.pool.latency_summary()
+        self.pool.stop()
+        print(f"Pose latency: mean {latency['mean_ms']:.1f} ms, "
+              f"p95 {latency['p95_ms']:.1f} ms over {latency['count']} frames per worker")
+        for station in self.stations:
+            print(f"{station.name}: {station.frames_analyzed} frames analyzed, "
+                  f"{station.dropped} dropped, {station.analyzer.compression_count} compressions")
+        self.speech_service.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several CPR training stations in one process")
+    parser.add_argument("sources", nargs="+", help=f"One per station: {SOURCE_HELP}")
+    parser.add_argument("--fast", action="store_true",
+                        help="Read files, replays and synthetic sources as fast as possible, not in real time")
+    parser.add_argument("--pose-workers", type=int, default=min(2, os.cpu_count() or 1),
+                        help="Pose models shared by all stations")
+    parser.add_argument("--inference-interval", type=int, default=1,
+                        help="Run pose every Nth analyzed frame of a station and predict in between")
+    parser.add_argument("--columns", type=int, default=0, help="Dashboard columns (default: square grid)")
+    parser.add_argument("--speak", action="store_true", help="Speak feedback for every station")
+    parser.add_argument("--ui-rate", type=float, default=10.0,
+                        help="Metric label refreshes per second, independent of the video")
+    parser.add_argument("--pose-backend", choices=list(BACKENDS), default="mediapipe",
+                        help="Pose estimation backend")
+    parser.add_argument("--model-complexity", type=int, choices=[0, 1, 2],
+                        help="MediaPipe Pose model complexity")
+    parser.add_argument("--pose-model", help="Model file for the mediapipe-tasks or movenet backends")
+    parser.add_argument("--metrics-port", type=int, default=9110,
+                        help="Port for the Prometheus metrics endpoint (0 disables it)")
+    args, qt_args = parser.parse_known_args()
+    if args.ui_rate <= 0:
+        parser.error("--ui-rate must be greater than 0")
+
+    try:
+        app = QApplication(sys.argv[:1] + qt_args)
+        # Pool workers and cameras already use every core; OpenCV threads only oversubscribe
+        cv2.setNumThreads(1)
+        pose_options = {
+            'model_complexity': args.model_complexity,
+            'model_path': args.pose_model,
+            'running_mode': 'video'
+        }
+        host = MultiStationApp(args.sources, args.pose_workers, args.inference_interval,
+                               args.pose_backend, pose_options, args.columns, args.speak,
+                               args.metrics_port, args.ui_rate, not args.fast)
+        try:
+            return host.run()
+        finally:
+            host.cleanup()
+    except Exception as e:
+        print(f"Fatal error: {e}")
+        print("Traceback:")
+        traceback.print_exc()
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
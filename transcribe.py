@@ -0,0 +1,40 @@
+import argparse
+import sys
+import traceback
+
+from modules.recognizers import RECOGNIZERS, create_recognizer, iter_chunks, read_wav, transcribe
+from modules.voice import COMMAND_PHRASES
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Stream WAV recordings through a speech recognizer, with no microphone or network")
+    parser.add_argument("wavs", nargs="+", help="16-bit PCM WAV files, one utterance each")
+    parser.add_argument("--recognizer", choices=list(RECOGNIZERS), default="vosk")
+    parser.add_argument("--speech-model", help="Model directory for the vosk or pocketsphinx recognizer")
+    parser.add_argument("--free-text", action="store_true",
+                        help="Recognize any words instead of only the command vocabulary")
+    parser.add_argument("--threshold", type=float, default=300.0,
+                        help="RMS level that marks the start of speech")
+    args = parser.parse_args()
+
+    try:
+        recognizer = create_recognizer(args.recognizer, model_path=args.speech_model,
+                                       phrases=None if args.free_text else COMMAND_PHRASES)
+        print(f"{'file':32s} {'first partial':>13s} {'decode RTF':>10s}  transcript")
+        for path in args.wavs:
+            result = transcribe(recognizer, iter_chunks(read_wav(path)), args.threshold)
+            latency = result.first_partial_latency
+            latency_text = f"{latency * 1000:.0f} ms" if latency is not None else "-"
+            # Real-time factor: decode time per second of audio; below 1 keeps up live
+            rtf = result.decode_seconds / result.audio_seconds if result.audio_seconds else 0.0
+            print(f"{path[-32:]:32s} {latency_text:>13s} {rtf:10.3f}  {result.text!r}")
+        recognizer.close()
+        return 0
+    except Exception as e:
+        print(f"Fatal error: {e}")
+        print("Traceback:")
+        traceback.print_exc()
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,118 +1,138 @@
+import os
+import uuid
 import streamlit as st
-import cv2
-import numpy as np
-from modules.vision import CPRVisionAnalyzer, CPRMetrics
-from modules.feedback import CPRFeedback
-import time
+import streamlit.components.v1 as components
+from modules.instrumentation import MetricsRegistry, MetricsServer
+from modules.streaming import StreamServer
+
+METRICS_PORT = 9109
+STREAM_PORT = 8502
+# Video and metrics are not authenticated, so they are served on localhost
+# only; CPR_STREAM_HOST=0.0.0.0 serves browsers on other machines
+STREAM_HOST = os.environ.get("CPR_STREAM_HOST", "127.0.0.1")
+# Frames and pose backend for every session; e.g. CPR_SOURCE=synthetic:100
+# with CPR_POSE_BACKEND=stick runs the whole app without a camera or model
+SOURCE = os.environ.get("CPR_SOURCE", "0")
+POSE_BACKEND = os.environ.get("CPR_POSE_BACKEND", "mediapipe")
+
+@st.cache_resource
+def get_metrics() -> MetricsRegistry:
+    """One registry and metrics endpoint per server process, shared across reruns"""
+    registry = MetricsRegistry()
+    try:
+        MetricsServer(registry, METRICS_PORT).start()
+    except OSError as e:
+        print(f"WARNING: Could not start metrics endpoint: {e}")
+    return registry
+
+@st.cache_resource
+def get_stream_server() -> StreamServer:
+    """Video and metrics streaming server shared by every browser session"""
+    server = StreamServer(STREAM_PORT, STREAM_HOST, registry=get_metrics())
+    server.start()
+    return server
+
+# The page only builds the viewer; frames and metrics arrive on their own
+# connections, so the Streamlit script never loops or reruns per frame.
+VIEWER_HTML = """
+<div style="display:flex;gap:24px;font-family:sans-serif">
+  <img id="video" style="flex:2;max-width:66%;background:#000" />
+  <div style="flex:1">
+    <h3>Real-time Metrics</h3>
+    <p><b>Compression Rate:</b> <span id="rate">-</span> cpm</p>
+    <p><b>Compression Depth:</b> <span id="depth">-</span> cm</p>
+    <p><b>Hand Position:</b> <span id="position">-</span></p>
+    <p><b>Compressions:</b> <span id="count">0</span></p>
+    <h3>Status Indicators</h3>
+    <p id="rate_status">Rate Status: Waiting...</p>
+    <p id="depth_status">Depth Status: Waiting...</p>
+    <p id="position_status">Position Status: Waiting...</p>
+    <pre id="debug" style="font-size:11px"></pre>
+  </div>
+</div>
+<script>
+  let host = "localhost";
+  try { host = window.parent.location.hostname || host; } catch (e) {}
+  const base = host + ":__PORT__";
+  document.getElementById("video").src = "http://" + base + "/stream/__SESSION__.mjpg";
+  const state = {};
+  function show(id, text, status) {
+    const el = document.getElementById(id);
+    el.textContent = text;
+    if (status) el.style.color = status === "good" ? "green" : "red";
+  }
+  function connect() {
+    const ws = new WebSocket("ws://" + base + "/ws/__SESSION____DEBUG__");
+    ws.onmessage = (event) => {
+      Object.assign(state, JSON.parse(event.data));
+      if (state.detected) {
+        show("rate", state.rate.toFixed(1));
+        show("depth", state.depth.toFixed(1));
+        show("position", state.position_correct ? "Correct" : "Needs Adjustment");
+        show("count", state.count);
+        show("rate_status", "Rate Status: " + state.rate_status.toUpperCase(), state.rate_status);
+        show("depth_status", "Depth Status: " + state.depth_status.toUpperCase(), state.depth_status);
+        show("position_status", "Position Status: " + state.position_status.toUpperCase(),
+             state.position_status);
+      }
+      if (state.debug) show("debug", state.debug.join("\\n"));
+    };
+    ws.onclose = () => setTimeout(connect, 1000);
+  }
+  connect();
+</script>
+"""
 
 def main():
     st.set_page_config(page_title="CPR Training Module", layout="wide")
-    
-    # Initialize components
-    if 'vision_analyzer' not in st.session_state:
-        st.session_state.vision_analyzer = CPRVisionAnalyzer()
-    if 'feedback_system' not in st.session_state:
-        st.session_state.feedback_system = CPRFeedback()
+
+    # Initialize session state
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
     if 'is_training' not in st.session_state:
         st.session_state.is_training = False
     if 'is_paused' not in st.session_state:
         st.session_state.is_paused = False
-    
+
+    server = get_stream_server()
+    session_id = st.session_state.session_id
+
     # Title and description
     st.title("CPR Training Module")
     st.markdown("""
     This interactive CPR training module uses computer vision to analyze your CPR technique
     and provide real-time feedback on compression rate, depth, and hand position.
     """)
-    
-    # Create two columns
-    col1, col2 = st.columns([2, 1])
-    
-    with col1:
-        # Video feed
-        st.subheader("Video Feed")
-        video_placeholder = st.empty()
-        
-        # Camera controls
-        if not st.session_state.is_training:
-            if st.button("Start Training", type="primary"):
-                st.session_state.is_training = True
-                st.session_state.is_paused = False
-                st.experimental_rerun()
-        else:
-            if st.button("Pause" if not st.session_state.is_paused else "Resume"):
-                st.session_state.is_paused = not st.session_state.is_paused
-                st.experimental_rerun()
-            if st.button("Stop Training", type="secondary"):
-                st.session_state.is_training = False
-                st.session_state.is_paused = False
-                st.experimental_rerun()
-    
-    with col2:
-        # Metrics display
-        st.subheader("Real-time Metrics")
-        
-        # Create placeholders for metrics
-        rate_placeholder = st.empty()
-        depth_placeholder = st.empty()
-        position_placeholder = st.empty()
-        
-        # Status indicators
-        st.subheader("Status Indicators")
-        rate_status = st.empty()
-        depth_status = st.empty()
-        position_status = st.empty()
-    
-    # Main training loop
-    if st.session_state.is_training and not st.session_state.is_paused:
-        # Initialize camera
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            st.error("Could not open camera!")
+
+    # Camera controls. The camera and analyzer live in a background session
+    # worker, so reruns only start, pause or stop it.
+    if not st.session_state.is_training:
+        if st.button("Start Training", type="primary"):
+            st.session_state.is_training = True
+            st.session_state.is_paused = False
+            st.experimental_rerun()
+    else:
+        if st.button("Pause" if not st.session_state.is_paused else "Resume"):
+            st.session_state.is_paused = not st.session_state.is_paused
+            st.experimental_rerun()
+        if st.button("Stop Training", type="secondary"):
+            st.session_state.is_training = False
+            st.session_state.is_paused = False
+            server.close_session(session_id)
+            st.experimental_rerun()
+
+    show_debug = st.checkbox("Show debug overlay")
+
+    if st.session_state.is_training:
+        worker = server.open_session(session_id, source=SOURCE, pose_backend=POSE_BACKEND)
+        worker.set_active(not st.session_state.is_paused)
+        if worker.error:
+            st.error(worker.error)
             return
-        
-        # Set camera properties
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        cap.set(cv2.CAP_PROP_FPS, 30)
-        
-        try:
-            while st.session_state.is_training and not st.session_state.is_paused:
-                ret, frame = cap.read()
-                if not ret:
-                    st.error("Could not read frame from camera")
-                    break
-                
-                # Process frame
-                metrics = st.session_state.vision_analyzer.analyze_frame(frame)
-                
-                if metrics:
-                    # Draw guidelines
-                    frame = st.session_state.vision_analyzer.draw_guidelines(frame, metrics)
-                    
-                    # Update metrics display
-                    rate_placeholder.markdown(f"**Compression Rate:** {metrics.compression_rate:.1f} cpm")
-                    depth_placeholder.markdown(f"**Compression Depth:** {metrics.compression_depth:.1f} cm")
-                    position_placeholder.markdown(f"**Hand Position:** {'Correct' if metrics.is_correct_position else 'Needs Adjustment'}")
-                    
-                    # Update status indicators
-                    visual_feedback = st.session_state.feedback_system.get_visual_feedback(metrics)
-                    rate_status.markdown(f"Rate Status: {visual_feedback['rate_status'].upper()}")
-                    depth_status.markdown(f"Depth Status: {visual_feedback['depth_status'].upper()}")
-                    position_status.markdown(f"Position Status: {visual_feedback['position_status'].upper()}")
-                    
-                    # Provide audio feedback
-                    st.session_state.feedback_system.provide_feedback(metrics)
-                
-                # Display frame
-                video_placeholder.image(frame, channels="BGR", use_column_width=True)
-                
-                # Add a small delay to control frame rate
-                time.sleep(0.033)  # ~30 FPS
-                
-        finally:
-            cap.release()
-            cv2.destroyAllWindows()
+        html = (VIEWER_HTML.replace("__PORT__", str(server.port))
+                .replace("__SESSION__", session_id)
+                .replace("__DEBUG__", "?debug=1" if show_debug else ""))
+        components.html(html, height=560)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()